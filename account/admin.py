@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.models import Group
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-from .models import User, Otp, ChangedUser, ResetPasswordOtp
+from .models import User, Otp, ChangedUser, ResetPasswordOtp, FailedEmail
 from .forms import UserRegisterForm, UserChangeForm
 
 
@@ -36,4 +36,5 @@ admin.site.register(User, UserAdmin)
 admin.site.register(Otp)
 admin.site.register(ResetPasswordOtp)
 admin.site.register(ChangedUser)
+admin.site.register(FailedEmail)
 admin.site.unregister(Group)
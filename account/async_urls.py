@@ -0,0 +1,19 @@
+from django.urls import path
+from django.contrib.auth.views import LogoutView
+
+from . import views, async_views
+
+app_name = "account"
+urlpatterns = [
+    path("login", async_views.UserLogin.as_view(), name="login"),
+    path("register", async_views.UserRegister.as_view(), name="register"),
+    path("logout", LogoutView.as_view(next_page="home:main"), name="logout"),
+    path("check-otp/", async_views.CheckOtp.as_view(), name="check-otp"),
+    path("profile/", async_views.UserProfileEdit.as_view(), name="user-profile"),
+    path("change-email/", async_views.ChangeEmail.as_view(), name="change-email"),
+    path("change-phone/", async_views.ChangePhone.as_view(), name="change-phone"),
+    path("password-reset-phone/", async_views.PasswordResetPhone.as_view(), name="password-reset-phone"),
+    path("password-reset-otp/", async_views.PasswordResetCheckOtp.as_view(), name="password-reset-otp"),
+    path("password-reset/", async_views.PasswordReset.as_view(), name="password-reset"),
+    path("change-password/", views.ChangePasswordView.as_view(), name="change-password"),
+]
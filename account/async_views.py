@@ -0,0 +1,297 @@
+"""
+Async versions of the account views, served
+when ACCOUNT_ASYNC_VIEWS is set (male_fashion/asgi.py
+sets it), so that one worker can wait for many
+OTP and email flows at the same time.
+"""
+from asgiref.sync import sync_to_async
+from django.views import View
+from django.contrib import messages
+from django.contrib.auth import login
+from django.shortcuts import redirect, render
+
+from . import flows
+from .models import User
+from .hashing import amake_password
+from .authentication import CustomBackend
+from .verification import get_verification_store
+from .forms import UserRegisterForm, UserLoginForm, CheckOtpForm \
+    , UserProfileForm, PasswordResetPhoneForm, PasswordResetOtpForm \
+    , PasswordResetForm
+
+# Rendering, form validation and login touch the database
+# (request.user, unique checks, session) so they run in a thread
+arender = sync_to_async(render)
+alogin = sync_to_async(login)
+aupdate_profile = sync_to_async(flows.update_profile)
+achange_phone = sync_to_async(flows.change_phone)
+achange_email = sync_to_async(flows.change_email)
+
+
+async def is_valid(form):
+    return await sync_to_async(form.is_valid)()
+
+
+async def is_authenticated(request):
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+class UserRegister(View):
+    """
+    User registration
+    by sending OTP code to their phone number
+    """
+
+    async def get(self, request):
+        if await is_authenticated(request):
+            return redirect("home:main")
+        form = UserRegisterForm
+        return await arender(request, "account/register.html", {"form": form})
+
+    async def post(self, request):
+        form = UserRegisterForm(request.POST)
+        if await is_valid(form):
+            token = flows.new_token()
+            await get_verification_store().aset("register", token,
+                                                flows.registration(form.cleaned_data))
+            return redirect(flows.token_url("account:check-otp", token))
+        return await arender(request, "account/register.html", {"form": form})
+
+
+class CheckOtp(View):
+    """
+    Check if the Otp code
+    is still valid and correct
+    """
+
+    async def get(self, request):
+        if await is_authenticated(request) or not request.GET.get("token"):
+            return redirect("home:main")
+        form = CheckOtpForm
+        return await arender(request, "account/check_otp.html", {"form": form})
+
+    async def post(self, request):
+        form = CheckOtpForm(request.POST)
+
+        if await is_valid(form):
+            cd = form.cleaned_data
+            token = request.GET.get("token")
+            store = get_verification_store()
+            otp = await store.aget("register", token)
+
+            # The record is gone once it is expired
+            if otp is not None:
+
+                if cd.get("code") == otp["code"]:
+                    password = await amake_password(otp["password"])
+                    user = await User.objects.acreate(phone=otp["phone"], full_name=otp["full_name"],
+                                                      password=password)
+                    await alogin(request, user, backend="account.authentication.CustomBackend")
+                    await store.adelete("register", token)
+                    return redirect("home:main")
+                form.add_error("code", "The code you entered is not correct!")
+                return await arender(request, "account/check_otp.html", {"form": form})
+
+            messages.add_message(request, messages.ERROR, "The code is expired")
+            return redirect("account:register")
+        return await arender(request, "account/check_otp.html", {"form": form})
+
+
+class UserLogin(View):
+    """
+    View for user login
+    using either phone number
+    or email
+    """
+
+    async def get(self, request):
+        if await is_authenticated(request):
+            return redirect("home:main")
+        form = UserLoginForm
+        return await arender(request, "account/login.html", {"form": form})
+
+    async def post(self, request):
+        form = UserLoginForm(request.POST)
+        if await is_valid(form):
+            cd = form.cleaned_data
+            username = cd.get("username")
+            password = cd.get("password")
+
+            user = await CustomBackend.aauthenticate(request, username, password,
+                                                     user=form.get_user())
+
+            if user:
+                await alogin(request, user, backend="account.authentication.CustomBackend")
+                return redirect("home:main")
+            else:
+                form.add_error("password", "Password incorrect!")
+                return await arender(request, "account/login.html", {"form": form})
+        return await arender(request, "account/login.html", {"form": form})
+
+
+class UserProfileEdit(View):
+    """
+    View for users to modify their
+    profile info
+    """
+
+    async def get(self, request):
+        if not await is_authenticated(request):
+            return redirect("account:login")
+        await sync_to_async(request.user.load_deferred_fields)()
+        form = UserProfileForm(instance=request.user)
+        return await arender(request, "account/user-profile-edit.html", {"form": form})
+
+    async def post(self, request):
+        if not await is_authenticated(request):
+            return redirect("account:login")
+        user = request.user
+        await sync_to_async(user.load_deferred_fields)()
+        old_phone = user.phone
+        old_email = user.email
+        form = UserProfileForm(request.POST, files=request.FILES,
+                               instance=request.user)
+
+        if await is_valid(form):
+            url = await aupdate_profile(request, form, old_phone, old_email)
+            if url:
+                return redirect(url)
+        return await arender(request, "account/user-profile-edit.html", {"form": form})
+
+
+class ChangePhone(View):
+    """
+    View for changing phone number
+    based on OTP code
+    """
+
+    async def get(self, request):
+        if not await is_authenticated(request) or not request.GET.get("token"):
+            return redirect("home:main")
+        form = CheckOtpForm
+        return await arender(request, "account/check_otp.html", {"form": form})
+
+    async def post(self, request):
+        form = CheckOtpForm(request.POST)
+        if await is_valid(form):
+            cd = form.cleaned_data
+            token = request.GET.get("token")
+            store = get_verification_store()
+
+            # The record is gone once it is expired
+            changed_user = await store.aget("change_phone", token)
+            if changed_user is None:
+                messages.add_message(request, messages.ERROR, "Expired! Please try again")
+                return redirect("account:user-profile")
+
+            # Return error if the code doesn't match
+            if changed_user["code"] != cd.get("code"):
+                messages.add_message(request, messages.ERROR, "Code is incorrect")
+                return redirect(flows.token_url("account:change-phone", token))
+
+            await achange_phone(request, changed_user)
+            await store.adelete("change_phone", token)
+            return redirect("account:user-profile")
+
+        return redirect("home:main")
+
+
+class ChangeEmail(View):
+    """
+    View for changing email
+    based on a link sent to email
+    """
+
+    async def get(self, request):
+        token = request.GET.get("token")
+        store = get_verification_store()
+
+        # Try to find a changed user with matching token
+        changed_user = await store.aget("change_email", token)
+        if changed_user is None:
+            messages.add_message(request, messages.ERROR, "The link is invalid or expired! Please try again")
+            return redirect("account:user-profile")
+
+        await achange_email(request, changed_user)
+        await store.adelete("change_email", token)
+        return redirect("account:user-profile")
+
+
+class PasswordResetPhone(View):
+
+    async def get(self, request):
+        if await is_authenticated(request):
+            return redirect("home:main")
+        form = PasswordResetPhoneForm
+        return await arender(request, "account/reset-password-phone.html", {"form": form})
+
+    async def post(self, request):
+        form = PasswordResetPhoneForm(request.POST)
+        if await is_valid(form):
+            token = flows.new_token()
+            await get_verification_store().aset("password_reset", token,
+                                                flows.password_reset(form.cleaned_data.get("phone")))
+            return redirect(flows.token_url("account:password-reset-otp", token))
+        return await arender(request, "account/reset-password-phone.html", {"form": form})
+
+
+class PasswordResetCheckOtp(View):
+
+    async def get(self, request):
+        if await is_authenticated(request) or not request.GET.get("token"):
+            return redirect("home:main")
+        form = PasswordResetOtpForm
+        return await arender(request, "account/reset-password-otp.html", {"form": form})
+
+    async def post(self, request):
+        form = PasswordResetOtpForm(request.POST)
+        if await is_valid(form):
+            cd = form.cleaned_data
+            token = request.GET.get("token")
+            store = get_verification_store()
+            password_reset_user = await store.aget("password_reset", token)
+            code = cd.get("code")
+
+            # The record is gone once it is expired
+            if password_reset_user is not None:
+                if password_reset_user["code"] == code:
+                    await store.aupdate("password_reset", token, phone_confirmed=True)
+                    return redirect(flows.token_url("account:password-reset", token))
+                form.add_error("code", "The code is incorrect")
+                return await arender(request, "account/reset-password-otp.html", {"form": form})
+            messages.add_message(request, messages.ERROR, "Expired! Please try again")
+            return redirect("account:password-reset-phone")
+        return await arender(request, "account/reset-password-otp.html", {"form": form})
+
+
+class PasswordReset(View):
+
+    async def get(self, request):
+        if await is_authenticated(request) or not request.GET.get("token"):
+            return redirect("home:main")
+        form = PasswordResetForm
+        return await arender(request, "account/reset-password.html", {"form": form})
+
+    async def post(self, request):
+        form = PasswordResetForm(request.POST)
+        if await is_valid(form):
+            cd = form.cleaned_data
+            token = request.GET.get("token")
+            store = get_verification_store()
+
+            password_reset_user = await store.aget("password_reset", token)
+            if password_reset_user is None:
+                messages.add_message(request, messages.ERROR, "Something went wrong! Try again")
+                return redirect("account:password-reset-phone")
+            if not password_reset_user["phone_confirmed"]:
+                messages.add_message(request, messages.ERROR, "First you should confirm your phone number")
+                return redirect(flows.token_url("account:password-reset-otp", token))
+
+            user = await User.objects.aget(phone=password_reset_user["phone"])
+            user.password = await amake_password(cd.get("password1"))
+            await sync_to_async(user.save)(update_fields=["password"])
+            await alogin(request, user, backend="account.authentication.CustomBackend")
+            await store.adelete("password_reset", token)
+            messages.add_message(request, messages.SUCCESS, "Your password was changed successfully")
+            return redirect("account:user-profile")
+        return await arender(request, "account/reset-password.html", {"form": form})
@@ -1,8 +1,52 @@
-from django.contrib.auth.hashers import check_password
-from django.db.models import Q
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import router
+from django.core.cache import caches
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
 
+from . import hashing
 from .models import User
 
+# The fields kept in the user cache: the ones the templates use, plus the
+# password and flags needed to check the session. The others are deferred,
+# the pages using them (the profile) load them in one query with
+# User.load_deferred_fields().
+USER_CACHE_FIELDS = ("id", "password", "phone", "full_name", "email",
+                     "is_active", "is_staff", "is_superuser")
+
+
+def get_user_cache_key(user_id):
+    return f"account.user:{user_id}"
+
+
+def cache_user(user):
+    caches[settings.USER_CACHE].set(
+        get_user_cache_key(user.pk),
+        tuple(getattr(user, field) for field in USER_CACHE_FIELDS),
+    )
+
+
+def get_cached_user(user_id):
+    values = caches[settings.USER_CACHE].get(get_user_cache_key(user_id))
+    if values is None:
+        return None
+    return User.from_db(router.db_for_read(User), USER_CACHE_FIELDS, values)
+
+
+def forget_user(user_id):
+    """
+    Drop the cached user, call it after updating
+    users with queryset.update() (no signals)
+    """
+    caches[settings.USER_CACHE].delete(get_user_cache_key(user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(instance, **kwargs):
+    forget_user(instance.pk)
+
 
 class CustomBackend(object):
     """
@@ -10,25 +54,66 @@ class CustomBackend(object):
     logging in with email/phone number
     """
     @staticmethod
-    def authenticate(request, username=None, password=None):
-        try:
-            user = User.objects.get(
-                Q(phone=username) | Q(email=username)
-            )
-
-        except User.DoesNotExist:
-            return None
+    def authenticate(request, username=None, password=None, user=None):
+        # The user may be already fetched by the login form
+        if user is None:
+            user = CustomBackend.get_user_by_username(username)
 
-        if user and user.password == password:
-            return user
-        elif user and check_password(password, user.password):
+        if user and user.check_password(password):
             return user
 
         return None
 
+    @staticmethod
+    async def aauthenticate(request, username=None, password=None, user=None):
+        # Async version of authenticate for the async views
+        if user is None:
+            user = await CustomBackend.aget_user_by_username(username)
+
+        if user:
+            is_correct, must_update = await hashing.acheck_password(password, user.password)
+            if is_correct:
+                # Rehash with the current parameters if they have changed
+                if must_update:
+                    user.password = await hashing.amake_password(password)
+                    await sync_to_async(user.save)(update_fields=["password"])
+                return user
+
+        return None
+
+    @staticmethod
+    def get_username_lookup(username):
+        """
+        Decide whether the username is an email
+        or a phone number before querying so
+        that a single indexed column is used
+        """
+        if "@" in username:
+            return {"normalized_email": User.normalize_login_email(username)}
+        return {"phone": username.strip()}
+
+    @staticmethod
+    def get_user_by_username(username):
+        # Find the user by either email or phone number
+        if not username:
+            return None
+        return User.objects.filter(**CustomBackend.get_username_lookup(username)).first()
+
+    @staticmethod
+    async def aget_user_by_username(username):
+        if not username:
+            return None
+        return await User.objects.filter(**CustomBackend.get_username_lookup(username)).afirst()
+
     @staticmethod
     def get_user(user_id):
+        # Called for request.user on every request, so cached for a short time
+        user = get_cached_user(user_id)
+        if user is not None:
+            return user
         try:
-            return User.objects.get(pk=user_id)
+            user = User.objects.only(*USER_CACHE_FIELDS).get(pk=user_id)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
+        cache_user(user)
+        return user
@@ -0,0 +1,5 @@
+class ServiceBusy(Exception):
+    """
+    Raised when a bounded worker pool or queue
+    is full, answered with 503 by ServiceBusyMiddleware
+    """
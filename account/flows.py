@@ -0,0 +1,150 @@
+"""
+Steps of the account flows shared by the views
+and the async views: the verification records,
+the codes and links sent and the changes saved.
+The async views run the ones touching the
+database in a thread.
+"""
+import random
+from uuid import uuid4
+
+from django.urls import reverse
+from django.contrib import messages
+from django.core.mail import EmailMessage
+from django.template.loader import render_to_string
+from django.contrib.sites.shortcuts import get_current_site
+
+from .models import User
+from .sms import send_otp
+from .verification import get_verification_store
+
+
+def new_token():
+    return uuid4().hex
+
+
+def token_url(name, token):
+    return reverse(name) + f"?token={token}"
+
+
+def send_code(phone):
+    # Queued, the SMS gateway sends it in the background
+    code = random.randint(100000, 999999)
+    send_otp(phone, code)
+    return str(code)
+
+
+def registration(cd):
+    """
+    Verification record of a UserRegisterForm,
+    its code is sent to the phone number
+    """
+    return {
+        "phone": cd.get("phone"),
+        "full_name": cd.get("full_name"),
+        "password": cd.get("password"),
+        "code": send_code(cd.get("phone")),
+    }
+
+
+def password_reset(phone):
+    return {
+        "phone": phone,
+        "code": send_code(phone),
+        "phone_confirmed": False,
+    }
+
+
+def update_profile(request, form, old_phone, old_email):
+    """
+    Save a valid UserProfileForm except a new
+    phone number or email, which are changed once
+    confirmed. Returns the URL of the phone code
+    check if the phone number changed.
+    """
+    user = form.instance
+    cd = form.cleaned_data
+    new_phone = cd.get("phone")
+    new_email = cd.get("email")
+    email_changed = bool(new_email) and new_email != old_email
+    phone_changed = new_phone != old_phone
+    store = get_verification_store()
+
+    # Check whether new email isn't already taken
+    if email_changed and User.objects.filter(
+            normalized_email=User.normalize_login_email(new_email)).exists():
+        form.add_error("email", "Email is already taken")
+        return None
+
+    # Queued before anything is saved, a full SMS queue (503) changes nothing
+    if phone_changed:
+        code = send_code(new_phone)
+
+    # Save the info except new phone/email (they need authorization)
+    form.save()
+    user.phone = old_phone
+    if email_changed:
+        user.email = old_email
+    user.save()
+
+    # If user wants to change his/her email address
+    if email_changed:
+        # Create token for email change
+        email_token = new_token()
+        store.set("change_email", email_token, {
+            "user_id": user.id,
+            "phone": new_phone,
+            "email": new_email,
+            "phone_change_successfull": not phone_changed,
+        })
+
+        # Send an email containing authorization link to user
+        current_site = get_current_site(request)  # to get the domain of the current site
+        mail_subject = 'Email change link sent!'
+        message = render_to_string('account/email-change-link.html', {
+            'user': user,
+            'url': str(current_site.domain) + token_url("account:change-email", email_token),
+        })
+        email = EmailMessage(
+            mail_subject, message, to=[new_email]
+        )
+        # Only queued here, the mailer sends it
+        email.send()
+
+        messages.add_message(request, messages.SUCCESS, f"Link is sent to {new_email}")
+
+    # If user wants to change his/her phone number
+    if phone_changed:
+        # Create token for phone change
+        phone_token = new_token()
+        store.set("change_phone", phone_token, {
+            "user_id": user.id,
+            "phone": new_phone,
+            "email": new_email or "",
+            "code": code,
+            "email_change_successfull": not email_changed,
+        })
+        return token_url("account:change-phone", phone_token)
+
+    # If neither email nor phone number needs authorization
+    if not email_changed:
+        messages.add_message(request, messages.SUCCESS, "Info modified successfully")
+    return None
+
+
+def change_phone(request, changed_user):
+    user = User.objects.get(id=changed_user["user_id"])
+    user.phone = changed_user["phone"]
+    user.save()
+
+    if not changed_user["email_change_successfull"]:
+        messages.add_message(request, messages.SUCCESS, f"Link is sent to {changed_user['email']}")
+    else:
+        messages.add_message(request, messages.SUCCESS, "Profile modified successfully")
+
+
+def change_email(request, changed_user):
+    user = User.objects.get(id=changed_user["user_id"])
+    user.email = changed_user["email"]
+    user.save()
+    messages.add_message(request, messages.SUCCESS, "Profile modified successfully")
@@ -1,9 +1,9 @@
 from django import forms
-from django.db.models import Q
 from django.core.validators import ValidationError
 from django.contrib.auth.forms import ReadOnlyPasswordHashField
 
 from .models import User
+from .authentication import CustomBackend
 
 
 class UserRegisterForm(forms.ModelForm):
@@ -68,12 +68,21 @@ class UserLoginForm(forms.Form):
     password = forms.CharField(widget=forms.PasswordInput(attrs={'placeholder': 'Password',
                                                                  'class': 'input100'}))
 
+    def __init__(self, *args, **kwargs):
+        self.user_cache = None
+        super().__init__(*args, **kwargs)
+
     def clean(self):
         # Check if there is a user with matching email/phone number
         username = self.cleaned_data.get("username")
-        if not User.objects.filter(Q(phone=username) | Q(email=username)).exists():
+        self.user_cache = CustomBackend.get_user_by_username(username)
+        if self.user_cache is None:
             raise ValidationError("No such user available!", "user_not_found")
 
+    def get_user(self):
+        # The user found while cleaning, to be reused for authentication
+        return self.user_cache
+
 
 class UserProfileForm(forms.ModelForm):
     """
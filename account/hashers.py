@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class CalibratedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 hasher with the work factor set in
+    settings.PASSWORD_HASHER_ITERATIONS (see the
+    calibrate_hasher command). The hashes of the
+    old work factor are updated on login.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASHER_ITERATIONS
@@ -0,0 +1,106 @@
+import time
+import asyncio
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+
+from .exceptions import ServiceBusy
+
+
+class HashingPoolBusy(ServiceBusy):
+    """
+    Raised when all the hashing workers
+    are busy and the waiting queue is full
+    """
+
+
+class HashingPool(object):
+    """
+    Bounded pool of threads for the CPU heavy
+    password hashing (hashlib releases the GIL
+    while hashing, so the threads run in parallel)
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix="password-hashing")
+        # One slot for every running or waiting job
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        self.timeout = timeout
+
+    def submit(self, func, *args):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise HashingPoolBusy("Password hashing pool is saturated")
+        return self.start(func, *args)
+
+    def start(self, func, *args):
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def run(self, func, *args):
+        return self.submit(func, *args).result()
+
+    async def arun(self, func, *args):
+        # Wait for a free slot without blocking the event loop
+        deadline = time.monotonic() + self.timeout
+        while not self.slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise HashingPoolBusy("Password hashing pool is saturated")
+            await asyncio.sleep(0.005)
+        return await asyncio.wrap_future(self.start(func, *args))
+
+
+@lru_cache(maxsize=None)
+def get_hashing_pool():
+    return HashingPool(settings.PASSWORD_HASHING_WORKERS,
+                       settings.PASSWORD_HASHING_QUEUE_SIZE,
+                       settings.PASSWORD_HASHING_TIMEOUT)
+
+
+@receiver(setting_changed)
+def reset_hashing_pool(setting, **kwargs):
+    if setting.startswith("PASSWORD_HASHING_"):
+        get_hashing_pool.cache_clear()
+
+
+def make_password(password):
+    return get_hashing_pool().run(hashers.make_password, password)
+
+
+def check_password(password, encoded, setter=None):
+    """
+    Like django's check_password, but the setter
+    (rehashing with the current parameters) is
+    called on the calling thread, not in the pool
+    """
+    updates = []
+    is_correct = get_hashing_pool().run(hashers.check_password, password, encoded,
+                                        updates.append if setter else None)
+    if updates:
+        setter(password)
+    return is_correct
+
+
+async def amake_password(password):
+    return await get_hashing_pool().arun(hashers.make_password, password)
+
+
+async def acheck_password(password, encoded):
+    """
+    Return whether the password is correct and
+    whether the encoded hash must be updated
+    """
+    updates = []
+    is_correct = await get_hashing_pool().arun(hashers.check_password, password,
+                                               encoded, updates.append)
+    return is_correct, bool(updates)
@@ -0,0 +1,185 @@
+import time
+import queue
+import heapq
+import atexit
+import logging
+import itertools
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import DatabaseError, close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class Mailer(object):
+    """
+    Outbound mail queue. A background thread
+    sends the queued messages in batches over
+    one reused connection, retries the failed
+    ones with exponential backoff and records
+    them as FailedEmail after the last attempt.
+    """
+
+    def __init__(self, backend, batch_size=20, max_attempts=5,
+                 retry_delay=5, idle_timeout=30):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.idle_timeout = idle_timeout
+
+        self.queue = queue.Queue()
+        # Heap of (due time, sequence, message, attempts)
+        self.retries = []
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        # Number of messages neither sent nor dead yet
+        self.pending = 0
+        self.idle = threading.Condition(self.lock)
+        self.worker = None
+        self.connection = None
+
+    def enqueue(self, messages):
+        with self.lock:
+            self.pending += len(messages)
+        for message in messages:
+            self.queue.put((message, 0))
+        self.start()
+
+    def start(self):
+        with self.lock:
+            if self.worker is None or not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.run, name="mailer", daemon=True)
+                self.worker.start()
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued message is
+        sent or recorded as failed
+        """
+        with self.idle:
+            return self.idle.wait_for(lambda: self.pending == 0, timeout)
+
+    def run(self):
+        while True:
+            batch = self.next_batch()
+            if not batch:
+                # Don't keep the connection open while idle
+                self.close()
+                continue
+
+            for message, attempts in batch:
+                self.send(message, attempts)
+
+    def next_batch(self):
+        batch = []
+        with self.lock:
+            now = time.monotonic()
+            while self.retries and self.retries[0][0] <= now and len(batch) < self.batch_size:
+                _, _, message, attempts = heapq.heappop(self.retries)
+                batch.append((message, attempts))
+            timeout = self.idle_timeout
+            if self.retries:
+                timeout = min(timeout, self.retries[0][0] - now)
+
+        if not batch:
+            try:
+                batch.append(self.queue.get(timeout=max(timeout, 0)))
+            except queue.Empty:
+                return batch
+
+        # Take the other pending messages without waiting
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def send(self, message, attempts):
+        try:
+            if self.connection is None:
+                self.connection = get_connection(self.backend, fail_silently=False)
+                self.connection.open()
+            self.connection.send_messages([message])
+        except Exception as error:
+            # The connection may be broken, open a new one next time
+            self.close()
+            self.failed(message, attempts + 1, error)
+        else:
+            self.done()
+
+    def failed(self, message, attempts, error):
+        if attempts < self.max_attempts:
+            delay = self.retry_delay * 2 ** (attempts - 1)
+            logger.warning("Sending email to %s failed (%s), retrying in %ss",
+                           message.to, error, delay)
+            with self.lock:
+                heapq.heappush(self.retries, (time.monotonic() + delay,
+                                              next(self.sequence), message, attempts))
+            return
+
+        logger.error("Sending email to %s failed %s times: %s",
+                     message.to, attempts, error)
+        self.dead_letter(message, attempts, error)
+        self.done()
+
+    @staticmethod
+    def dead_letter(message, attempts, error):
+        from .models import FailedEmail
+
+        try:
+            FailedEmail.objects.create(subject=message.subject,
+                                       body=message.body,
+                                       from_email=message.from_email,
+                                       to=", ".join(message.to),
+                                       error=repr(error),
+                                       attempts=attempts)
+        except DatabaseError:
+            logger.exception("Recording the failed email failed")
+        finally:
+            close_old_connections()
+
+    def done(self):
+        with self.idle:
+            self.pending -= 1
+            if self.pending == 0:
+                self.idle.notify_all()
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+
+@lru_cache(maxsize=None)
+def get_mailer():
+    config = settings.MAILER
+    mailer = Mailer(config["BACKEND"],
+                    batch_size=config.get("BATCH_SIZE", 20),
+                    max_attempts=config.get("MAX_ATTEMPTS", 5),
+                    retry_delay=config.get("RETRY_DELAY", 5),
+                    idle_timeout=config.get("IDLE_TIMEOUT", 30))
+    # Give the queued messages a chance before the process exits
+    atexit.register(mailer.flush, config.get("EXIT_TIMEOUT", 10))
+    return mailer
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Email backend which puts the messages in the
+    mail queue instead of sending them in the request
+    """
+
+    def send_messages(self, email_messages):
+        email_messages = list(email_messages)
+        if email_messages:
+            get_mailer().enqueue(email_messages)
+        return len(email_messages)
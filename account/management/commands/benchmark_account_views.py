@@ -0,0 +1,249 @@
+import asyncio
+import io
+import os
+import tempfile
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import connection, connections
+from django.urls import include, path
+from django.test import override_settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+from account.sessions import flush_pending_sessions
+from account.models import User
+from account.verification import get_verification_store
+
+
+class SyncUrls:
+    urlpatterns = [
+        path("", include("home.urls")),
+        path("account/", include("account.urls")),
+    ]
+
+
+class AsyncUrls:
+    urlpatterns = [
+        path("", include("home.urls")),
+        path("account/", include("account.async_urls")),
+    ]
+
+
+class Response(object):
+
+    def __init__(self, status, headers):
+        self.status = status
+        self.headers = headers
+        self.cookies = SimpleCookie()
+        for name, value in headers:
+            if name.lower() == "set-cookie":
+                self.cookies.load(value)
+
+    @property
+    def location(self):
+        return next((value for name, value in self.headers if name.lower() == "location"), "")
+
+
+class Browser(object):
+    """
+    The cookies of one visitor, and the headers
+    of its form posts: CsrfViewMiddleware is in
+    the chain here, unlike with the test Client
+    """
+    # A secret of CSRF_SECRET_LENGTH characters, also valid as the token
+    csrf_token = "b" * 32
+
+    def __init__(self, number):
+        self.number = number
+        self.cookies = {"csrftoken": self.csrf_token}
+
+    def post(self, url, data):
+        path, _, query = url.partition("?")
+        body = urlencode(data).encode()
+        headers = {
+            "host": "testserver",
+            "content-type": "application/x-www-form-urlencoded",
+            "content-length": str(len(body)),
+            "cookie": "; ".join(f"{name}={value}" for name, value in self.cookies.items()),
+            "x-csrftoken": self.csrf_token,
+        }
+        return path, query, body, headers
+
+    def update(self, response):
+        for name, morsel in response.cookies.items():
+            self.cookies[name] = morsel.value
+        return response
+
+
+class Command(BaseCommand):
+    help = ("Compare the throughput of the sync views under the WSGI handler and of "
+            "the async views under the ASGI handler, with the whole middleware chain "
+            "and the same number of requests in flight, for the login and register flows. "
+            "Run with a low PASSWORD_HASHER_ITERATIONS to measure the handlers and views "
+            "rather than the password hashing.")
+
+    password = "benchmark-password"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200,
+                            help="Number of flows run for every case")
+        parser.add_argument("--concurrency", type=int, default=20,
+                            help="Number of flows running at the same time: threads of "
+                                 "the WSGI worker, requests in flight on the ASGI one")
+
+    def handle(self, *args, **options):
+        # A file database, so that the threads share the data
+        directory = tempfile.mkdtemp()
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, "benchmark.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.create_users(options["requests"])
+            for flow in ("login", "register"):
+                for mode in ("wsgi", "asgi"):
+                    self.run_case(flow, mode, options["requests"], options["concurrency"])
+        finally:
+            # Written now, their database is gone at exit
+            flush_pending_sessions()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def create_users(self, count):
+        user = User(phone="0", full_name="Benchmark User")
+        user.set_password(self.password)
+        User.objects.bulk_create(
+            User(phone=f"1{number:010d}", full_name=user.full_name, password=user.password)
+            for number in range(count)
+        )
+
+    def run_case(self, flow, mode, requests, concurrency):
+        urls = AsyncUrls if mode == "asgi" else SyncUrls
+        with override_settings(ROOT_URLCONF=urls, ALLOWED_HOSTS=["testserver"], DEBUG=False,
+                               RATE_LIMITS={}):
+            start = time.perf_counter()
+            if mode == "asgi":
+                failures = asyncio.run(self.run_asgi(flow, requests, concurrency))
+            else:
+                failures = self.run_wsgi(flow, requests, concurrency)
+            elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{flow:<9} {mode:<5} {requests / elapsed:8.1f} flows/s"
+            f"  ({elapsed:.2f}s, {concurrency} in flight, {failures} failed)"
+        )
+
+    def get_form(self, flow, browser, offset=0):
+        if flow == "login":
+            return "/account/login", {"username": f"1{browser.number:010d}",
+                                      "password": self.password}
+        return "/account/register", {"phone": f"2{offset + browser.number:010d}",
+                                     "full_name": "Benchmark User",
+                                     "password": self.password, "password2": self.password}
+
+    def run_wsgi(self, flow, requests, concurrency):
+        application = WSGIHandler()
+
+        def post(browser, url, data):
+            path, query, body, headers = browser.post(url, data)
+            environ = {
+                "REQUEST_METHOD": "POST",
+                "PATH_INFO": path,
+                "QUERY_STRING": query,
+                "SCRIPT_NAME": "",
+                "SERVER_NAME": "testserver",
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "REMOTE_ADDR": "127.0.0.1",
+                "CONTENT_TYPE": headers.pop("content-type"),
+                "CONTENT_LENGTH": headers.pop("content-length"),
+                "wsgi.input": io.BytesIO(body),
+                "wsgi.url_scheme": "http",
+                "wsgi.errors": io.StringIO(),
+                **{"HTTP_" + name.upper().replace("-", "_"): value
+                   for name, value in headers.items()},
+            }
+            started = {}
+
+            def start_response(status, response_headers, exc_info=None):
+                started["status"] = int(status.split()[0])
+                started["headers"] = response_headers
+
+            result = application(environ, start_response)
+            b"".join(result)
+            result.close()
+            return browser.update(Response(started["status"], started["headers"]))
+
+        def run(number):
+            browser = Browser(number)
+            response = post(browser, *self.get_form(flow, browser))
+            if flow == "register":
+                token = response.location.split("token=")[1]
+                otp = get_verification_store().get("register", token)
+                response = post(browser, urlsplit(response.location).path + f"?token={token}",
+                                {"code": otp["code"]})
+            return response.status == 302 and response.location == "/"
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(run, range(requests)))
+        connections.close_all()
+        return results.count(False)
+
+    async def run_asgi(self, flow, requests, concurrency):
+        application = ASGIHandler()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def post(browser, url, data):
+            path, query, body, headers = browser.post(url, data)
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "POST",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": query.encode(),
+                "root_path": "",
+                "headers": [(name.encode(), value.encode()) for name, value in headers.items()],
+                "client": ("127.0.0.1", 50000 + browser.number % 10000),
+                "server": ("testserver", 80),
+            }
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+            disconnected = asyncio.Event()
+            started = {}
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    started["status"] = message["status"]
+                    started["headers"] = [(name.decode(), value.decode())
+                                          for name, value in message["headers"]]
+
+            await application(scope, receive, send)
+            disconnected.set()
+            return browser.update(Response(started["status"], started["headers"]))
+
+        async def run(number):
+            async with slots:
+                browser = Browser(number)
+                response = await post(browser, *self.get_form(flow, browser, offset=requests))
+                if flow == "register":
+                    token = response.location.split("token=")[1]
+                    otp = await get_verification_store().aget("register", token)
+                    response = await post(browser,
+                                          urlsplit(response.location).path + f"?token={token}",
+                                          {"code": otp["code"]})
+                return response.status == 302 and response.location == "/"
+
+        results = await asyncio.gather(*(run(number) for number in range(requests)))
+        # Close the connection of the thread used by the async ORM
+        await sync_to_async(connections.close_all)()
+        return results.count(False)
@@ -0,0 +1,134 @@
+import random
+import statistics
+import time
+from uuid import uuid4
+
+from django.db import connection
+from django.utils import timezone
+from django.core.management import call_command
+from django.db.migrations.executor import MigrationExecutor
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ("Measure the latency of the account lookups on a throwaway "
+            "test database before and after the lookup indexes")
+
+    before = ("account", "0002_expiration_index")
+    after = ("account", "0003_lookup_indexes")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000000,
+                            help="Number of rows in every table")
+        parser.add_argument("--queries", type=int, default=100,
+                            help="Number of timed lookups of every kind")
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.migrate(self.before)
+            keys = self.populate(options["rows"], options["batch_size"])
+            self.report("before", self.measure(keys, options["queries"]))
+
+            start = time.perf_counter()
+            self.migrate(self.after)
+            self.stdout.write(f"indexes built in {time.perf_counter() - start:.1f}s")
+            self.report("after", self.measure(keys, options["queries"]))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def migrate(self, target):
+        call_command("migrate", *target, verbosity=0)
+        self.target = target
+
+    def get_model(self, name):
+        # Use the models of the migration the database is at
+        executor = MigrationExecutor(connection)
+        state = executor.loader.project_state(self.target)
+        return state.apps.get_model("account", name)
+
+    def populate(self, rows, batch_size):
+        User = self.get_model("User")
+        Otp = self.get_model("Otp")
+        ChangedUser = self.get_model("ChangedUser")
+        ResetPasswordOtp = self.get_model("ResetPasswordOtp")
+        expiration = timezone.now() + timezone.timedelta(minutes=10)
+        keys = {"email": [], "token": [], "reset_token": [],
+                "phone_token": [], "email_token": [], "user_id": []}
+
+        start = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            size = min(batch_size, rows - offset)
+            numbers = range(offset, offset + size)
+            users = User.objects.bulk_create(
+                User(phone=f"{number:011d}", email=f"user{number}@example.com",
+                     full_name="Benchmark User", password="!")
+                for number in numbers
+            )
+            otps = Otp.objects.bulk_create(
+                Otp(phone=f"{number:011d}", full_name="Benchmark User", password="!",
+                    token=uuid4().hex, code="123456", expiration=expiration)
+                for number in numbers
+            )
+            resets = ResetPasswordOtp.objects.bulk_create(
+                ResetPasswordOtp(phone=f"{number:011d}", token=uuid4().hex,
+                                 code="123456", expiration=expiration)
+                for number in numbers
+            )
+            changes = ChangedUser.objects.bulk_create(
+                ChangedUser(user_id=user.pk, phone=user.phone, email=user.email,
+                            code="123456", phone_token=uuid4().hex,
+                            email_token=uuid4().hex, expiration=expiration)
+                for user in users
+            )
+
+            # Keep a sample of the keys for the lookups
+            keys["email"] += [user.email for user in users[::100]]
+            keys["token"] += [otp.token for otp in otps[::100]]
+            keys["reset_token"] += [reset.token for reset in resets[::100]]
+            keys["phone_token"] += [change.phone_token for change in changes[::100]]
+            keys["email_token"] += [change.email_token for change in changes[::100]]
+            keys["user_id"] += [user.pk for user in users[::100]]
+        self.stdout.write(f"{rows} rows per table created in {time.perf_counter() - start:.1f}s")
+        return keys
+
+    def measure(self, keys, queries):
+        User = self.get_model("User")
+        Otp = self.get_model("Otp")
+        ChangedUser = self.get_model("ChangedUser")
+        ResetPasswordOtp = self.get_model("ResetPasswordOtp")
+        lookups = {
+            "User.email": lambda: User.objects.filter(
+                email=random.choice(keys["email"])).first(),
+            "Otp.token": lambda: Otp.objects.filter(
+                token=random.choice(keys["token"])).first(),
+            "ResetPasswordOtp.token": lambda: ResetPasswordOtp.objects.filter(
+                token=random.choice(keys["reset_token"])).first(),
+            "ChangedUser.phone_token+code": lambda: ChangedUser.objects.filter(
+                phone_token=random.choice(keys["phone_token"]), code="123456").first(),
+            "ChangedUser.email_token": lambda: ChangedUser.objects.filter(
+                email_token=random.choice(keys["email_token"])).first(),
+            "ChangedUser.user_id": lambda: ChangedUser.objects.filter(
+                user_id=random.choice(keys["user_id"])).first(),
+        }
+
+        results = {}
+        for name, lookup in lookups.items():
+            timings = []
+            for _ in range(queries):
+                start = time.perf_counter()
+                lookup()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = timings
+        return results
+
+    def report(self, label, results):
+        self.stdout.write(f"\n{label}:")
+        for name, timings in results.items():
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            self.stdout.write(
+                f"  {name:<30} mean {statistics.mean(timings):9.3f}ms"
+                f"  p95 {p95:9.3f}ms"
+            )
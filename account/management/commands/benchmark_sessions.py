@@ -0,0 +1,106 @@
+from collections import Counter
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.management.base import BaseCommand
+
+from account.models import User
+from account.sessions import flush_pending_sessions
+
+
+class Command(BaseCommand):
+    help = ("Count the django_session reads and writes per request of the "
+            "home page and the login flow for the session configurations")
+
+    password = "benchmark-password"
+
+    configurations = {
+        "database sessions": {
+            "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+            "middleware": "django.contrib.sessions.middleware.SessionMiddleware",
+            "SESSION_ANONYMOUS_SIGNED_COOKIES": False,
+        },
+        "cached write-behind": {
+            "SESSION_ENGINE": "account.sessions",
+            "middleware": "account.sessions.SessionMiddleware",
+            "SESSION_ANONYMOUS_SIGNED_COOKIES": False,
+        },
+        "cached write-behind + signed anonymous": {
+            "SESSION_ENGINE": "account.sessions",
+            "middleware": "account.sessions.SessionMiddleware",
+            "SESSION_ANONYMOUS_SIGNED_COOKIES": True,
+        },
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50,
+                            help="Number of visitors going through the flow")
+        parser.add_argument("--pages", type=int, default=10,
+                            help="Home page views after logging in")
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.create_users(options["users"])
+            for name, configuration in self.configurations.items():
+                self.run_configuration(name, configuration, options["users"], options["pages"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def create_users(self, count):
+        user = User(phone="0", full_name="Benchmark User")
+        user.set_password(self.password)
+        User.objects.bulk_create(
+            User(phone=f"1{number:010d}", full_name=user.full_name, password=user.password)
+            for number in range(count)
+        )
+
+    def run_configuration(self, name, configuration, users, pages):
+        from django.conf import settings
+
+        middleware = [configuration["middleware"] if "SessionMiddleware" in item else item
+                      for item in settings.MIDDLEWARE]
+        requests, reads, writes = Counter(), Counter(), Counter()
+
+        with override_settings(SESSION_ENGINE=configuration["SESSION_ENGINE"],
+                               SESSION_ANONYMOUS_SIGNED_COOKIES=configuration[
+                                   "SESSION_ANONYMOUS_SIGNED_COOKIES"],
+                               MIDDLEWARE=middleware, RATE_LIMITS={},
+                               ALLOWED_HOSTS=["testserver"]):
+            for number in range(users):
+                client = Client()
+                steps = [
+                    ("anonymous home", lambda: client.get("/")),
+                    ("login page", lambda: client.get("/account/login")),
+                    ("login post", lambda: client.post("/account/login", {
+                        "username": f"1{number:010d}", "password": self.password,
+                    })),
+                ] + [("authenticated home", lambda: client.get("/"))] * pages
+
+                for step, request in steps:
+                    with CaptureQueriesContext(connection) as queries:
+                        request()
+                    requests[step] += 1
+                    for query in queries.captured_queries:
+                        sql = query["sql"]
+                        if "django_session" not in sql:
+                            continue
+                        if sql.startswith("SELECT"):
+                            reads[step] += 1
+                        elif not sql.startswith(("SAVEPOINT", "RELEASE")):
+                            writes[step] += 1
+
+            # Count the sessions still waiting in the write-behind buffer
+            with CaptureQueriesContext(connection) as queries:
+                flush_pending_sessions()
+            final_writes = len([query for query in queries.captured_queries
+                                if query["sql"].startswith("INSERT")])
+
+        self.stdout.write(f"\n{name}:")
+        for step in requests:
+            self.stdout.write(
+                f"  {step:<20} reads {reads[step] / requests[step]:5.2f}"
+                f"  writes {writes[step] / requests[step]:5.2f}  per request"
+            )
+        self.stdout.write(f"  {'final flush':<20} writes {final_writes}")
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class Command(BaseCommand):
+    help = ("Measure the PBKDF2 hasher on this machine and print the "
+            "number of iterations taking the target time")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--target-ms", type=float, default=100,
+                            help="Wanted duration of one password hash")
+        parser.add_argument("--rounds", type=int, default=5,
+                            help="Number of measured hashes")
+
+    def handle(self, *args, **options):
+        hasher = PBKDF2PasswordHasher()
+        salt = hasher.salt()
+        sample = 100000
+
+        # Take the fastest run, the others are slowed down by noise
+        per_iteration = min(
+            self.measure(hasher, salt, sample) for _ in range(options["rounds"])
+        ) / sample
+        iterations = max(int(options["target_ms"] / 1000 / per_iteration), 1000)
+        iterations = round(iterations, -3)
+
+        duration = self.measure(hasher, salt, iterations) * 1000
+        current = settings.PASSWORD_HASHER_ITERATIONS
+        self.stdout.write(
+            f"Current: {current} iterations "
+            f"({self.measure(hasher, salt, current) * 1000:.1f}ms)"
+        )
+        self.stdout.write(f"Calibrated: {iterations} iterations ({duration:.1f}ms)")
+        self.stdout.write(
+            "Set it in the environment (or .env) to apply it, the existing "
+            "hashes are updated on the next login:"
+        )
+        self.stdout.write(f"PASSWORD_HASHER_ITERATIONS={iterations}")
+
+    @staticmethod
+    def measure(hasher, salt, iterations):
+        start = time.perf_counter()
+        hasher.encode("calibration-password", salt, iterations)
+        return time.perf_counter() - start
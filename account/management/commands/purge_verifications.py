@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from account.models import Otp, ChangedUser, ResetPasswordOtp
+from account.verification import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete the expired OTP, password reset and profile change rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of rows deleted in each transaction",
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0,
+            help="Seconds to sleep between two batches",
+        )
+
+    def handle(self, *args, **options):
+        for model in (Otp, ChangedUser, ResetPasswordOtp):
+            start = time.perf_counter()
+            deleted = purge_expired(model, options["batch_size"], options["pause"])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}: "
+                f"removed {deleted} rows in {elapsed:.3f}s"
+            )
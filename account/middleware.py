@@ -0,0 +1,21 @@
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .exceptions import ServiceBusy
+
+
+class ServiceBusyMiddleware(MiddlewareMixin):
+    """
+    Answer with 503 instead of queueing more work
+    when the password hashing pool or the SMS
+    queue is full. Async under ASGI, Django runs
+    process_exception in a thread either way.
+    """
+
+    @staticmethod
+    def process_exception(request, exception):
+        if isinstance(exception, ServiceBusy):
+            response = HttpResponse("Server is busy, please try again", status=503)
+            response["Retry-After"] = "1"
+            return response
+        return None
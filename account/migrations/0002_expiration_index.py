@@ -0,0 +1,28 @@
+# Generated by Django 4.1.6 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='changeduser',
+            name='expiration',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='otp',
+            name='expiration',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='resetpasswordotp',
+            name='expiration',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def delete_orphan_changes(apps, schema_editor):
+    # Rows pointing to deleted users would break the foreign key
+    User = apps.get_model("account", "User")
+    ChangedUser = apps.get_model("account", "ChangedUser")
+    ChangedUser.objects.exclude(
+        user_id__in=User.objects.values("id")
+    ).exclude(user_id=None).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_expiration_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_orphan_changes, migrations.RunPython.noop),
+        migrations.RenameField(
+            model_name='changeduser',
+            old_name='user_id',
+            new_name='user',
+        ),
+        migrations.AlterField(
+            model_name='changeduser',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='changes', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='changeduser',
+            name='email_token',
+            field=models.CharField(blank=True, max_length=300, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='changeduser',
+            name='phone_token',
+            field=models.CharField(blank=True, max_length=300, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='otp',
+            name='token',
+            field=models.CharField(max_length=300, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='resetpasswordotp',
+            name='token',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
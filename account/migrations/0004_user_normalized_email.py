@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+
+def fill_normalized_email(apps, schema_editor):
+    User = apps.get_model("account", "User")
+    users = User.objects.exclude(email=None).exclude(email="").only("id", "email")
+    for user in users.iterator():
+        user.normalized_email = user.email.strip().casefold()
+        user.save(update_fields=["normalized_email"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0003_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='normalized_email',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255, null=True),
+        ),
+        migrations.RunPython(fill_normalized_email, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.6 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_user_normalized_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FailedEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('from_email', models.CharField(max_length=255)),
+                ('to', models.TextField()),
+                ('error', models.TextField()),
+                ('attempts', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'failed email',
+                'verbose_name_plural': 'failed emails',
+            },
+        ),
+    ]
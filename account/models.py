@@ -2,6 +2,7 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser
 
+from . import hashing
 from .managers import UserManager
 
 
@@ -17,6 +18,15 @@ class User(AbstractBaseUser):
         max_length=255,
         blank=True,
         null=True,
+        db_index=True,
+    )
+    # Case-folded email used for the login lookups
+    normalized_email = models.CharField(
+        max_length=255,
+        blank=True,
+        null=True,
+        editable=False,
+        db_index=True,
     )
     full_name = models.CharField(
         max_length=50,
@@ -47,6 +57,39 @@ class User(AbstractBaseUser):
     def __str__(self):
         return self.phone
 
+    def save(self, *args, **kwargs):
+        self.normalized_email = self.normalize_login_email(self.email)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "email" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "normalized_email"}
+        super().save(*args, **kwargs)
+
+    def set_password(self, raw_password):
+        # Hash on the bounded worker pool
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        # Rehash with the current parameters if they have changed
+        def setter(raw_password):
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=["password"])
+
+        return hashing.check_password(raw_password, self.password, setter)
+
+    def load_deferred_fields(self):
+        # Users from the user cache carry only a few fields, load the rest at once
+        deferred = self.get_deferred_fields()
+        if deferred:
+            self.refresh_from_db(fields=deferred)
+
+    @staticmethod
+    def normalize_login_email(email):
+        if not email:
+            return None
+        return email.strip().casefold()
+
     def has_perm(self, perm, obj=None):
         "Does the user have a specific permission?"
         # Simplest possible answer: Yes, always
@@ -67,9 +110,9 @@ class Otp(models.Model):
     phone = models.CharField(max_length=11)
     full_name = models.CharField(max_length=50)
     password = models.CharField(max_length=1000)
-    token = models.CharField(max_length=300)
+    token = models.CharField(max_length=300, unique=True)
     code = models.CharField(max_length=6)
-    expiration = models.DateTimeField(null=True, blank=True)
+    expiration = models.DateTimeField(null=True, blank=True, db_index=True)
 
     class Meta:
         verbose_name = "OTP code"
@@ -88,13 +131,19 @@ class ChangedUser(models.Model):
     of the users who want to
     modify their profile
     """
-    user_id = models.IntegerField(null=True, blank=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="changes",
+        null=True,
+        blank=True,
+    )
     phone = models.CharField(max_length=11)
     email = models.CharField(max_length=100)
     code = models.CharField(max_length=6, null=True, blank=True)
-    phone_token = models.CharField(max_length=300, null=True, blank=True)
-    email_token = models.CharField(max_length=300, null=True, blank=True)
-    expiration = models.DateTimeField()
+    phone_token = models.CharField(max_length=300, null=True, blank=True, unique=True)
+    email_token = models.CharField(max_length=300, null=True, blank=True, unique=True)
+    expiration = models.DateTimeField(db_index=True)
     phone_change_successfull = models.BooleanField(default=False)
     email_change_successfull = models.BooleanField(default=False)
 
@@ -111,12 +160,33 @@ class ChangedUser(models.Model):
 
 class ResetPasswordOtp(models.Model):
     phone = models.CharField(max_length=11)
-    token = models.CharField(max_length=100)
+    token = models.CharField(max_length=100, unique=True)
     code = models.CharField(max_length=6)
-    expiration = models.DateTimeField()
+    expiration = models.DateTimeField(db_index=True)
     phone_confirmed = models.BooleanField(default=False)
 
     def is_not_expired(self):
         if self.expiration >= timezone.localtime(timezone.now()):
             return True
         return False
+
+
+class FailedEmail(models.Model):
+    """
+    Dead-letter record of the emails which
+    couldn't be delivered by the mail queue
+    """
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    to = models.TextField()
+    error = models.TextField()
+    attempts = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "failed email"
+        verbose_name_plural = "failed emails"
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to}"
@@ -0,0 +1,164 @@
+import math
+import time
+import hashlib
+from functools import wraps, lru_cache
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .authentication import CustomBackend
+
+periods = {"s": 1, "m": 60, "h": 60 * 60, "d": 60 * 60 * 24}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Turn a rate like "5/m" into the number of
+    requests and the seconds of the period
+    """
+    count, period = rate.split("/")
+    return int(count), periods[period]
+
+
+def get_key_value(request, kind):
+    # The values the requests are limited by
+    if kind == "ip":
+        return request.META.get(settings.RATE_LIMIT_IP_META)
+    if kind == "token":
+        return request.GET.get("token")
+    # Any other kind is a field of the submitted form (phone, username)
+    value = request.POST.get(kind)
+    if not value or not value.strip():
+        return None
+    # Normalized like the login lookup, so that " User@Example.com"
+    # and "user@example.com" share the bucket of their account
+    (field, value), = CustomBackend.get_username_lookup(value).items()
+    return f"{field}:{value}"
+
+
+def count_request(cache, key, timeout):
+    # incr() and add() are atomic, also in a cache the processes share
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)
+
+
+def take_tokens(cache, buckets):
+    """
+    Count the request in every (key, count,
+    period) bucket, a counter per period. Returns
+    the seconds to wait if one of them is full,
+    the request isn't counted in any then.
+    """
+    now = time.time()
+    counted = []
+    wait = 0
+    for key, count, period in buckets:
+        window = int(now // period)
+        window_key = f"{key}:{window}"
+        counted.append(window_key)
+        if count_request(cache, window_key, period) > count:
+            wait = (window + 1) * period - now
+            break
+    if wait:
+        for window_key in counted:
+            cache.decr(window_key)
+    return wait
+
+
+def check_rate_limits(request, name, limits):
+    """
+    Return a 429 response if one of the
+    limits of the view is exceeded
+    """
+    buckets = []
+    for kind, rate in limits.items():
+        value = get_key_value(request, kind)
+        if not value:
+            continue
+        # Fixed-length keys, without the usernames in them
+        digest = hashlib.sha256(value.encode()).hexdigest()
+        buckets.append((f"ratelimit:{name}:{kind}:{digest}", *parse_rate(rate)))
+
+    wait = take_tokens(caches[settings.RATE_LIMIT_CACHE], buckets)
+    if wait:
+        response = HttpResponse("Too many requests, please try again later", status=429)
+        response["Retry-After"] = str(math.ceil(wait))
+        return response
+    return None
+
+
+# For the async views. Only the cache is used, so no need for the thread
+# of the database connection.
+acheck_rate_limits = sync_to_async(check_rate_limits, thread_sensitive=False)
+
+
+def rate_limit(name, methods=("POST",), **limits):
+    """
+    Decorator version of RateLimitMiddleware,
+    e.g. @rate_limit("newsletter", ip="5/m")
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method in methods:
+                    response = await acheck_rate_limits(request, name, limits)
+                    if response is not None:
+                        return response
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                response = check_rate_limits(request, name, limits)
+                if response is not None:
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_limits(request):
+    if request.method not in settings.RATE_LIMIT_METHODS:
+        return None, None
+    name = request.resolver_match.view_name
+    return name, settings.RATE_LIMITS.get(name)
+
+
+class RateLimitMiddleware(MiddlewareMixin):
+    """
+    Limit the requests to the views listed in
+    settings.RATE_LIMITS by their URL name, before
+    any form or database work of the view happens.
+    Async under ASGI, so the async views stay on
+    the event loop.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        # Django runs process_view in the mode of the handler
+        if iscoroutinefunction(self.get_response):
+            self.process_view = self.aprocess_view
+
+    @staticmethod
+    def process_view(request, view_func, view_args, view_kwargs):
+        name, limits = get_limits(request)
+        if not limits:
+            return None
+        return check_rate_limits(request, name, limits)
+
+    @staticmethod
+    async def aprocess_view(request, view_func, view_args, view_kwargs):
+        name, limits = get_limits(request)
+        if not limits:
+            return None
+        return await acheck_rate_limits(request, name, limits)
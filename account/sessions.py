@@ -0,0 +1,221 @@
+import time
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.core.cache import caches
+from django.dispatch import receiver
+from django.db import DatabaseError, transaction
+from django.core.signals import request_finished
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends import db, signed_cookies
+from django.contrib.sessions.backends.base import CreateError, UpdateError, VALID_KEY_CHARS
+from django.contrib.sessions.middleware import SessionMiddleware as BaseSessionMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Cached in place of a deleted session, so that no worker reads
+# it from its buffer or writes it back to the database
+DELETED = "deleted"
+
+
+class WriteBehindBuffer(object):
+    """
+    Session rows waiting to be written to the
+    database. They are written together in one
+    transaction at most every
+    SESSION_WRITE_BEHIND_INTERVAL seconds, by the
+    request which finds the interval passed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.flushed_at = time.monotonic()
+
+    def add(self, session_key, session_data, expire_date):
+        with self.lock:
+            self.pending[session_key] = (session_data, expire_date)
+
+    def get(self, session_key):
+        with self.lock:
+            return self.pending.get(session_key)
+
+    def discard(self, session_key):
+        with self.lock:
+            self.pending.pop(session_key, None)
+
+    def flush_if_due(self):
+        if time.monotonic() - self.flushed_at >= settings.SESSION_WRITE_BEHIND_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.flushed_at = time.monotonic()
+        if not pending:
+            return
+
+        # Deleted meanwhile, maybe by another worker
+        prefix = SessionStore.cache_key_prefix
+        cached = caches[settings.SESSION_CACHE_ALIAS].get_many(prefix + key for key in pending)
+        pending = {key: value for key, value in pending.items()
+                   if cached.get(prefix + key) != DELETED}
+
+        Session = db.SessionStore.get_model_class()
+        rows = [Session(session_key=key, session_data=data, expire_date=expire_date)
+                for key, (data, expire_date) in pending.items()]
+        try:
+            with transaction.atomic():
+                Session.objects.bulk_create(
+                    rows, update_conflicts=True, unique_fields=["session_key"],
+                    update_fields=["session_data", "expire_date"],
+                )
+        except DatabaseError:
+            logger.exception("Writing %s sessions failed", len(rows))
+            # Keep them for the next flush, unless they were changed meanwhile
+            with self.lock:
+                for key, value in pending.items():
+                    self.pending.setdefault(key, value)
+
+
+write_behind = WriteBehindBuffer()
+
+
+@atexit.register
+def flush_pending_sessions():
+    """
+    Write the buffered sessions now, called when
+    the worker process exits
+    """
+    write_behind.flush()
+
+
+@receiver(request_finished)
+def flush_sessions_if_due(**kwargs):
+    write_behind.flush_if_due()
+
+
+class SessionStore(db.SessionStore):
+    """
+    Database session store with a cache in front
+    of it (SESSION_CACHE_ALIAS) and delayed,
+    batched writes. Sessions which didn't really
+    change are not written.
+
+    The cache has to be shared by the workers
+    (see home.checks): the sessions waiting for
+    the flush, and the deleted ones, are only
+    known to the others through it.
+    """
+    cache_key_prefix = "account.sessions"
+
+    @property
+    def cache(self):
+        return caches[settings.SESSION_CACHE_ALIAS]
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    def load(self):
+        if self.session_key is None:
+            return {}
+
+        # The cache, then the writes waiting for the flush, then the database
+        entry = self.cache.get(self.cache_key)
+        if entry == DELETED:
+            self._session_key = None
+            return {}
+        entry = entry or write_behind.get(self.session_key)
+        if entry is None:
+            obj = self._get_session_from_db()
+            if obj is None:
+                return {}
+            entry = (obj.session_data, obj.expire_date)
+            self.cache.set(self.cache_key, entry, self.get_cache_timeout(obj.expire_date))
+
+        session_data, expire_date = entry
+        if expire_date <= timezone.now():
+            self._session_key = None
+            return {}
+        return self.decode(session_data)
+
+    def is_pending(self, session_key):
+        # Known to the cache or this process, without asking the database
+        return self.cache.get(self.cache_key_prefix + session_key) is not None \
+            or write_behind.get(session_key) is not None
+
+    def exists(self, session_key):
+        return self.is_pending(session_key) or super().exists(session_key)
+
+    def _get_new_session_key(self):
+        # 32 random characters don't collide in practice, so the database
+        # isn't asked; a collision would only overwrite the row on flush
+        while True:
+            session_key = get_random_string(32, VALID_KEY_CHARS)
+            if not self.is_pending(session_key):
+                return session_key
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if must_create and self.is_pending(self.session_key):
+            raise CreateError
+
+        data = self._get_session(no_load=must_create)
+        cached = self.cache.get(self.cache_key)
+        # Logged out by another request meanwhile, don't bring it back
+        if cached == DELETED:
+            raise UpdateError
+        # Skip the write if the data didn't really change
+        if cached is not None and self.decode(cached[0]) == data:
+            return
+
+        entry = (self.encode(data), self.get_expiry_date())
+
+        self.cache.set(self.cache_key, entry, self.get_cache_timeout(entry[1]))
+        write_behind.add(self.session_key, *entry)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        # Deleted at once, a logout must not be delayed
+        self.cache.set(self.cache_key_prefix + session_key, DELETED, settings.SESSION_COOKIE_AGE)
+        write_behind.discard(session_key)
+        super().delete(session_key)
+
+    @staticmethod
+    def get_cache_timeout(expire_date):
+        return max(int((expire_date - timezone.now()).total_seconds()), 0)
+
+
+class SessionMiddleware(BaseSessionMiddleware):
+    """
+    Session middleware keeping the sessions of
+    anonymous visitors in signed cookies when
+    SESSION_ANONYMOUS_SIGNED_COOKIES is set; the
+    session moves to SESSION_ENGINE on login
+    """
+
+    def process_request(self, request):
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        # Only signed cookies contain ":", session keys don't
+        if settings.SESSION_ANONYMOUS_SIGNED_COOKIES \
+                and (session_key is None or ":" in session_key):
+            request.session = signed_cookies.SessionStore(session_key)
+        else:
+            request.session = self.SessionStore(session_key)
+
+    def process_response(self, request, response):
+        session = getattr(request, "session", None)
+        if isinstance(session, signed_cookies.SessionStore) and SESSION_KEY in session:
+            # The visitor logged in, keep the session on the server from now on
+            request.session = self.SessionStore()
+            request.session.update(session.items())
+        return super().process_response(request, response)
@@ -0,0 +1,207 @@
+import sys
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from django.core.signals import setting_changed
+
+from .exceptions import ServiceBusy
+
+logger = logging.getLogger(__name__)
+
+
+class SmsQueueFull(ServiceBusy):
+    """
+    Raised when the queue of an SMS provider is full
+    """
+
+
+class SmsMessage(object):
+
+    def __init__(self, phone, text):
+        self.phone = phone
+        self.text = text
+        self.queued_at = time.monotonic()
+
+
+class BaseSmsProvider(object):
+    """
+    Base class of the SMS providers; send_messages
+    gets a batch of messages and raises on failure
+    """
+
+    def __init__(self, **options):
+        self.options = options
+
+    def send_messages(self, messages):
+        raise NotImplementedError
+
+
+class ConsoleSmsProvider(BaseSmsProvider):
+    """
+    Write the messages to the console (development)
+    """
+
+    def send_messages(self, messages):
+        for message in messages:
+            sys.stdout.write(f"SMS to {message.phone}: {message.text}\n")
+        sys.stdout.flush()
+
+
+class LocMemSmsProvider(BaseSmsProvider):
+    """
+    Keep the messages in LocMemSmsProvider.outbox (tests)
+    """
+    outbox = []
+
+    def send_messages(self, messages):
+        self.outbox.extend(messages)
+
+
+class DeliveryMetrics(object):
+    """
+    Counters and queue-to-delivery latencies
+    of the messages of one provider
+    """
+
+    def __init__(self, samples=1000):
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=samples)
+
+    def record(self, messages, success):
+        now = time.monotonic()
+        with self.lock:
+            self.batches += 1
+            if success:
+                self.sent += len(messages)
+                self.latencies.extend(now - message.queued_at for message in messages)
+            else:
+                self.failed += len(messages)
+
+    def summary(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            summary = {"sent": self.sent, "failed": self.failed, "batches": self.batches}
+        if latencies:
+            summary["latency_avg"] = sum(latencies) / len(latencies)
+            summary["latency_p95"] = latencies[int(len(latencies) * 0.95) - 1]
+            summary["latency_max"] = latencies[-1]
+        return summary
+
+
+class ProviderQueue(object):
+    """
+    Bounded queue of one provider, emptied in
+    batches by as many threads as the provider
+    can be called concurrently
+    """
+
+    def __init__(self, name, provider, queue_size, concurrency, batch_size):
+        self.name = name
+        self.provider = provider
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.metrics = DeliveryMetrics()
+        self.pending = 0
+        self.idle = threading.Condition()
+        self.workers = [
+            threading.Thread(target=self.run, name=f"sms-{name}-{number}", daemon=True)
+            for number in range(concurrency)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def put(self, message):
+        with self.idle:
+            self.pending += 1
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.done(1)
+            raise SmsQueueFull(f"SMS queue of {self.name} is full")
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.provider.send_messages(batch)
+            except Exception:
+                logger.exception("Sending %s SMS with %s failed", len(batch), self.name)
+                self.metrics.record(batch, success=False)
+            else:
+                self.metrics.record(batch, success=True)
+            finally:
+                self.done(len(batch))
+
+    def done(self, count):
+        with self.idle:
+            self.pending -= count
+            if self.pending == 0:
+                self.idle.notify_all()
+
+    def flush(self, timeout=None):
+        with self.idle:
+            return self.idle.wait_for(lambda: self.pending == 0, timeout)
+
+
+class SmsGateway(object):
+    """
+    Non-blocking SMS sending: the messages are put
+    in the queue of their provider and sent by its
+    worker threads, so the request never waits
+    for the SMS provider
+    """
+
+    def __init__(self, providers, queue_size=1000):
+        self.queues = {}
+        for name, config in providers.items():
+            provider = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+            self.queues[name] = ProviderQueue(name, provider, queue_size,
+                                              config.get("MAX_CONCURRENCY", 2),
+                                              config.get("BATCH_SIZE", 50))
+
+    def send(self, phone, text, provider="default"):
+        self.queues[provider].put(SmsMessage(phone, text))
+
+    def flush(self, timeout=None):
+        return all(provider_queue.flush(timeout)
+                   for provider_queue in self.queues.values())
+
+    def get_metrics(self):
+        return {name: provider_queue.metrics.summary()
+                for name, provider_queue in self.queues.items()}
+
+
+@lru_cache(maxsize=None)
+def get_sms_gateway():
+    config = settings.SMS_GATEWAY
+    return SmsGateway(config["PROVIDERS"], config.get("QUEUE_SIZE", 1000))
+
+
+@receiver(setting_changed)
+def reset_sms_gateway(setting, **kwargs):
+    if setting == "SMS_GATEWAY":
+        get_sms_gateway.cache_clear()
+
+
+def send_otp(phone, code):
+    """
+    Queue the SMS containing the OTP code,
+    raises SmsQueueFull if the queue is full
+    """
+    get_sms_gateway().send(phone, f"Your Male Fashion verification code: {code}")
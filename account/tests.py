@@ -1,3 +1,773 @@
-from django.test import TestCase
+import io
+import re
+import time
+import threading
+from datetime import timedelta
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.db import connection
+from django.core.management import call_command
+from django.core.cache import caches
+from django.urls import include, path, reverse
+from django.utils import timezone
+from django.core.mail import EmailMessage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.sessions.models import Session
+from django.contrib.sessions.backends.base import UpdateError
+
+from . import hashing, ratelimit, sessions, verification
+from .mailer import Mailer
+from .middleware import ServiceBusyMiddleware
+from .authentication import CustomBackend, get_cached_user, cache_user
+from .sms import LocMemSmsProvider, SmsGateway, SmsQueueFull, get_sms_gateway
+from .models import User, Otp, FailedEmail
+from .verification import get_verification_store
+
+
+LOCMEM_SMS_GATEWAY = {
+    "PROVIDERS": {
+        "default": {"BACKEND": "account.sms.LocMemSmsProvider"},
+    },
+}
+
+
+@override_settings(SMS_GATEWAY=LOCMEM_SMS_GATEWAY)
+class VerificationStoreTest(TestCase):
+    """
+    Tests for the registration flow
+    using the verification store
+    """
+
+    def register(self):
+        response = self.client.post(reverse("account:register"), {
+            "phone": "09120000000",
+            "full_name": "Test User",
+            "password": "testpassword",
+            "password2": "testpassword",
+        })
+        token = response.url.split("token=")[1]
+        return token
+
+    def check_otp(self, token, code):
+        return self.client.post(
+            reverse("account:check-otp") + f"?token={token}", {"code": code}
+        )
+
+    def test_register_with_cache_store(self):
+        LocMemSmsProvider.outbox.clear()
+        token = self.register()
+        otp = get_verification_store().get("register", token)
+
+        # The code is sent by the SMS gateway
+        get_sms_gateway().flush(timeout=5)
+        self.assertEqual(LocMemSmsProvider.outbox[0].phone, "09120000000")
+        self.assertIn(otp["code"], LocMemSmsProvider.outbox[0].text)
+
+        self.assertEqual(Otp.objects.count(), 0)
+        self.check_otp(token, otp["code"])
+        self.assertTrue(User.objects.filter(phone="09120000000").exists())
+        self.assertIsNone(get_verification_store().get("register", token))
+
+    @override_settings(VERIFICATION_STORE={
+        "BACKEND": "account.verification.ModelVerificationStore"
+    })
+    def test_register_with_model_store(self):
+        token = self.register()
+        otp = Otp.objects.get(token=token)
+
+        self.check_otp(token, otp.code)
+        self.assertTrue(User.objects.filter(phone="09120000000").exists())
+        self.assertFalse(Otp.objects.filter(token=token).exists())
+
+    def test_expired_record(self):
+        store = get_verification_store()
+        store.set("password_reset", "token", {"phone": "09120000000",
+                                              "code": "123456",
+                                              "phone_confirmed": False}, timeout=-1)
+        self.assertIsNone(store.get("password_reset", "token"))
+        self.assertFalse(store.update("password_reset", "token", phone_confirmed=True))
+
+
+class FakeRedis(object):
+    """
+    The few Redis hash commands and the
+    WATCH/MULTI pipeline the verification
+    store uses, in memory
+    """
+
+    def __init__(self):
+        self.hashes = {}
+        self.expires = {}
+        self.versions = {}
+        # Called on WATCH, to change a record meanwhile
+        self.on_watch = None
+
+    def changed(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def exists(self, key):
+        if key in self.expires and self.expires[key] <= time.time():
+            self.hashes.pop(key, None)
+            del self.expires[key]
+        return int(key in self.hashes)
+
+    def hset(self, key, mapping):
+        self.exists(key)
+        self.hashes.setdefault(key, {}).update(
+            {name.encode(): value.encode() for name, value in mapping.items()})
+        self.changed(key)
+
+    def hgetall(self, key):
+        return dict(self.hashes[key]) if self.exists(key) else {}
+
+    def expire(self, key, seconds):
+        if not self.exists(key):
+            return
+        if seconds <= 0:
+            self.delete(key)
+        else:
+            self.expires[key] = time.time() + seconds
+            self.changed(key)
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+        self.expires.pop(key, None)
+        self.changed(key)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline(object):
+
+    def __init__(self, client):
+        self.client = client
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def reset(self):
+        self.watched = {}
+        self.queued = None
+        self.commands = []
+
+    def watch(self, key):
+        self.watched[key] = self.client.versions.get(key, 0)
+        self.queued = False
+        if self.client.on_watch:
+            self.client.on_watch()
+
+    def multi(self):
+        self.queued = True
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+
+        def run(*args, **kwargs):
+            # At once between WATCH and MULTI, like redis-py
+            if self.queued is False:
+                return command(*args, **kwargs)
+            self.commands.append((command, args, kwargs))
+        return run
+
+    def execute(self):
+        try:
+            if any(self.client.versions.get(key, 0) != version
+                   for key, version in self.watched.items()):
+                raise verification.WatchError
+            return [command(*args, **kwargs) for command, args, kwargs in self.commands]
+        finally:
+            self.reset()
+
+
+class RedisVerificationStoreTest(TestCase):
+    """
+    Tests for the verification store
+    keeping the records in Redis
+    """
+
+    def setUp(self):
+        self.client = FakeRedis()
+        self.store = verification.RedisVerificationStore(client=self.client)
+
+    def test_records(self):
+        self.store.set("change_phone", "token", {"user_id": 1, "phone": "09120000000",
+                                                 "email_change_successfull": False})
+        self.assertEqual(self.store.get("change_phone", "token"),
+                         {"user_id": 1, "phone": "09120000000",
+                          "email_change_successfull": False})
+        self.assertIsNone(self.store.get("change_phone", "other"))
+        self.assertIsNone(self.store.get("change_email", "token"))
+
+        self.assertTrue(self.store.update("change_phone", "token", email_change_successfull=True))
+        self.assertTrue(self.store.get("change_phone", "token")["email_change_successfull"])
+
+        self.store.delete("change_phone", "token")
+        self.assertIsNone(self.store.get("change_phone", "token"))
+        self.assertFalse(self.store.update("change_phone", "token", phone="09130000000"))
+        self.assertIsNone(self.store.get("change_phone", "token"))
+
+    def test_set_replaces_record(self):
+        self.store.set("register", "token", {"phone": "09120000000", "code": "123456"})
+        self.store.set("register", "token", {"phone": "09130000000"})
+        self.assertEqual(self.store.get("register", "token"), {"phone": "09130000000"})
+
+    def test_expired_record(self):
+        self.store.set("password_reset", "token", {"phone": "09120000000",
+                                                   "phone_confirmed": False}, timeout=-1)
+        self.assertIsNone(self.store.get("password_reset", "token"))
+        self.assertFalse(self.store.update("password_reset", "token", phone_confirmed=True))
+
+        self.store.set("password_reset", "token", {"phone": "09120000000",
+                                                   "phone_confirmed": False}, timeout=60)
+        expires = self.client.expires["verification:password_reset:token"]
+        self.assertGreater(expires, time.time() + 50)
+        self.store.update("password_reset", "token", phone_confirmed=True)
+        # The update doesn't extend the record
+        self.assertEqual(self.client.expires["verification:password_reset:token"], expires)
+
+    def test_concurrent_update(self):
+        self.store.set("change_email", "token", {"email": "old@example.com",
+                                                 "phone_change_successfull": False})
+
+        def change_elsewhere():
+            # Another worker confirms the phone number during the first try
+            self.client.on_watch = None
+            self.store.update("change_email", "token", phone_change_successfull=True)
+
+        self.client.on_watch = change_elsewhere
+        self.assertTrue(self.store.update("change_email", "token", email="new@example.com"))
+        # Retried, no change is lost
+        self.assertEqual(self.store.get("change_email", "token"),
+                         {"email": "new@example.com", "phone_change_successfull": True})
+
+        def delete_elsewhere():
+            self.client.on_watch = None
+            self.store.delete("change_email", "token")
+
+        self.client.on_watch = delete_elsewhere
+        self.assertFalse(self.store.update("change_email", "token", email="other@example.com"))
+        self.assertIsNone(self.store.get("change_email", "token"))
+
+
+class PurgeVerificationsTest(TransactionTestCase):
+    """
+    Tests for purging the expired verification rows
+    """
+
+    def setUp(self):
+        now = timezone.now()
+        for number in range(6):
+            Otp.objects.create(phone="09120000000", full_name="Test User", password="x",
+                               token=f"token-{number}", code="123456",
+                               expiration=now + timedelta(minutes=-10 if number < 5 else 10))
+
+    def test_purge_expired(self):
+        self.assertEqual(verification.purge_expired(Otp, batch_size=2), 5)
+        self.assertEqual(list(Otp.objects.values_list("token", flat=True)), ["token-5"])
+
+    def test_sweeper(self):
+        sweeper = verification.VerificationSweeper(0.01, batch_size=2)
+        sweeper.start()
+        # A few rounds, the test database is locked while it deletes
+        time.sleep(0.2)
+        sweeper.stop()
+        sweeper.join(timeout=5)
+        self.assertEqual(Otp.objects.count(), 1)
+        self.assertFalse(sweeper.is_alive())
+
+    def test_started_by_servers_only(self):
+        # Not by the test run (nor by any other management command)
+        self.assertIsNone(verification.sweeper)
+        with override_settings(VERIFICATION_SWEEP_INTERVAL=60), \
+                mock.patch.object(verification.VerificationSweeper, "start") as start:
+            started = verification.start_sweeper()
+            self.assertIs(verification.start_sweeper(), started)
+            verification.sweeper = None
+        start.assert_called_once_with()
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError("SMTP server is down")
+
+
+class MailerTest(TransactionTestCase):
+    """
+    Tests for the outbound mail queue
+    """
+
+    def test_send_in_background(self):
+        mailer = Mailer("django.core.mail.backends.locmem.EmailBackend")
+        mailer.enqueue([EmailMessage("Subject", "Body", to=[f"user{number}@example.com"])
+                        for number in range(3)])
+
+        self.assertTrue(mailer.flush(timeout=5))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_dead_letter(self):
+        mailer = Mailer("account.tests.FailingEmailBackend",
+                        max_attempts=3, retry_delay=0.01)
+        mailer.enqueue([EmailMessage("Subject", "Body", to=["user@example.com"])])
+
+        self.assertTrue(mailer.flush(timeout=5))
+        failed = FailedEmail.objects.get()
+        self.assertEqual(failed.attempts, 3)
+        self.assertEqual(failed.to, "user@example.com")
+
+
+class SlowSmsProvider(LocMemSmsProvider):
+    def send_messages(self, messages):
+        time.sleep(0.2)
+        super().send_messages(messages)
+
+
+class SmsGatewayTest(TestCase):
+    """
+    Tests for the SMS gateway queues
+    """
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    def test_batches_and_metrics(self):
+        LocMemSmsProvider.outbox.clear()
+        gateway = SmsGateway({"default": {"BACKEND": "account.tests.SlowSmsProvider",
+                                          "MAX_CONCURRENCY": 1, "BATCH_SIZE": 10}})
+        for number in range(5):
+            gateway.send(f"0912000000{number}", "code")
+
+        self.assertTrue(gateway.flush(timeout=5))
+        metrics = gateway.get_metrics()["default"]
+        self.assertEqual(len(LocMemSmsProvider.outbox), 5)
+        self.assertEqual(metrics["sent"], 5)
+        # The messages waiting for the slow provider are sent together
+        self.assertLessEqual(metrics["batches"], 2)
+
+    def test_queue_full(self):
+        gateway = SmsGateway({"default": {"BACKEND": "account.tests.SlowSmsProvider",
+                                          "MAX_CONCURRENCY": 1, "BATCH_SIZE": 1}},
+                             queue_size=1)
+        with self.assertRaises(SmsQueueFull):
+            for number in range(3):
+                gateway.send(f"0912000000{number}", "code")
+        gateway.flush(timeout=5)
+
+    def test_queue_full_changes_nothing(self):
+        user = User.objects.create_user(phone="09120000000", full_name="Test User",
+                                        password="testpassword")
+        self.client.force_login(user, backend="account.authentication.CustomBackend")
+        with mock.patch("account.flows.send_otp", side_effect=SmsQueueFull):
+            response = self.client.post(reverse("account:user-profile"), {
+                "full_name": "Changed Name", "phone": "09122222222",
+            })
+        self.assertEqual(response.status_code, 503)
+        user.refresh_from_db()
+        self.assertEqual((user.full_name, user.phone), ("Test User", "09120000000"))
+
+    def test_busy_middleware_async(self):
+        async def view(request):
+            return HttpResponse()
+
+        # No thread for the async views under ASGI
+        self.assertTrue(iscoroutinefunction(ServiceBusyMiddleware(view)))
+        response = ServiceBusyMiddleware.process_exception(None, SmsQueueFull())
+        self.assertEqual(response.status_code, 503)
+
+
+@override_settings(RATE_LIMITS={"account:login": {"username": "2/m"}})
+class RateLimitTest(TestCase):
+    """
+    Tests for the rate limiting middleware
+    """
+
+    def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE].clear()
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    def test_login_limited_by_username(self):
+        data = {"username": "09129999999", "password": "wrongpassword"}
+        responses = [self.client.post(reverse("account:login"), data)
+                     for _ in range(3)]
+
+        self.assertEqual([response.status_code for response in responses],
+                         [200, 200, 429])
+        self.assertIn("Retry-After", responses[2])
+
+    def test_username_variants_share_bucket(self):
+        responses = [self.client.post(reverse("account:login"),
+                                      {"username": username, "password": "wrongpassword"})
+                     for username in (" User@Example.com", "user@example.com ", "USER@example.com")]
+        self.assertEqual([response.status_code for response in responses],
+                         [200, 200, 429])
+
+    def test_rejected_takes_no_token(self):
+        cache = caches[settings.RATE_LIMIT_CACHE]
+        buckets = [("ratelimit:test:ip", *ratelimit.parse_rate("5/h")),
+                   ("ratelimit:test:username", *ratelimit.parse_rate("1/h"))]
+        with mock.patch("time.time", return_value=3600 * 1000 + 10):
+            self.assertEqual(ratelimit.take_tokens(cache, buckets), 0)
+            self.assertEqual(ratelimit.take_tokens(cache, buckets), 3590)
+            # The ip bucket only counts the accepted request
+            self.assertEqual(cache.get("ratelimit:test:ip:1000"), 1)
+            self.assertEqual(cache.get("ratelimit:test:username:1000"), 1)
+
+    def test_async(self):
+        async def view(request):
+            return HttpResponse()
+
+        # Stays async under ASGI, no thread for the requests not limited
+        middleware = ratelimit.RateLimitMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertTrue(iscoroutinefunction(middleware.process_view))
+        self.assertFalse(iscoroutinefunction(ratelimit.RateLimitMiddleware(
+            lambda request: HttpResponse()).process_view))
+
+        limited = ratelimit.rate_limit("test", ip="1/m")(view)
+        self.assertTrue(iscoroutinefunction(limited))
+        request = RequestFactory().post("/")
+        self.assertEqual(async_to_sync(limited)(request).status_code, 200)
+        self.assertEqual(async_to_sync(limited)(request).status_code, 429)
+
+
+# Fast hashes, the hashing isn't tested here
+@override_settings(PASSWORD_HASHER_ITERATIONS=1000)
+class LoginTest(TestCase):
+    """
+    Tests for logging in with the phone
+    number or the email address
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(phone="09120000000", full_name="Test User",
+                                             email="test@example.com", password="testpassword")
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    def test_password_hash_rejected(self):
+        self.assertIsNone(CustomBackend.authenticate(None, "09120000000", self.user.password))
+        self.assertEqual(CustomBackend.authenticate(None, "09120000000", "testpassword"), self.user)
+
+    def test_single_query(self):
+        # The email or the phone column, never both
+        with self.assertNumQueries(1):
+            self.assertEqual(CustomBackend.authenticate(None, "test@example.com", "testpassword"),
+                             self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(CustomBackend.authenticate(None, "09120000000", "testpassword"),
+                             self.user)
+
+        # The view reuses the user found by the form
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("account:login"), {
+                "username": "test@example.com", "password": "testpassword",
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len([query for query in queries.captured_queries
+                              if query["sql"].startswith('SELECT "account_user"')]), 1)
+
+    def test_mixed_case_email(self):
+        response = self.client.post(reverse("account:login"), {
+            "username": " TEST@Example.COM ", "password": "testpassword",
+        })
+        self.assertEqual(response.url, reverse("home:main"))
+        self.assertEqual(int(self.client.session["_auth_user_id"]), self.user.id)
+
+    async def test_password_hash_rejected_async(self):
+        self.assertIsNone(await CustomBackend.aauthenticate(None, "09120000000",
+                                                            self.user.password))
+        self.assertEqual(await CustomBackend.aauthenticate(None, "09120000000", "testpassword"),
+                         self.user)
+
+
+class HashingTest(TestCase):
+    """
+    Tests for the password hashing pool
+    and the calibrated hasher
+    """
+
+    def setUp(self):
+        caches[settings.RATE_LIMIT_CACHE].clear()
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    @override_settings(PASSWORD_HASHER_ITERATIONS=1000)
+    def create_user(self):
+        return User.objects.create_user(phone="09120000000", full_name="Test User",
+                                        password="testpassword")
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE_SIZE=0,
+                       PASSWORD_HASHING_TIMEOUT=0.01)
+    def test_saturated_pool(self):
+        self.create_user()
+        # The only worker is busy
+        release = threading.Event()
+        busy = hashing.get_hashing_pool().submit(release.wait)
+        try:
+            with self.assertRaises(hashing.HashingPoolBusy):
+                hashing.make_password("testpassword")
+            response = self.client.post(reverse("account:login"), {
+                "username": "09120000000", "password": "testpassword",
+            })
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response["Retry-After"], "1")
+        finally:
+            release.set()
+            busy.result()
+        self.assertTrue(hashing.make_password("testpassword"))
+
+    @override_settings(PASSWORD_HASHER_ITERATIONS=2000)
+    def test_rehash_on_login(self):
+        user = self.create_user()
+        self.assertIn("$1000$", user.password)
+        response = self.client.post(reverse("account:login"), {
+            "username": "09120000000", "password": "testpassword",
+        })
+        self.assertEqual(response.status_code, 302)
+        user.refresh_from_db()
+        self.assertIn("$2000$", user.password)
+        self.assertTrue(user.check_password("testpassword"))
+
+    @override_settings(PASSWORD_HASHER_ITERATIONS=2000)
+    async def test_rehash_on_async_login(self):
+        user = await sync_to_async(self.create_user)()
+        await sync_to_async(cache_user)(user)
+        self.assertEqual(await CustomBackend.aauthenticate(None, "09120000000", "testpassword"),
+                         user)
+        user = await User.objects.aget(pk=user.pk)
+        self.assertIn("$2000$", user.password)
+        # Saved with the signals, the cached user with the old hash is gone
+        self.assertIsNone(await sync_to_async(get_cached_user)(user.pk))
+
+    def test_calibrate_hasher(self):
+        output = io.StringIO()
+        call_command("calibrate_hasher", target_ms=1, rounds=1, stdout=output)
+        iterations = int(re.search(r"PASSWORD_HASHER_ITERATIONS=(\d+)", output.getvalue())[1])
+        self.assertGreaterEqual(iterations, 1000)
+        self.assertEqual(iterations % 1000, 0)
+
+
+class UserCacheTest(TestCase):
+    """
+    Tests for the cached request.user
+    """
+
+    def setUp(self):
+        caches[settings.USER_CACHE].clear()
+        self.user = User.objects.create_user(phone="09120000000", full_name="Test User",
+                                             password="testpassword")
+        self.client.force_login(self.user, backend="account.authentication.CustomBackend")
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    def get_user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("home:main"))
+        self.assertEqual(response.status_code, 200)
+        return [query for query in queries.captured_queries
+                if "account_user" in query["sql"]]
+
+    def test_cached_page_hit(self):
+        self.assertEqual(len(self.get_user_queries()), 1)
+        self.assertEqual(self.get_user_queries(), [])
+
+    def test_profile_page(self):
+        self.user.bio = "Test bio"
+        self.user.image = "profile_image/test.jpg"
+        self.user.save()
+        self.assertEqual(len(self.get_user_queries()), 1)
+
+        # The cached user is compact, the image and bio are loaded in one query
+        self.assertIn("bio", get_cached_user(self.user.id).get_deferred_fields())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("account:user-profile"))
+        self.assertContains(response, "Test bio")
+        user_queries = [query["sql"] for query in queries.captured_queries
+                        if "account_user" in query["sql"]]
+        self.assertEqual(len(user_queries), 1)
+        self.assertIn('"account_user"."image"', user_queries[0])
+        self.assertEqual(response.wsgi_request.user.get_deferred_fields(), set())
+        self.assertEqual(response.wsgi_request.user.image.name, "profile_image/test.jpg")
+
+    def test_invalidated_on_save(self):
+        self.get_user_queries()
+        self.user.full_name = "Changed Name"
+        self.user.save()
+        self.assertEqual(len(self.get_user_queries()), 1)
+
+
+class SessionStoreTest(TestCase):
+    """
+    Tests for the cached, write-behind session store
+    """
+
+    def setUp(self):
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    def create(self):
+        session = sessions.SessionStore()
+        session["cart"] = "1:2"
+        session.save()
+        return session.session_key
+
+    def test_save_and_load(self):
+        with self.assertNumQueries(0):
+            session_key = self.create()
+            self.assertEqual(sessions.SessionStore(session_key).load(), {"cart": "1:2"})
+
+        sessions.flush_pending_sessions()
+        self.assertTrue(Session.objects.filter(session_key=session_key).exists())
+        # From the database once the cache lost it
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.assertEqual(sessions.SessionStore(session_key).load(), {"cart": "1:2"})
+
+    def test_unchanged_not_written(self):
+        session_key = self.create()
+        sessions.flush_pending_sessions()
+        session = sessions.SessionStore(session_key)
+        session["cart"] = "1:2"
+        session.save()
+        self.assertEqual(sessions.write_behind.pending, {})
+
+    def test_delete(self):
+        session_key = self.create()
+        sessions.flush_pending_sessions()
+        sessions.SessionStore(session_key).delete()
+        self.assertFalse(Session.objects.filter(session_key=session_key).exists())
+        self.assertEqual(sessions.SessionStore(session_key).load(), {})
+
+    def test_delete_by_another_worker(self):
+        session_key = self.create()
+        # A request which read it before the logout
+        session = sessions.SessionStore(session_key)
+        session["cart"] = "3:1"
+        # Another process, with its own buffer and the shared cache
+        with mock.patch.object(sessions, "write_behind", sessions.WriteBehindBuffer()):
+            other = sessions.SessionStore(session_key)
+            self.assertEqual(other.load(), {"cart": "1:2"})
+            other.delete()
+
+        # Neither read from this worker's buffer, written back, nor saved again
+        self.assertEqual(sessions.SessionStore(session_key).load(), {})
+        sessions.flush_pending_sessions()
+        self.assertFalse(Session.objects.filter(session_key=session_key).exists())
+        with self.assertRaises(UpdateError):
+            session.save()
+
+
+class AsyncUrls:
+    urlpatterns = [
+        path("", include("home.urls")),
+        path("account/", include("account.async_urls")),
+        path("cart/", include("cart.urls")),
+        path("wishlist/", include("wishlist.urls")),
+        path("orders/", include("orders.urls")),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncUrls, SMS_GATEWAY=LOCMEM_SMS_GATEWAY)
+class AsyncViewsTest(TestCase):
+    """
+    Tests for the async account views
+    """
+
+    def setUp(self):
+        caches[settings.USER_CACHE].clear()
+        mail.outbox = []
+        self.user = User.objects.create_user(phone="09120000000", full_name="Test User",
+                                             email="test@example.com", password="testpassword")
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    async def post(self, url, data):
+        # Form encoded, the multipart body of AsyncClient can't be read by the views
+        return await self.async_client.post(url, urlencode(data),
+                                            "application/x-www-form-urlencoded")
+
+    async def test_login(self):
+        response = await self.post(reverse("account:login"), {
+            "username": "Test@Example.com", "password": "wrongpassword",
+        })
+        self.assertContains(response, "Password incorrect!")
+        response = await self.post(reverse("account:login"), {
+            "username": "Test@Example.com", "password": "testpassword",
+        })
+        self.assertEqual(response.url, reverse("home:main"))
+
+    async def test_register(self):
+        response = await self.post(reverse("account:register"), {
+            "phone": "09121111111",
+            "full_name": "New User",
+            "password": "testpassword",
+            "password2": "testpassword",
+        })
+        token = response.url.split("token=")[1]
+        otp = await get_verification_store().aget("register", token)
+
+        url = reverse("account:check-otp") + f"?token={token}"
+        response = await self.post(url, {"code": "000000"})
+        self.assertContains(response, "The code you entered is not correct!")
+        response = await self.post(url, {"code": otp["code"]})
+        self.assertEqual(response.url, reverse("home:main"))
+        user = await User.objects.aget(phone="09121111111")
+        self.assertTrue(await sync_to_async(user.check_password)("testpassword"))
+
+    async def post_profile(self, **data):
+        await sync_to_async(self.async_client.force_login)(
+            self.user, backend="account.authentication.CustomBackend")
+        return await self.post(reverse("account:user-profile"), {
+            "full_name": "Test User", "phone": "09120000000", "email": "test@example.com", **data,
+        })
+
+    async def test_change_phone(self):
+        await sync_to_async(cache_user)(self.user)
+        response = await self.post_profile(phone="09122222222")
+        token = response.url.split("token=")[1]
+        changed_user = await get_verification_store().aget("change_phone", token)
+
+        response = await self.post(response.url, {"code": changed_user["code"]})
+        self.assertEqual(response.url, reverse("account:user-profile"))
+        await sync_to_async(self.user.refresh_from_db)()
+        self.assertEqual(self.user.phone, "09122222222")
+        # Saved with the signals, the cached user is gone
+        self.assertIsNone(await sync_to_async(get_cached_user)(self.user.id))
+
+    async def test_change_email(self):
+        await self.post_profile(full_name="Changed Name", email="New@Example.com")
+        await sync_to_async(self.user.refresh_from_db)()
+        self.assertEqual(self.user.full_name, "Changed Name")
+        self.assertEqual(self.user.email, "test@example.com")
+
+        token = re.search(r"token=(\w+)", mail.outbox[-1].body)[1]
+        response = await self.async_client.get(reverse("account:change-email") + f"?token={token}")
+        self.assertEqual(response.url, reverse("account:user-profile"))
+        await sync_to_async(self.user.refresh_from_db)()
+        self.assertEqual(self.user.email, "New@Example.com")
+        self.assertEqual(self.user.normalized_email, "new@example.com")
@@ -0,0 +1,316 @@
+import math
+import time
+import json
+import logging
+import threading
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.utils import timezone
+from django.db import DatabaseError, close_old_connections
+from django.dispatch import receiver
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from django.core.signals import setting_changed
+
+from male_fashion.utils import in_batches
+from .models import Otp, ChangedUser, ResetPasswordOtp
+
+# Optional, for RedisVerificationStore
+try:
+    import redis
+    from redis.exceptions import WatchError
+except ImportError:
+    redis = None
+
+    class WatchError(Exception):
+        """
+        Raised by the clients without the redis
+        package, e.g. the fake one of the tests
+        """
+
+logger = logging.getLogger(__name__)
+
+
+class BaseVerificationStore(object):
+    """
+    Short-lived storage for the data of the
+    flows waiting for an OTP code or an email link
+    (registration, password reset and profile change)
+    """
+
+    def set(self, kind, token, data, timeout=None):
+        raise NotImplementedError
+
+    def get(self, kind, token):
+        raise NotImplementedError
+
+    def update(self, kind, token, **changes):
+        raise NotImplementedError
+
+    def delete(self, kind, token):
+        raise NotImplementedError
+
+    # Async versions for the async views
+    async def aset(self, kind, token, data, timeout=None):
+        return await sync_to_async(self.set)(kind, token, data, timeout)
+
+    async def aget(self, kind, token):
+        return await sync_to_async(self.get)(kind, token)
+
+    async def aupdate(self, kind, token, **changes):
+        return await sync_to_async(self.update)(kind, token, **changes)
+
+    async def adelete(self, kind, token):
+        return await sync_to_async(self.delete)(kind, token)
+
+    @staticmethod
+    def get_timeout(timeout):
+        if timeout is None:
+            return settings.VERIFICATION_TIMEOUT
+        return timeout
+
+
+class CacheVerificationStore(BaseVerificationStore):
+    """
+    Verification store on top of one of the
+    caches in settings.CACHES, so it can be
+    the in-process LRU cache (one process only)
+    or a cache server. update() is a read and a
+    write, the last of two concurrent updates
+    wins; RedisVerificationStore has none of that.
+    """
+
+    def __init__(self, alias="verification"):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def make_key(kind, token):
+        return f"{kind}:{token}"
+
+    def set(self, kind, token, data, timeout=None):
+        timeout = self.get_timeout(timeout)
+        # The expiry time is kept next to the data so that
+        # updates don't extend the lifetime of the record
+        record = {"data": data, "expires": time.time() + timeout}
+        self.cache.set(self.make_key(kind, token), record, timeout)
+
+    def get(self, kind, token):
+        if not token:
+            return None
+        record = self.cache.get(self.make_key(kind, token))
+        if record is None:
+            return None
+        return record["data"]
+
+    def update(self, kind, token, **changes):
+        key = self.make_key(kind, token)
+        record = self.cache.get(key)
+        if record is None:
+            return False
+
+        remaining = record["expires"] - time.time()
+        if remaining <= 0:
+            return False
+        record["data"].update(changes)
+        self.cache.set(key, record, remaining)
+        return True
+
+    def delete(self, kind, token):
+        self.cache.delete(self.make_key(kind, token))
+
+
+class RedisVerificationStore(BaseVerificationStore):
+    """
+    Verification store keeping every record in a
+    Redis hash, a field per value, which expires
+    with the record; update() sets fields of a
+    record only while it exists, in one
+    transaction
+    """
+    key_prefix = "verification"
+
+    def __init__(self, url=None, client=None):
+        if client is None:
+            if redis is None:
+                raise ImproperlyConfigured("RedisVerificationStore requires the redis package")
+            client = redis.Redis.from_url(url)
+        self.client = client
+
+    def make_key(self, kind, token):
+        return f"{self.key_prefix}:{kind}:{token}"
+
+    @staticmethod
+    def encode(data):
+        return {name: json.dumps(value) for name, value in data.items()}
+
+    def set(self, kind, token, data, timeout=None):
+        key = self.make_key(kind, token)
+        with self.client.pipeline() as pipe:
+            # No field of an older record with the same token is kept
+            pipe.delete(key)
+            pipe.hset(key, mapping=self.encode(data))
+            # Gone at once with a timeout <= 0
+            pipe.expire(key, math.ceil(self.get_timeout(timeout)))
+            pipe.execute()
+
+    def get(self, kind, token):
+        if not token:
+            return None
+        fields = self.client.hgetall(self.make_key(kind, token))
+        if not fields:
+            return None
+        return {name.decode(): json.loads(value) for name, value in fields.items()}
+
+    def update(self, kind, token, **changes):
+        key = self.make_key(kind, token)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    # Retried if the record changes, expires or is deleted meanwhile
+                    pipe.watch(key)
+                    if not pipe.exists(key):
+                        return False
+                    pipe.multi()
+                    pipe.hset(key, mapping=self.encode(changes))
+                    pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    def delete(self, kind, token):
+        self.client.delete(self.make_key(kind, token))
+
+
+class ModelVerificationStore(BaseVerificationStore):
+    """
+    Verification store using the database tables
+    of Otp, ResetPasswordOtp and ChangedUser
+    """
+    models = {
+        "register": (Otp, "token"),
+        "password_reset": (ResetPasswordOtp, "token"),
+        "change_phone": (ChangedUser, "phone_token"),
+        "change_email": (ChangedUser, "email_token"),
+    }
+
+    def get_queryset(self, kind, token):
+        model, token_field = self.models[kind]
+        return model.objects.filter(**{token_field: token})
+
+    def set(self, kind, token, data, timeout=None):
+        model, token_field = self.models[kind]
+        field_names = [field.attname for field in model._meta.fields]
+        defaults = {name: value for name, value in data.items()
+                    if name in field_names}
+        defaults["expiration"] = timezone.localtime(timezone.now()) \
+            + timezone.timedelta(seconds=self.get_timeout(timeout))
+        model.objects.update_or_create(defaults=defaults, **{token_field: token})
+
+    def get(self, kind, token):
+        if not token:
+            return None
+        obj = self.get_queryset(kind, token).first()
+        if obj is None:
+            return None
+
+        if not obj.is_not_expired():
+            obj.delete()
+            return None
+        _, token_field = self.models[kind]
+        exclude = ["id", "expiration", token_field]
+        return {field.attname: getattr(obj, field.attname)
+                for field in obj._meta.fields if field.name not in exclude}
+
+    def update(self, kind, token, **changes):
+        now = timezone.localtime(timezone.now())
+        return bool(self.get_queryset(kind, token)
+                    .filter(expiration__gte=now).update(**changes))
+
+    def delete(self, kind, token):
+        self.get_queryset(kind, token).delete()
+
+
+@lru_cache(maxsize=None)
+def get_verification_store():
+    """
+    Return the verification store
+    configured in settings.VERIFICATION_STORE
+    """
+    config = settings.VERIFICATION_STORE
+    store_class = import_string(config["BACKEND"])
+    return store_class(**config.get("OPTIONS", {}))
+
+
+@receiver(setting_changed)
+def reset_verification_store(setting, **kwargs):
+    # Pick up the new backend when the settings are overridden (tests)
+    if setting == "VERIFICATION_STORE":
+        get_verification_store.cache_clear()
+
+
+def purge_expired(model, batch_size=500, pause=0):
+    """
+    Delete the expired rows of the given model
+    in batches, so that every delete is a short
+    write transaction. Returns the number of
+    deleted rows.
+    """
+    now = timezone.localtime(timezone.now())
+    expired = model.objects.filter(expiration__lt=now).order_by("expiration") \
+        .values_list("pk", flat=True)
+    return in_batches(expired, lambda pks: model.objects.filter(pk__in=pks).delete()[0],
+                      batch_size, pause)
+
+
+class VerificationSweeper(threading.Thread):
+    """
+    Background thread which periodically
+    purges the expired verification rows
+    """
+    models = (Otp, ChangedUser, ResetPasswordOtp)
+
+    def __init__(self, interval, batch_size=500):
+        super().__init__(name="verification-sweeper", daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            close_old_connections()
+            try:
+                for model in self.models:
+                    purge_expired(model, self.batch_size)
+            except DatabaseError:
+                logger.exception("Purging expired verifications failed")
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self.stopped.set()
+
+
+# The sweeper of this process, if started
+sweeper = None
+
+
+def start_sweeper():
+    """
+    Start the VerificationSweeper if
+    VERIFICATION_SWEEP_INTERVAL is set; called by
+    the WSGI and ASGI entry points, so that the
+    management commands and the tests run none
+    """
+    global sweeper
+    if settings.VERIFICATION_SWEEP_INTERVAL and sweeper is None:
+        sweeper = VerificationSweeper(settings.VERIFICATION_SWEEP_INTERVAL)
+        sweeper.start()
+    return sweeper
@@ -1,18 +1,12 @@
-import random
-from uuid import uuid4
-
 from django.views import View
-from django.utils import timezone
 from django.contrib import messages
-from django.urls import reverse_lazy
 from django.contrib.auth import login
-from django.core.mail import EmailMessage
 from django.shortcuts import redirect, render
-from django.template.loader import render_to_string
-from django.contrib.sites.shortcuts import get_current_site
 
+from . import flows
+from .models import User
 from .authentication import CustomBackend
-from .models import User, Otp, ChangedUser, ResetPasswordOtp
+from .verification import get_verification_store
 from .forms import UserRegisterForm, UserLoginForm, CheckOtpForm \
     , UserProfileForm, PasswordResetPhoneForm, PasswordResetOtpForm \
     , PasswordResetForm, ChangePasswordForm
@@ -33,23 +27,9 @@ class UserRegister(View):
     def post(self, request):
         form = UserRegisterForm(request.POST)
         if form.is_valid():
-            cd = form.cleaned_data
-            phone = cd.get("phone")
-            full_name = cd.get("full_name")
-            password = cd.get("password")
-
-            token = uuid4().hex
-            code = random.randint(100000, 999999)
-            # Use a messaging service for sending OTP code
-            print(code)
-            expiration = timezone.localtime(timezone.now()) + timezone.timedelta(minutes=10)
-
-            Otp.objects.create(phone=phone, full_name=full_name,
-                               password=password, token=token,
-                               code=code, expiration=expiration)
-            return redirect(
-                reverse_lazy("account:check-otp") + f"?token={token}"
-            )
+            token = flows.new_token()
+            get_verification_store().set("register", token, flows.registration(form.cleaned_data))
+            return redirect(flows.token_url("account:check-otp", token))
         return render(request, "account/register.html", {"form": form})
 
 
@@ -72,21 +52,21 @@ class CheckOtp(View):
         if form.is_valid():
             cd = form.cleaned_data
             token = request.GET.get("token")
-            otp = Otp.objects.get(token=token)
+            store = get_verification_store()
+            otp = store.get("register", token)
 
-            if otp.is_not_expired():
+            # The record is gone once it is expired
+            if otp is not None:
 
-                if cd.get("code") == otp.code:
-                    User.objects.create_user(phone=otp.phone, full_name=otp.full_name,
-                                             password=otp.password)
-                    user = User.objects.get(phone=otp.phone)
-                    login(request, user, backend="django.contrib.auth.backends.ModelBackend")
-                    Otp.objects.filter(phone=user.phone).delete()
+                if cd.get("code") == otp["code"]:
+                    user = User.objects.create_user(phone=otp["phone"], full_name=otp["full_name"],
+                                                    password=otp["password"])
+                    login(request, user, backend="account.authentication.CustomBackend")
+                    store.delete("register", token)
                     return redirect("home:main")
                 form.add_error("code", "The code you entered is not correct!")
                 return render(request, "account/check_otp.html", {"form": form})
 
-            otp.delete()
             messages.add_message(request, messages.ERROR, "The code is expired")
             return redirect("account:register")
         return render(request, "account/check_otp.html", {"form": form})
@@ -112,10 +92,11 @@ class UserLogin(View):
             username = cd.get("username")
             password = cd.get("password")
 
-            user = CustomBackend.authenticate(request, username, password)
+            user = CustomBackend.authenticate(request, username, password,
+                                              user=form.get_user())
 
             if user:
-                login(request, user, backend="django.contrib.auth.backends.ModelBackend")
+                login(request, user, backend="account.authentication.CustomBackend")
                 return redirect("home:main")
             else:
                 form.add_error("password", "Password incorrect!")
@@ -132,104 +113,24 @@ class UserProfileEdit(View):
     def get(self, request):
         if not request.user.is_authenticated:
             return redirect("account:login")
+        request.user.load_deferred_fields()
         form = UserProfileForm(instance=request.user)
         return render(request, "account/user-profile-edit.html", {"form": form})
 
     def post(self, request):
+        if not request.user.is_authenticated:
+            return redirect("account:login")
         user = request.user
+        user.load_deferred_fields()
         old_phone = user.phone
         old_email = user.email
         form = UserProfileForm(request.POST, files=request.FILES,
                                instance=request.user)
 
         if form.is_valid():
-
-            cd = form.cleaned_data
-            new_phone = cd.get("phone")
-            new_email = cd.get("email")
-            code = random.randint(100000, 999999)
-            expiration = timezone.localtime(timezone.now()) + timezone.timedelta(minutes=10)
-
-            changed_user = ChangedUser.objects.create(
-                user_id=user.id,
-                phone=new_phone,
-                email=new_email,
-                code=code,
-                expiration=expiration
-            )
-
-            # If user wants to change his/her email address
-            if new_email:
-                if new_email != old_email:
-                    # Check whether new email isn't already taken
-                    if User.objects.filter(email=new_email):
-                        form.add_error("email", "Email is already taken")
-                        return render(request, "account/user-profile-edit.html", {"form": form})
-
-                    # Save the info except new email (needs authorization)
-                    form.save()
-                    user.email = old_email
-                    user.phone = old_phone
-                    user.save()
-
-                    # Create token for email change
-                    changed_user.phone_change_successfull = True
-                    changed_user.email_token = uuid4().hex
-                    changed_user.save()
-
-                    # Send an email containing authorization link to user
-                    current_site = get_current_site(self.request)  # to get the domain of the current site
-                    mail_subject = 'Email change link sent!'
-                    message = render_to_string('account/email-change-link.html', {
-                        'user': user,
-                        'url': str(current_site.domain)
-                               + reverse_lazy("account:change-email")
-                               + f"?token={changed_user.email_token}",
-                    })
-                    to_email = form.cleaned_data.get('email')
-                    email = EmailMessage(
-                        mail_subject, message, to=[to_email]
-                    )
-                    email.send()
-
-                    messages.add_message(request, messages.SUCCESS, f"Link is sent to {new_email}")
-                else:
-                    changed_user.email_change_successfull = True
-                    changed_user.save()
-            else:
-                changed_user.email_change_successfull = True
-                changed_user.phone_change_successfull = True
-                changed_user.save()
-                form.save()
-                user.phone = old_phone
-                user.save()
-
-            # Check if only the phone is going to change (not email)
-            if new_phone != old_phone:
-
-                # Save the info except the new phone (needs authorization)
-                form.save()
-                user.phone = old_phone
-                user.save()
-
-                # Create token for phone change
-                changed_user.phone_change_successfull = False
-                changed_user.phone_token = uuid4().hex
-                changed_user.save()
-
-                # This line has to be converted to a messaging service
-                print(code)
-
-                return redirect(
-                    reverse_lazy("account:change-phone") + f"?token={changed_user.phone_token}"
-                )
-
-            # If neither email nor phone number are modified
-            if (new_phone == old_phone and new_email == old_email) or (not new_email and new_email != old_email):
-                changed_user.delete()
-                form.save()
-                messages.add_message(request, messages.SUCCESS, "Info modified successfully")
-                return render(request, "account/user-profile-edit.html", {"form": form})
+            url = flows.update_profile(request, form, old_phone, old_email)
+            if url:
+                return redirect(url)
         return render(request, "account/user-profile-edit.html", {"form": form})
 
 
@@ -249,38 +150,21 @@ class ChangePhone(View):
         if form.is_valid():
             cd = form.cleaned_data
             token = request.GET.get("token")
+            store = get_verification_store()
 
-            # Try finding a user with matching token and code
-            try:
-                changed_user = ChangedUser.objects.get(phone_token=token, code=cd.get("code"))
-            # Return error if not found
-            except:
-                messages.add_message(request, messages.ERROR, "Code is incorrect")
-                return redirect(
-                    reverse_lazy("account:change-phone") + f"?token={token}"
-                )
-
-            # Check whether the code is expired
-            if changed_user.is_not_expired():
-                user = User.objects.get(id=changed_user.user_id)
-                user.phone = changed_user.phone
-                user.save()
-            else:
+            # The record is gone once it is expired
+            changed_user = store.get("change_phone", token)
+            if changed_user is None:
                 messages.add_message(request, messages.ERROR, "Expired! Please try again")
-                changed_user.delete()
                 return redirect("account:user-profile")
 
-            changed_user.phone_change_successfull = True
-            changed_user.save()
-
-            # If the fields that needed authorization are changed successfully, delete the changed_user object
-            if changed_user.phone_change_successfull and changed_user.email_change_successfull:
-                changed_user.delete()
+            # Return error if the code doesn't match
+            if changed_user["code"] != cd.get("code"):
+                messages.add_message(request, messages.ERROR, "Code is incorrect")
+                return redirect(flows.token_url("account:change-phone", token))
 
-            if not changed_user.email_change_successfull:
-                messages.add_message(request, messages.SUCCESS, f"Link is sent to {changed_user.email}")
-            else:
-                messages.add_message(request, messages.SUCCESS, "Profile modified successfully")
+            flows.change_phone(request, changed_user)
+            store.delete("change_phone", token)
             return redirect("account:user-profile")
 
         return redirect("home:main")
@@ -294,29 +178,16 @@ class ChangeEmail(View):
 
     def get(self, request):
         token = request.GET.get("token")
+        store = get_verification_store()
 
         # Try to find a changed user with matching token
-        try:
-            changed_user = ChangedUser.objects.get(email_token=token)
-        except:
-            messages.add_message(request, messages.ERROR, "Some error occured! Please try again")
+        changed_user = store.get("change_email", token)
+        if changed_user is None:
+            messages.add_message(request, messages.ERROR, "The link is invalid or expired! Please try again")
             return redirect("account:user-profile")
 
-        if changed_user.is_not_expired():
-            user = User.objects.get(id=changed_user.user_id)
-            user.email = changed_user.email
-            user.save()
-        else:
-            messages.add_message(request, messages.ERROR, "Expired! Please try again")
-            changed_user.delete()
-            return redirect("account:user-profile")
-        form = UserProfileForm(instance=request.user)
-        form.email = user.email
-        changed_user.email_change_successfull = True
-        changed_user.save()
-        if changed_user.email_change_successfull and changed_user.phone_change_successfull:
-            changed_user.delete()
-        messages.add_message(request, messages.SUCCESS, "Profile modified successfully")
+        flows.change_email(request, changed_user)
+        store.delete("change_email", token)
         return redirect("account:user-profile")
 
 
@@ -331,21 +202,10 @@ class PasswordResetPhone(View):
     def post(self, request):
         form = PasswordResetPhoneForm(request.POST)
         if form.is_valid():
-            cd = form.cleaned_data
-
-            token = uuid4().hex
-            code = random.randint(100000, 999999)
-            print(code)
-            expiration = timezone.localtime(timezone.now()) + timezone.timedelta(minutes=10)
-
-            ResetPasswordOtp.objects.create(phone=cd.get("phone"),
-                                            token=token,
-                                            code=code,
-                                            expiration=expiration)
-
-            return redirect(
-                reverse_lazy("account:password-reset-otp") + f"?token={token}"
-            )
+            token = flows.new_token()
+            get_verification_store().set("password_reset", token,
+                                         flows.password_reset(form.cleaned_data.get("phone")))
+            return redirect(flows.token_url("account:password-reset-otp", token))
         return render(request, "account/reset-password-phone.html", {"form": form})
 
 
@@ -361,20 +221,18 @@ class PasswordResetCheckOtp(View):
         if form.is_valid():
             cd = form.cleaned_data
             token = request.GET.get("token")
-            password_reset_user = ResetPasswordOtp.objects.get(token=token)
+            store = get_verification_store()
+            password_reset_user = store.get("password_reset", token)
             code = cd.get("code")
 
-            if password_reset_user.is_not_expired():
-                if password_reset_user.code == code:
-                    password_reset_user.phone_confirmed = True
-                    password_reset_user.save()
-                    return redirect(
-                        reverse_lazy("account:password-reset") + f"?token={token}"
-                    )
+            # The record is gone once it is expired
+            if password_reset_user is not None:
+                if password_reset_user["code"] == code:
+                    store.update("password_reset", token, phone_confirmed=True)
+                    return redirect(flows.token_url("account:password-reset", token))
                 form.add_error("code", "The code is incorrect")
                 return render(request, "account/reset-password-otp.html", {"form": form})
             messages.add_message(request, messages.ERROR, "Expired! Please try again")
-            password_reset_user.delete()
             return redirect("account:password-reset-phone")
         return render(request, "account/reset-password-otp.html", {"form": form})
 
@@ -392,31 +250,25 @@ class PasswordReset(View):
         if form.is_valid():
             cd = form.cleaned_data
             token = request.GET.get("token")
+            store = get_verification_store()
 
-            try:
-                password_reset_user = ResetPasswordOtp.objects.get(token=token)
-                if not password_reset_user.phone_confirmed:
-                    messages.add_message(request, messages.ERROR, "First you should confirm your phone number")
-                    return redirect(
-                        reverse_lazy("account:password-reset-otp") + f"?token={token}"
-                    )
-            except:
+            password_reset_user = store.get("password_reset", token)
+            if password_reset_user is None:
                 messages.add_message(request, messages.ERROR, "Something went wrong! Try again")
                 return redirect("account:password-reset-phone")
+            if not password_reset_user["phone_confirmed"]:
+                messages.add_message(request, messages.ERROR, "First you should confirm your phone number")
+                return redirect(flows.token_url("account:password-reset-otp", token))
 
-            if password_reset_user.is_not_expired():
-                password1 = cd.get("password1")
+            password1 = cd.get("password1")
 
-                user = User.objects.get(phone=password_reset_user.phone)
-                user.set_password(password1)
-                user.save()
-                login(request, user, backend="django.contrib.auth.backends.ModelBackend")
-                password_reset_user.delete()
-                messages.add_message(request, messages.SUCCESS, "Your password was changed successfully")
-                return redirect("account:user-profile")
-            messages.add_message(request, messages.ERROR, "Expired! Please try again")
-            password_reset_user.delete()
-            return redirect("account:password-reset-phone")
+            user = User.objects.get(phone=password_reset_user["phone"])
+            user.set_password(password1)
+            user.save()
+            login(request, user, backend="account.authentication.CustomBackend")
+            store.delete("password_reset", token)
+            messages.add_message(request, messages.SUCCESS, "Your password was changed successfully")
+            return redirect("account:user-profile")
         return render(request, "account/reset-password.html", {"form": form})
 
 
@@ -440,7 +292,7 @@ class ChangePasswordView(View):
             new_password = cd.get("new_password1")
             user.set_password(new_password)
             user.save()
-            login(request, user, backend="django.contrib.auth.backends.ModelBackend")
+            login(request, user, backend="account.authentication.CustomBackend")
             messages.add_message(request, messages.SUCCESS, "Password changed successfully")
             return redirect("account:user-profile")
         return render(request, "account/change-password.html", {"form": form})
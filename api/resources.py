@@ -0,0 +1,110 @@
+"""
+Fields of the products and categories of the
+catalog API. A field reads its own column only,
+?fields=id,name,price reads three, and the
+related ones (images, variants) one query for a
+whole batch of rows.
+"""
+from django.core.files.storage import default_storage
+
+from home.models import Category, Product, ProductImage, Variant
+
+
+def get_images(ids):
+    images = {}
+    # In the ProductImage ordering
+    for product_id, name in ProductImage.objects.filter(product__in=ids) \
+            .values_list("product", "image"):
+        images.setdefault(product_id, []).append(default_storage.url(name))
+    return images
+
+
+def get_variants(ids):
+    variants = {}
+    for product_id, sku, color, size in Variant.objects.filter(product__in=ids) \
+            .order_by("id").values_list("product", "sku", "color", "size"):
+        variants.setdefault(product_id, []).append({"sku": sku, "color": color, "size": size})
+    return variants
+
+
+class Resource(object):
+    """
+    Rows of a table as JSON objects, `columns` maps
+    the fields to their column and `related` to a
+    function reading them for a list of ids
+    """
+
+    def __init__(self, table, get_queryset, columns, related=None, default_fields=None):
+        self.table = table
+        self.get_queryset = get_queryset
+        self.columns = columns
+        self.related = related or {}
+        self.default_fields = default_fields or list(columns)
+
+    def get_fields(self, value):
+        """
+        The fields of a ?fields= value, ValueError
+        for the unknown ones
+        """
+        if not value:
+            return self.default_fields
+        fields = list(dict.fromkeys(field for field in value.split(",") if field))
+        unknown = [field for field in fields
+                   if field not in self.columns and field not in self.related]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return fields
+
+    def get_rows(self, fields):
+        # The id first, always read for the cursor and the related fields
+        columns = ["id"] + [self.columns[field] for field in fields
+                            if field in self.columns and field != "id"]
+        return self.get_queryset().order_by("id").values_list(*columns)
+
+    def serialize(self, rows, fields):
+        column_fields = ["id"] + [field for field in fields
+                                  if field in self.columns and field != "id"]
+        ids = [row[0] for row in rows]
+        related = {field: self.related[field](ids) for field in fields if field in self.related}
+        items = []
+        for row in rows:
+            values = dict(zip(column_fields, row))
+            items.append({
+                field: related[field].get(values["id"], []) if field in related
+                else values[field]
+                for field in fields
+            })
+        return items
+
+
+products = Resource(
+    "product",
+    lambda: Product.objects.filter(is_active=True),
+    columns={
+        "id": "id",
+        "name": "name",
+        "slug": "slug",
+        "description": "description",
+        "category": "category__slug",
+        "price": "price",
+        "sale_price": "sale_price",
+        "rating": "rating",
+        "is_new": "is_new",
+        "created_at": "created_at",
+    },
+    related={
+        "images": get_images,
+        "variants": get_variants,
+    },
+    default_fields=["id", "name", "slug", "category", "price", "sale_price", "images"],
+)
+
+categories = Resource(
+    "category",
+    lambda: Category.objects.all(),
+    columns={
+        "id": "id",
+        "name": "name",
+        "slug": "slug",
+    },
+)
@@ -0,0 +1,103 @@
+import json
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from home import versions
+from home.models import Category, Product, ProductImage, Variant
+
+
+class CatalogApiTest(TestCase):
+    """
+    Tests for the catalog API
+    """
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Bags", slug="bags")
+        self.products = [
+            Product.objects.create(category=self.category, name=f"Bag {number}",
+                                   slug=f"bag-{number}", price=20 + number)
+            for number in range(5)
+        ]
+        ProductImage.objects.create(product=self.products[0], image="product_image/product-1.jpg")
+        Variant.objects.create(product=self.products[0], sku="bag-0", color="black", size="m")
+
+    def test_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("api:products"), {"fields": "name,price,images"})
+        # The columns asked for only, and one query for all the images
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("description", queries[0]["sql"])
+        self.assertNotIn("home_category", queries[0]["sql"])
+        self.assertEqual(response.json()["results"][0], {
+            "name": "Bag 0", "price": "20.00", "images": ["/media/product_image/product-1.jpg"],
+        })
+
+        response = self.client.get(reverse("api:products"), {"fields": "id,variants"})
+        self.assertEqual(response.json()["results"][0]["variants"],
+                         [{"sku": "bag-0", "color": "black", "size": "m"}])
+        response = self.client.get(reverse("api:products"), {"fields": "name,stock"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_pagination(self):
+        ids = []
+        url = reverse("api:products") + "?fields=id&limit=2"
+        while url:
+            page = self.client.get(url).json()
+            ids += [item["id"] for item in page["results"]]
+            url = page["next"]
+        self.assertEqual(ids, [product.id for product in self.products])
+
+    def test_etag(self):
+        url = reverse("api:products")
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A change of a product, or of their category, is a new version once
+        # committed, the old rows never get the new ETag
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[1].save()
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertNotEqual(self.client.get(url)["ETag"], response["ETag"])
+
+        response = self.client.get(reverse("api:categories"))
+        self.assertEqual(response.json(), {"results": [{"id": self.category.id, "name": "Bags",
+                                                        "slug": "bags"}]})
+
+    def test_etag_version_changed_elsewhere(self):
+        # A cache the processes share, the database one here
+        shared = {"BACKEND": "django.core.cache.backends.db.DatabaseCache",
+                  "LOCATION": "test_catalog_versions"}
+        with self.settings(CACHES=dict(settings.CACHES, versions=shared),
+                           CATALOG_VERSION_CACHE="versions"):
+            call_command("createcachetable")
+            url = reverse("api:categories")
+            etag = self.client.get(url)["ETag"]
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            # Another process changed a category, with its own cache connection
+            caches.create_connection("versions").incr(versions.version_key.format("category"))
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+
+    @override_settings(API_EXPORT_CHUNK_SIZE=2)
+    def test_export(self):
+        response = self.client.get(reverse("api:export"), {"fields": "id,name,images"})
+        self.assertTrue(response.streaming)
+        items = json.loads(b"".join(response.streaming_content))
+        self.assertEqual([item["id"] for item in items], [product.id for product in self.products])
+        self.assertEqual(len(items[0]["images"]), 1)
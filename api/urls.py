@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = "api"
+urlpatterns = [
+    path("products", views.ProductList.as_view(), name="products"),
+    path("products/export", views.ProductExport.as_view(), name="export"),
+    path("categories", views.CategoryList.as_view(), name="categories"),
+]
@@ -0,0 +1,106 @@
+import json
+import hashlib
+from itertools import islice
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from django.views.decorators.http import etag
+
+from home import versions
+from . import resources
+
+
+class ResourceView(View):
+    """
+    Read-only view of a resource, with a strong
+    ETag from the version of its table and the
+    URL: a matching If-None-Match gets a 304
+    without any query
+    """
+    resource = None
+
+    def get_etag(self, request, *args, **kwargs):
+        version = versions.get_versions(self.resource.table)[self.resource.table]
+        return hashlib.md5(f"{version}:{request.get_full_path()}".encode()).hexdigest()
+
+    def dispatch(self, request, *args, **kwargs):
+        return etag(self.get_etag)(super().dispatch)(request, *args, **kwargs)
+
+    def get_fields(self):
+        return self.resource.get_fields(self.request.GET.get("fields"))
+
+    def get(self, request):
+        try:
+            fields = self.get_fields()
+        except ValueError as error:
+            return JsonResponse({"error": str(error)}, status=400)
+        return self.get_response(fields)
+
+
+class ProductList(ResourceView):
+    """
+    Active products by id, ?after=<id> is the
+    cursor of the next page and ?limit= its size
+    """
+    resource = resources.products
+
+    def get_int(self, name, default):
+        try:
+            return max(int(self.request.GET[name]), 0)
+        except (KeyError, ValueError):
+            return default
+
+    def get_response(self, fields):
+        after = self.get_int("after", None)
+        limit = min(self.get_int("limit", settings.API_PAGE_SIZE) or 1, settings.API_MAX_PAGE_SIZE)
+        rows = self.resource.get_rows(fields)
+        if after is not None:
+            rows = rows.filter(id__gt=after)
+        # One more row tells whether there's a next page
+        rows = list(rows[:limit + 1])
+
+        next_url = None
+        if len(rows) > limit:
+            query = self.request.GET.copy()
+            query["after"] = rows[limit - 1][0]
+            next_url = f"{self.request.path}?{query.urlencode(safe=',')}"
+        return JsonResponse({
+            "results": self.resource.serialize(rows[:limit], fields),
+            "next": next_url,
+        })
+
+
+class ProductExport(ResourceView):
+    """
+    Every active product in one JSON array, read
+    and sent API_EXPORT_CHUNK_SIZE products at a
+    time so that memory use stays the same for
+    any catalog size
+    """
+    resource = resources.products
+
+    def get_response(self, fields):
+        chunk_size = settings.API_EXPORT_CHUNK_SIZE
+        rows = self.resource.get_rows(fields).iterator(chunk_size=chunk_size)
+
+        def stream():
+            separator = ""
+            yield "["
+            while chunk := list(islice(rows, chunk_size)):
+                items = self.resource.serialize(chunk, fields)
+                yield separator + ",".join(json.dumps(item, cls=DjangoJSONEncoder)
+                                           for item in items)
+                separator = ","
+            yield "]"
+
+        return StreamingHttpResponse(stream(), content_type="application/json")
+
+
+class CategoryList(ResourceView):
+    resource = resources.categories
+
+    def get_response(self, fields):
+        rows = list(self.resource.get_rows(fields))
+        return JsonResponse({"results": self.resource.serialize(rows, fields)})
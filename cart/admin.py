@@ -0,0 +1,5 @@
+from django.contrib import admin
+
+from .models import Cart
+
+admin.site.register(Cart)
@@ -0,0 +1,171 @@
+"""
+Shopping cart kept in the session as a short
+string, "2s:3,a1" being 3 of the variant 2s
+(base 36 id) and 1 of the variant a1, along with
+the total at the last change so that the header
+needs no query. The cart of a user is also saved
+in their Cart row and merged with the anonymous
+one on login.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from home.models import Variant
+from .models import Cart
+
+session_key = "cart"
+total_session_key = "cart_total"
+# The user whose Cart the session cart is a copy of
+user_session_key = "cart_user"
+
+digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def to_base36(number):
+    text = ""
+    while True:
+        number, digit = divmod(number, 36)
+        text = digits[digit] + text
+        if not number:
+            return text
+
+
+def encode(items):
+    return ",".join(to_base36(id) + (f":{quantity}" if quantity != 1 else "")
+                    for id, quantity in items.items())
+
+
+def decode(value):
+    items = {}
+    for item in value.split(",") if value else ():
+        id, _, quantity = item.partition(":")
+        try:
+            items[int(id, 36)] = int(quantity or 1)
+        except ValueError:
+            # Written by an older version or tampered with
+            continue
+    return items
+
+
+def merge(first, second):
+    items = dict(first)
+    for id, quantity in second.items():
+        items[id] = min(items.get(id, 0) + quantity, settings.CART_MAX_QUANTITY)
+    return items
+
+
+def get_lines(items, images=False):
+    """
+    (variant, quantity, subtotal) of the items
+    which can still be bought, priced in one query
+    """
+    variants = Variant.objects.filter(id__in=items, product__is_active=True) \
+        .select_related("product")
+    if images:
+        variants = variants.prefetch_related("product__images")
+    variants = variants.in_bulk()
+    return [(variants[id], quantity, variants[id].product.current_price * quantity)
+            for id, quantity in items.items() if id in variants]
+
+
+class SessionCart(object):
+    """
+    Cart of the visitor of a request
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.session = request.session
+
+    @property
+    def items(self):
+        return decode(self.session.get(session_key, ""))
+
+    @property
+    def count(self):
+        return sum(self.items.values())
+
+    @property
+    def total(self):
+        return Decimal(self.session.get(total_session_key, "0.00"))
+
+    def get_lines(self, images=False):
+        return get_lines(self.items, images)
+
+    def add(self, variant_id, quantity=1):
+        def change(items):
+            items[variant_id] = min(items.get(variant_id, 0) + quantity,
+                                    settings.CART_MAX_QUANTITY)
+        self.update(change)
+
+    def set(self, quantities):
+        """
+        New quantities by variant id,
+        0 removes the variant
+        """
+        def change(items):
+            for variant_id, quantity in quantities.items():
+                if quantity > 0:
+                    items[variant_id] = min(quantity, settings.CART_MAX_QUANTITY)
+                else:
+                    items.pop(variant_id, None)
+        self.update(change)
+
+    def update(self, change):
+        user = self.request.user
+        if not user.is_authenticated:
+            items = self.items
+            change(items)
+            self.store(items)
+            return
+        # Applied to the saved cart, which another device may have changed
+        with transaction.atomic():
+            cart, _ = Cart.objects.select_for_update().get_or_create(user=user)
+            items = decode(cart.items)
+            change(items)
+            items = self.store(items)
+            cart.items = encode(items)
+            cart.save(update_fields=["items", "updated_at"])
+
+    def store(self, items):
+        """
+        Keep the items which can still be bought,
+        at most CART_MAX_ITEMS of them, in the session
+        """
+        lines = get_lines(items)[-settings.CART_MAX_ITEMS:]
+        items = {variant.id: quantity for variant, quantity, subtotal in lines}
+        if items:
+            self.session[session_key] = encode(items)
+            self.session[total_session_key] = str(sum(subtotal for *_, subtotal in lines))
+        else:
+            self.session.pop(session_key, None)
+            self.session.pop(total_session_key, None)
+        return items
+
+
+def merge_on_login(request, user):
+    """
+    Add the cart of the anonymous visitor to the
+    saved cart of the user and use it from now on
+    """
+    session = request.session
+    # Already the copy of the user's cart, e.g. a login after a password change
+    if session.get(user_session_key) == user.pk:
+        items = {}
+    else:
+        items = decode(session.get(session_key, ""))
+
+    cart = SessionCart(request)
+    with transaction.atomic():
+        saved = Cart.objects.select_for_update().filter(user=user).first()
+        # No row for the users who never had a cart
+        if saved is None and items:
+            saved, _ = Cart.objects.select_for_update().get_or_create(user=user)
+        saved_items = decode(saved.items) if saved is not None else {}
+        merged = encode(cart.store(merge(saved_items, items)))
+        if saved is not None and merged != saved.items:
+            saved.items = merged
+            saved.save(update_fields=["items", "updated_at"])
+    session[user_session_key] = user.pk
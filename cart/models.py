@@ -0,0 +1,23 @@
+from django.db import models
+from django.conf import settings
+
+
+class Cart(models.Model):
+    """
+    Persistent cart of a user, in the
+    encoding of the session cart
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="cart",
+    )
+    items = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "cart"
+        verbose_name_plural = "carts"
+
+    def __str__(self):
+        return str(self.user)
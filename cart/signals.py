@@ -0,0 +1,10 @@
+from django.dispatch import receiver
+from django.contrib.auth.signals import user_logged_in
+
+from .cart import merge_on_login
+
+
+@receiver(user_logged_in)
+def merge_cart(sender, request, user, **kwargs):
+    if request is not None:
+        merge_on_login(request, user)
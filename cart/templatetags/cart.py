@@ -0,0 +1,14 @@
+from django import template
+
+from cart.cart import SessionCart
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cart_summary(context):
+    """
+    The cart of the visitor, its count and
+    total come from the session only
+    """
+    return SessionCart(context["request"])
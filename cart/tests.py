@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.urls import reverse
+from django.test import TestCase, RequestFactory, override_settings
+from django.template.loader import render_to_string
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.contrib.auth.models import AnonymousUser
+
+from account import sessions
+from account.models import User
+from home.models import Category, Product, Variant
+from .models import Cart
+from .cart import encode, decode, get_lines
+
+
+class CartTest(TestCase):
+    """
+    Tests for the session cart
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name="Bags", slug="bags")
+        self.variants = []
+        for number, price in enumerate([20, 35]):
+            product = Product.objects.create(category=category, name=f"Bag {number}",
+                                             slug=f"bag-{number}", price=price)
+            self.variants.append(Variant.objects.create(product=product, sku=f"bag-{number}",
+                                                        color="black", size="m"))
+        self.user = User.objects.create_user(phone="09120000000", full_name="Test User",
+                                             password="testpassword")
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    def add(self, variant, quantity=1):
+        return self.client.post(reverse("cart:add", args=[variant.id]), {"quantity": quantity},
+                                HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+
+    def test_encoding(self):
+        items = {1: 1, 1295: 3, 46656: 10}
+        self.assertEqual(encode(items), "1,zz:3,1000:10")
+        self.assertEqual(decode(encode(items)), items)
+        # Malformed items are dropped
+        self.assertEqual(decode("zz:3,?:1,1:x"), {1295: 3})
+
+    def test_add_and_header(self):
+        self.add(self.variants[0], 2)
+        response = self.add(self.variants[1])
+        self.assertEqual(response.json(), {"count": 3, "total": "75.00"})
+
+        request = RequestFactory().get("/")
+        # Anonymous visitors have their session in a signed cookie
+        request.session = SessionStore(self.client.cookies[settings.SESSION_COOKIE_NAME].value)
+        request.user = AnonymousUser()
+        # The header reads the session only
+        with self.assertNumQueries(0):
+            header = render_to_string("includes/cart-summary.html", request=request)
+        self.assertIn('<span class="cart-count">3</span>', header)
+        self.assertIn("$75.00", header)
+        # Not the page cached for the other anonymous visitors
+        response = self.client.get(reverse("home:main"))
+        self.assertContains(response, '<span class="cart-count">3</span>', count=2)
+
+        # Priced in one query
+        with self.assertNumQueries(1):
+            self.assertEqual(len(get_lines({variant.id: 1 for variant in self.variants})), 2)
+
+    def test_merge_on_login(self):
+        Cart.objects.create(user=self.user, items=encode({self.variants[0].id: 1}))
+        self.add(self.variants[0], 2)
+        self.add(self.variants[1])
+
+        with override_settings(RATE_LIMITS={}):
+            self.client.post(reverse("account:login"),
+                             {"username": "09120000000", "password": "testpassword"})
+        expected = {self.variants[0].id: 3, self.variants[1].id: 1}
+        self.assertEqual(decode(Cart.objects.get(user=self.user).items), expected)
+        self.assertEqual(decode(self.client.session["cart"]), expected)
+
+        # Logging in again doesn't add the session copy once more
+        self.client.force_login(self.user, backend="account.authentication.CustomBackend")
+        self.assertEqual(decode(Cart.objects.get(user=self.user).items), expected)
+
+        response = self.client.get(reverse("cart:detail"))
+        self.assertEqual(response.context["total"], 3 * 20 + 35)
+
+    def test_update(self):
+        self.client.force_login(self.user, backend="account.authentication.CustomBackend")
+        self.add(self.variants[0], 2)
+        self.add(self.variants[1])
+        self.client.post(reverse("cart:update"), {
+            f"quantity-{self.variants[0].id}": 0,
+            f"quantity-{self.variants[1].id}": 4,
+        })
+        self.assertEqual(decode(Cart.objects.get(user=self.user).items),
+                         {self.variants[1].id: 4})
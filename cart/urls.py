@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = "cart"
+urlpatterns = [
+    path("", views.CartView.as_view(), name="detail"),
+    path("add/<int:variant_id>", views.CartAdd.as_view(), name="add"),
+    path("update", views.CartUpdate.as_view(), name="update"),
+]
@@ -0,0 +1,63 @@
+from django.http import JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.views import View
+
+from home.models import Variant
+from .cart import SessionCart
+
+
+class CartView(View):
+    """
+    The items of the cart, priced at once
+    """
+
+    def get(self, request):
+        cart = SessionCart(request)
+        lines = cart.get_lines(images=True)
+        return render(request, "cart/cart.html", {
+            "lines": lines,
+            "total": sum(subtotal for *_, subtotal in lines),
+        })
+
+
+class CartAdd(View):
+    """
+    Add a variant to the cart; the product cards
+    post here with JavaScript and get the new
+    count and total
+    """
+
+    def post(self, request, variant_id):
+        get_object_or_404(Variant, id=variant_id, product__is_active=True)
+        try:
+            quantity = max(int(request.POST.get("quantity", 1)), 1)
+        except ValueError:
+            quantity = 1
+        cart = SessionCart(request)
+        cart.add(variant_id, quantity)
+
+        if request.headers.get("x-requested-with") == "XMLHttpRequest":
+            return JsonResponse({"count": cart.count, "total": str(cart.total)})
+        return redirect("cart:detail")
+
+
+class CartUpdate(View):
+    """
+    Change the quantities of the cart page,
+    0 removes the item
+    """
+
+    def post(self, request):
+        cart = SessionCart(request)
+        quantities = {}
+        for variant_id, quantity in cart.items.items():
+            try:
+                new_quantity = int(request.POST.get(f"quantity-{variant_id}", quantity))
+            except ValueError:
+                continue
+            if new_quantity != quantity:
+                quantities[variant_id] = new_quantity
+        # All the changes in one update
+        if quantities:
+            cart.set(quantities)
+        return redirect("cart:detail")
@@ -1,3 +1,30 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Category, Product, Variant, ProductImage
+
+
+class VariantInline(admin.TabularInline):
+    model = Variant
+    extra = 0
+
+
+class ProductImageInline(admin.TabularInline):
+    model = ProductImage
+    extra = 0
+
+
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'category', 'price', 'sale_price', 'is_new', 'is_active')
+    list_filter = ('is_active', 'is_new', 'category')
+    list_select_related = ('category',)
+    search_fields = ('name',)
+    prepopulated_fields = {'slug': ('name',)}
+    inlines = (VariantInline, ProductImageInline)
+
+
+class CategoryAdmin(admin.ModelAdmin):
+    prepopulated_fields = {'slug': ('name',)}
+
+
+admin.site.register(Category, CategoryAdmin)
+admin.site.register(Product, ProductAdmin)
@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.contrib.staticfiles.apps import StaticFilesConfig as BaseStaticFilesConfig
 
 
 class HomeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'home'
+
+    def ready(self):
+        from . import checks, signals, templating  # noqa: F401
+        if settings.TEMPLATE_RENDER_TIMING:
+            templating.enable_render_timing()
+        if settings.TEMPLATE_PRECOMPILE:
+            templating.enable_precompile()
+
+
+class StaticFilesConfig(BaseStaticFilesConfig):
+    """
+    Staticfiles app skipping the
+    STATICFILES_IGNORE_PATTERNS in collectstatic
+    """
+    ignore_patterns = BaseStaticFilesConfig.ignore_patterns + settings.STATICFILES_IGNORE_PATTERNS
@@ -0,0 +1,46 @@
+"""
+System checks of the settings
+"""
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Settings naming a cache which holds state every worker process has to
+# see: the deleted sessions, the cached users, the version of the facet
+# index and of the catalog tables and of the cached pages, the wishlist
+# counts, the request counts of the rate limits
+shared_cache_settings = [
+    "SESSION_CACHE_ALIAS",
+    "USER_CACHE",
+    "FACET_CACHE",
+    "CATALOG_VERSION_CACHE",
+    "PAGE_CACHE",
+    "WISHLIST_CACHE",
+    "RATE_LIMIT_CACHE",
+]
+
+cache_verification_store = "account.verification.CacheVerificationStore"
+
+process_local_backends = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(deploy=True)
+def check_shared_caches(app_configs, **kwargs):
+    errors = []
+    aliases = [(name, getattr(settings, name)) for name in shared_cache_settings]
+    # The codes sent and checked by different workers
+    if settings.VERIFICATION_STORE["BACKEND"] == cache_verification_store:
+        aliases.append(("VERIFICATION_STORE",
+                        settings.VERIFICATION_STORE.get("OPTIONS", {}).get("alias", "verification")))
+    for name, alias in aliases:
+        if settings.CACHES[alias]["BACKEND"] in process_local_backends:
+            errors.append(Error(
+                f"{name} is the process-local cache {alias!r}, the worker processes "
+                f"don't share it.",
+                hint="Set CACHE_URL to a cache server, or silence home.E001 when a single "
+                     "process serves the site.",
+                id="home.E001",
+            ))
+    return errors
@@ -0,0 +1,226 @@
+"""
+Facet index of the product filter: a bitmap of
+the active product ids (bit n is product n) for
+every category, colour, size and price band. The
+bitmaps are stored in FacetBitmap, updated for
+each changed product by the signals of home.signals,
+and kept in memory by every process until the
+version in settings.FACET_CACHE changes (a cache
+all the processes share, see home.checks).
+Filtering and counting are then a few big-integer
+ANDs.
+"""
+import time
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import FacetBitmap, Product, Variant
+
+facets = ("category", "color", "size", "price")
+
+version_key = "home.facets:version"
+
+
+def get_cache():
+    return caches[settings.FACET_CACHE]
+
+
+def encode(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+def decode(data):
+    return int.from_bytes(data, "little")
+
+
+def encode_ids(ids):
+    # Faster than growing an int one bit at a time
+    data = bytearray(max(ids) // 8 + 1)
+    for id in ids:
+        data[id >> 3] |= 1 << (id & 7)
+    return bytes(data)
+
+
+def get_price_bands():
+    # FACET_PRICE_BANDS = [50, 100] gives "0-50", "50-100" and "100+"
+    limits = [0] + list(settings.FACET_PRICE_BANDS)
+    return [f"{low}-{high}" for low, high in zip(limits, limits[1:])] + [f"{limits[-1]}+"]
+
+
+def get_price_band(price):
+    bands = get_price_bands()
+    for band, limit in zip(bands, settings.FACET_PRICE_BANDS):
+        if price < limit:
+            return band
+    return bands[-1]
+
+
+def get_values(category, price, sale_price, variants):
+    # The (facet, value) pairs of an active product
+    values = {("category", category),
+              ("price", get_price_band(sale_price if sale_price is not None else price))}
+    for color, size in variants:
+        values.update({("color", color), ("size", size)})
+    return values
+
+
+def get_product_values(product_id):
+    product = Product.objects.filter(id=product_id, is_active=True).values_list(
+        "category__slug", "price", "sale_price").first()
+    if product is None:
+        return set()
+    variants = Variant.objects.filter(product=product_id).values_list("color", "size")
+    return get_values(*product, variants)
+
+
+class FacetIndex(object):
+    """
+    Bitmaps by (facet, value). A selection is a dict
+    of the chosen values of each facet: a product
+    has to match one value of every facet.
+    """
+
+    def __init__(self, bitmaps):
+        self.bitmaps = bitmaps
+        # Every active product has a category
+        self.all = 0
+        for (facet, value), bits in bitmaps.items():
+            if facet == "category":
+                self.all |= bits
+
+    def get_values(self, facet):
+        values = [value for key_facet, value in self.bitmaps if key_facet == facet]
+        if facet == "price":
+            bands = get_price_bands()
+            return sorted(values, key=lambda value: bands.index(value) if value in bands else -1)
+        return sorted(values)
+
+    def match(self, selection, skip=None):
+        bits = self.all
+        for facet, values in selection.items():
+            if facet != skip and values:
+                any_value = 0
+                for value in values:
+                    any_value |= self.bitmaps.get((facet, value), 0)
+                bits &= any_value
+        return bits
+
+    def counts(self, selection):
+        """
+        {facet: [(value, count)]}, the number of products
+        matching the selection with the value, counted
+        without the selection of its own facet so that
+        the other values of it can be added
+        """
+        counts = {}
+        for facet in facets:
+            bits = self.match(selection, skip=facet)
+            counts[facet] = [(value, (bits & self.bitmaps[facet, value]).bit_count())
+                             for value in self.get_values(facet)]
+        return counts
+
+    def page(self, bits, after=None, size=8):
+        """
+        Ids of the newest products of the bitmap as
+        Product.objects.page(): those before `after`
+        and the cursor of the next page
+        """
+        if after is not None:
+            bits &= (1 << after) - 1
+        ids = []
+        while bits and len(ids) <= size:
+            # The highest bit is the newest product
+            id = bits.bit_length() - 1
+            ids.append(id)
+            bits ^= 1 << id
+        if len(ids) > size:
+            return ids[:size], ids[size - 1]
+        return ids, None
+
+
+# (version, index) of this process
+loaded = [None, None]
+
+
+def load_index():
+    return FacetIndex({(row.facet, row.value): decode(row.bits)
+                       for row in FacetBitmap.objects.all()})
+
+
+def get_index():
+    """
+    The index of this process, loaded again
+    when it has been updated meanwhile
+    """
+    # A lost version starts a new one rather than keeping stale bitmaps
+    version = get_cache().get_or_set(version_key, time.time_ns, None)
+    loaded_version, index = loaded
+    if loaded_version != version:
+        index = load_index()
+        # Replaced at once for the other threads
+        loaded[:] = version, index
+    return index
+
+
+def changed():
+    get_cache().set(version_key, time.time_ns(), None)
+
+
+def update_product(product_id):
+    """
+    Set the bit of the product in the bitmaps of
+    its current values and clear it in the others
+    """
+    bit = 1 << product_id
+    with transaction.atomic():
+        values = get_product_values(product_id)
+        rows = {(row.facet, row.value): row for row in FacetBitmap.objects.select_for_update()}
+        for key in set(rows) | values:
+            row = rows.get(key) or FacetBitmap(facet=key[0], value=key[1], bits=b"")
+            bits = decode(row.bits)
+            new_bits = bits | bit if key in values else bits & ~bit
+            if new_bits == bits:
+                continue
+            if new_bits:
+                row.bits = encode(new_bits)
+                row.save()
+            else:
+                row.delete()
+        transaction.on_commit(changed)
+
+
+def rebuild(chunk_size=2000):
+    """
+    Build every bitmap again, reading the products
+    and their variants chunk_size rows at a time
+    """
+    products = Product.objects.filter(is_active=True).order_by("id").values_list(
+        "id", "category__slug", "price", "sale_price")
+    variants = Variant.objects.filter(product__is_active=True).order_by("product").values_list(
+        "product", "color", "size")
+    variants_by_product = groupby(variants.iterator(chunk_size=chunk_size),
+                                  key=lambda variant: variant[0])
+    next_variants = next(variants_by_product, (None, ()))
+
+    ids = {}
+    for id, category, price, sale_price in products.iterator(chunk_size=chunk_size):
+        # Both ordered by product, walked side by side
+        while next_variants[0] is not None and next_variants[0] < id:
+            next_variants = next(variants_by_product, (None, ()))
+        product_variants = []
+        if next_variants[0] == id:
+            product_variants = [(color, size) for _, color, size in next_variants[1]]
+        for key in get_values(category, price, sale_price, product_variants):
+            ids.setdefault(key, []).append(id)
+
+    with transaction.atomic():
+        FacetBitmap.objects.all().delete()
+        FacetBitmap.objects.bulk_create(
+            FacetBitmap(facet=facet, value=value, bits=encode_ids(value_ids))
+            for (facet, value), value_ids in ids.items()
+        )
+        transaction.on_commit(changed)
+    return len(ids)
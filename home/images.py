@@ -0,0 +1,121 @@
+"""
+Responsive variants of the static images, built
+by the build_image_variants command and used by
+the {% responsive_image %}/{% responsive_bg %} tags
+"""
+import io
+import os
+import json
+import base64
+import hashlib
+
+from PIL import Image, ImageFilter, ImageOps
+from django.conf import settings
+
+# Pillow format, MIME type and save options
+formats = {
+    "webp": ("WEBP", "image/webp", {"method": 6}),
+    "jpeg": ("JPEG", "image/jpeg", {"optimize": True, "progressive": True}),
+}
+
+manifest_cache = {}
+
+
+def get_manifest_path():
+    return os.path.join(settings.IMAGE_VARIANTS["ROOT"], "variants.json")
+
+
+def load_manifest():
+    """
+    The manifest, read again when
+    the command has rewritten it
+    """
+    manifest_path = get_manifest_path()
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    if manifest_cache.get("key") != (manifest_path, mtime):
+        with open(manifest_path) as file:
+            manifest_cache.update(key=(manifest_path, mtime), images=json.load(file))
+    return manifest_cache["images"]
+
+
+def save_manifest(images):
+    manifest_path = get_manifest_path()
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path + ".tmp", "w") as file:
+        json.dump(images, file, indent=1)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+
+def get_options_key():
+    # A change of these rebuilds every image
+    config = settings.IMAGE_VARIANTS
+    return [config["WIDTHS"], config["FORMATS"], config["QUALITY"], config["PLACEHOLDER_WIDTH"]]
+
+
+def get_fingerprint(path):
+    with open(path, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def is_up_to_date(entry, fingerprint):
+    if entry is None or entry["fingerprint"] != fingerprint \
+            or entry["options"] != get_options_key():
+        return False
+    root = settings.IMAGE_VARIANTS["ROOT"]
+    return all(os.path.exists(os.path.join(root, name))
+               for variants in entry["variants"].values() for width, name in variants)
+
+
+def make_placeholder(image):
+    """
+    Tiny blurred version of the image
+    as a data: URI
+    """
+    width = settings.IMAGE_VARIANTS["PLACEHOLDER_WIDTH"]
+    height = max(round(image.height * width / image.width), 1)
+    small = image.resize((width, height), Image.Resampling.BILINEAR)
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    # WebP has a much smaller header than JPEG at this size
+    small.save(buffer, "WEBP", quality=40)
+    return "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+
+def build_variants(name, source_path, fingerprint):
+    """
+    Write the variants of a static image and
+    return its manifest entry
+    """
+    config = settings.IMAGE_VARIANTS
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+
+    # Never upscale; the original width is the largest variant
+    widths = sorted({width for width in config["WIDTHS"] if width < image.width} | {image.width})
+    stem, _ = os.path.splitext(name)
+    variants = {}
+    for format_name in config["FORMATS"]:
+        pil_format, _, save_options = formats[format_name]
+        variants[format_name] = []
+        for width in widths:
+            variant_name = f"{stem}.{width}w.{format_name}"
+            height = round(image.height * width / image.width)
+            resized = image if width == image.width \
+                else image.resize((width, height), Image.Resampling.LANCZOS)
+
+            variant_path = os.path.join(config["ROOT"], variant_name)
+            os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+            resized.save(variant_path, pil_format, quality=config["QUALITY"], **save_options)
+            variants[format_name].append([width, variant_name])
+
+    return {
+        "fingerprint": fingerprint,
+        "options": get_options_key(),
+        "width": image.width,
+        "height": image.height,
+        "placeholder": make_placeholder(image),
+        "variants": variants,
+    }
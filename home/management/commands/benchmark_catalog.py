@@ -0,0 +1,70 @@
+import io
+import time
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from home.models import Product
+
+
+class Command(BaseCommand):
+    help = ("Render latency and query count of the home page product grid as the "
+            "catalog grows, and its keyset query against an OFFSET one")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100000)
+        parser.add_argument("--requests", type=int, default=50)
+
+    def handle(self, *args, **options):
+        sizes = [size for size in (1000, 10000, 100000) if size < options["products"]]
+        sizes.append(options["products"])
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root, PAGE_CACHE_TIMEOUT=0,
+                                      ALLOWED_HOSTS=["testserver"]):
+                seeded = 0
+                for size in sizes:
+                    call_command("seed_catalog", products=size - seeded, stdout=io.StringIO())
+                    seeded = size
+                    self.run_cases(size, options["requests"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_cases(self, size, requests):
+        client = Client()
+        ids = list(Product.objects.order_by("-id").values_list("id", flat=True)[::size // 4 or 1])
+        middle = ids[len(ids) // 2]
+        page_size = settings.CATALOG_PAGE_SIZE
+        offset = Product.objects.filter(id__gt=middle).count()
+
+        self.stdout.write(f"\n{size} products:")
+        cases = {
+            "first page": lambda: client.get("/"),
+            "middle page": lambda: client.get(f"/?after={middle}"),
+            "middle page, keyset": lambda: Product.objects.for_grid().page(middle, page_size),
+            "middle page, OFFSET": lambda: list(
+                Product.objects.for_grid().order_by("-id")[offset:offset + page_size]),
+        }
+        for name, request in cases.items():
+            # Warm up
+            request()
+            queries = []
+
+            def count(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            # CaptureQueriesContext misses them, every request resets the query log
+            with connection.execute_wrapper(count):
+                request()
+            start = time.perf_counter()
+            for _ in range(requests):
+                request()
+            elapsed = (time.perf_counter() - start) / requests
+            self.stdout.write(f"  {name:<22} {elapsed * 1000:8.2f}ms  {len(queries)} queries")
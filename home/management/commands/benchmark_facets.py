@@ -0,0 +1,117 @@
+import io
+import time
+import tempfile
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q
+from django.db.models.functions import Coalesce
+from django.test import override_settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from home import facets
+from home.models import Product, Variant
+
+
+class Command(BaseCommand):
+    help = ("Facet counts and the first page of filtered products from the facet "
+            "bitmaps against COUNT(*) ... GROUP BY queries of the ORM")
+
+    selections = {
+        "no filter": {},
+        "category": {"category": ["bags"]},
+        "colour + price": {"color": ["black", "grey"], "price": ["50-100"]},
+        "every facet": {"category": ["clothing"], "color": ["blue"], "size": ["m", "l"],
+                        "price": ["100-150", "150+"]},
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100000)
+        parser.add_argument("--requests", type=int, default=20)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root):
+                call_command("seed_catalog", products=options["products"], stdout=io.StringIO())
+                self.run_cases(options["products"], options["requests"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_cases(self, products, requests):
+        self.stdout.write(f"{products} products:")
+        self.stdout.write(f"  {'':<16} {'matching':>8} {'ORM':>10} {'bitmaps':>10}")
+        for name, selection in self.selections.items():
+            naive, naive_time = self.measure(lambda: self.naive(selection), requests)
+            indexed, indexed_time = self.measure(lambda: self.indexed(selection), requests)
+            if naive != indexed:
+                self.stderr.write(f"  {name}: the results differ")
+            self.stdout.write(f"  {name:<16} {naive[0]:>8} {naive_time * 1000:8.2f}ms "
+                              f"{indexed_time * 1000:8.2f}ms")
+
+        # A product change, including loading the index again
+        product = Product.objects.order_by("?").first()
+        start = time.perf_counter()
+        product.save()
+        facets.get_index()
+        self.stdout.write(f"\n  update of a product and reload {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    def measure(self, function, requests):
+        result = function()
+        start = time.perf_counter()
+        for _ in range(requests):
+            function()
+        return result, (time.perf_counter() - start) / requests
+
+    def indexed(self, selection):
+        index = facets.get_index()
+        bits = index.match(selection)
+        ids, next_after = index.page(bits, size=settings.CATALOG_PAGE_SIZE)
+        counts = {facet: [item for item in values if item[1]]
+                  for facet, values in index.counts(selection).items()}
+        return bits.bit_count(), ids, counts
+
+    def naive(self, selection):
+        price = Coalesce("sale_price", "price")
+        bands = facets.get_price_bands()
+        limits = [0] + list(settings.FACET_PRICE_BANDS) + [None]
+
+        def band_filter(band):
+            low, high = limits[bands.index(band)], limits[bands.index(band) + 1]
+            return Q(current_price__gte=low) & (Q(current_price__lt=high) if high else Q())
+
+        def filtered(skip=None):
+            products = Product.objects.filter(is_active=True).annotate(current_price=price)
+            for facet, values in selection.items():
+                if facet == skip:
+                    continue
+                if facet == "category":
+                    products = products.filter(category__slug__in=values)
+                elif facet == "price":
+                    condition = Q()
+                    for band in values:
+                        condition |= band_filter(band)
+                    products = products.filter(condition)
+                else:
+                    products = products.filter(id__in=Variant.objects.filter(
+                        **{f"{facet}__in": values}).values("product"))
+            return products
+
+        counts = {
+            "category": sorted(filtered("category").values_list("category__slug").annotate(
+                Count("id")).order_by()),
+        }
+        for facet in ("color", "size"):
+            counts[facet] = sorted(
+                Variant.objects.filter(product__in=filtered(facet).values("id"))
+                .values_list(facet).annotate(Count("product", distinct=True)).order_by()
+            )
+        price_counts = filtered("price").aggregate(
+            **{band: Count("id", filter=band_filter(band)) for band in bands})
+        counts["price"] = [(band, price_counts[band]) for band in bands if price_counts[band]]
+
+        ids = list(filtered().order_by("-id").values_list("id", flat=True)[
+            :settings.CATALOG_PAGE_SIZE])
+        return filtered().count(), ids, counts
@@ -0,0 +1,56 @@
+import time
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.core.management.base import BaseCommand
+
+from account.sessions import flush_pending_sessions
+from account.models import User
+from home.page_cache import invalidate_page_cache
+
+
+class Command(BaseCommand):
+    help = "Compare the throughput of the home page with and without the page cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            user = User.objects.create_user(phone="09120000000", full_name="Benchmark User",
+                                            password="benchmark-password")
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                for timeout in (0, 60):
+                    self.run_cases(user, timeout, options["requests"])
+        finally:
+            # Written now, their database is gone at exit
+            flush_pending_sessions()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_cases(self, user, timeout, requests):
+        anonymous = Client()
+        authenticated = Client()
+        authenticated.force_login(user)
+
+        title = "page cache" if timeout else "no page cache"
+        self.stdout.write(f"\n{title}:")
+        with override_settings(PAGE_CACHE_TIMEOUT=timeout):
+            invalidate_page_cache()
+            etag = anonymous.get("/").get("ETag")
+            cases = {
+                "anonymous": lambda: anonymous.get("/"),
+                "anonymous, If-None-Match": lambda: anonymous.get("/", HTTP_IF_NONE_MATCH=etag),
+                "authenticated": lambda: authenticated.get("/"),
+            }
+            if not etag:
+                del cases["anonymous, If-None-Match"]
+
+            for name, request in cases.items():
+                # Warm up the caches
+                request()
+                start = time.perf_counter()
+                for _ in range(requests):
+                    request()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"  {name:<26} {requests / elapsed:8.1f} requests/s")
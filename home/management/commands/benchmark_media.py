@@ -0,0 +1,91 @@
+import os
+import time
+import tempfile
+
+from django.test import RequestFactory, override_settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+
+
+class SendfileWrapper(object):
+    """
+    wsgi.file_wrapper sending with os.sendfile() to
+    /dev/null, the way gunicorn sends to the socket
+    """
+
+    def __init__(self, filelike, block_size=8192):
+        self.filelike = filelike
+
+    def send(self, headers):
+        length = int(dict(headers).get("Content-Length", 0))
+        fileno = self.filelike.fileno()
+        offset = os.lseek(fileno, 0, os.SEEK_CUR)
+        with open(os.devnull, "wb") as output:
+            while length > 0:
+                sent = os.sendfile(output.fileno(), fileno, offset, length)
+                if not sent:
+                    break
+                offset += sent
+                length -= sent
+
+    def close(self):
+        self.filelike.close()
+
+
+class Command(BaseCommand):
+    help = "Measure the throughput and CPU time per request of the media serving"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size", type=int, default=20, help="File size in MB")
+        parser.add_argument("--requests", type=int, default=20)
+
+    def handle(self, *args, **options):
+        size = options["size"] * 1024 * 1024
+        with tempfile.TemporaryDirectory() as media_root:
+            with open(os.path.join(media_root, "file.bin"), "wb") as file:
+                file.write(os.urandom(size))
+
+            cases = [
+                ("django.views.static.serve", "old", {}, {}, size),
+                ("FileResponse, streamed", "django", {}, {}, size),
+                ("FileResponse, sendfile", "django", {"wsgi.file_wrapper": SendfileWrapper}, {}, size),
+                ("1 MB range, streamed", "django", {}, {"HTTP_RANGE": "bytes=0-1048575"}, 1048576),
+                ("X-Accel-Redirect", "x-accel-redirect", {}, {}, 0),
+            ]
+            for name, mode, environ, headers, sent in cases:
+                self.run_case(name, mode, environ, headers, sent, media_root, options["requests"])
+
+    def run_case(self, name, mode, environ, headers, sent, media_root, requests):
+        from django.conf import settings
+        from django.conf.urls.static import static
+
+        # The previous view, as male_fashion.urls served media before
+        class OldUrls(object):
+            urlpatterns = static("/media/", document_root=media_root)
+
+        overrides = {"MEDIA_ROOT": media_root, "ALLOWED_HOSTS": ["testserver"],
+                     "MEDIA_SERVE": {**settings.MEDIA_SERVE, "MODE": mode}}
+        if mode == "old":
+            overrides.update(ROOT_URLCONF=OldUrls, DEBUG=True)
+
+        with override_settings(**overrides):
+            handler = WSGIHandler()
+            factory = RequestFactory()
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            for _ in range(requests):
+                request_environ = {**factory.get("/media/file.bin", **headers).environ, **environ}
+                response_headers = []
+                result = handler(request_environ,
+                                 lambda status, headers_: response_headers.extend(headers_))
+                if isinstance(result, SendfileWrapper):
+                    result.send(response_headers)
+                else:
+                    for chunk in result:
+                        pass
+                result.close()
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+
+        throughput = f"{sent * requests / wall / 1024 / 1024:9.1f} MB/s" if sent else f"{'-':>9}     "
+        self.stdout.write(f"{name:<28} {throughput}  {cpu / requests * 1000:8.2f}ms CPU/request")
@@ -0,0 +1,63 @@
+import io
+import time
+import tempfile
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from home import search
+
+
+class Command(BaseCommand):
+    help = "Latency of the product search over a synthetic catalog"
+
+    queries = {
+        "word": "jacket",
+        "prefix": "back",
+        "two words": "leather belt",
+        "typo": "jakcet",
+        "typos, two words": "vintge sneakres",
+        "no match": "umbrella",
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100000)
+        parser.add_argument("--requests", type=int, default=100)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root, ALLOWED_HOSTS=["testserver"]):
+                call_command("seed_catalog", products=options["products"], stdout=io.StringIO())
+                start = time.perf_counter()
+                search.rebuild()
+                self.stdout.write(f"{options['products']} products, "
+                                  f"reindexed in {time.perf_counter() - start:.1f}s\n")
+                self.run_cases(options["requests"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_cases(self, requests):
+        client = Client()
+        self.stdout.write(f"  {'':<18} {'results':>7} {'search':>9} {'p95':>9} {'page':>9}")
+        for name, query in self.queries.items():
+            results = len(search.search(query, limit=1000))
+            timings = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                search.search(query)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get("/search", {"q": query})
+            page = (time.perf_counter() - start) / requests
+
+            self.stdout.write(
+                f"  {name:<18} {results:>7} {sum(timings) / requests * 1000:7.2f}ms "
+                f"{timings[int(requests * 0.95)] * 1000:7.2f}ms {page * 1000:7.2f}ms"
+            )
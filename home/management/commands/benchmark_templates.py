@@ -0,0 +1,62 @@
+import time
+
+from django.conf import settings
+from django.template import RequestContext
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory, override_settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+
+from home import templating
+
+loaders = [
+    "django.template.loaders.filesystem.Loader",
+    "django.template.loaders.app_directories.Loader",
+]
+
+
+class Command(BaseCommand):
+    help = "Compare the render time of a page with the template loading modes"
+
+    configurations = {
+        "no cached loader": (loaders, False),
+        "cached loader": ([("django.template.loaders.cached.Loader", loaders)], False),
+        "precompiled": ([("home.templating.Loader", loaders)], False),
+        "precompiled + inlined includes": ([("home.templating.Loader", loaders)], True),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--template", default="home/index.html")
+        parser.add_argument("--renders", type=int, default=200)
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+        template_options = settings.TEMPLATES[0]["OPTIONS"]
+
+        for name, (engine_loaders, inline) in self.configurations.items():
+            engine = DjangoTemplates({
+                "NAME": "benchmark", "DIRS": settings.TEMPLATES[0]["DIRS"], "APP_DIRS": False,
+                "OPTIONS": {**template_options, "loaders": engine_loaders},
+            }).engine
+            inline_includes = settings.TEMPLATE_INLINE_INCLUDES if inline else []
+
+            with override_settings(TEMPLATE_INLINE_INCLUDES=inline_includes):
+                engine.get_template(options["template"]).render(RequestContext(request))
+                start = time.perf_counter()
+                for _ in range(options["renders"]):
+                    engine.get_template(options["template"]).render(RequestContext(request))
+                elapsed = time.perf_counter() - start
+            self.stdout.write(f"{name:<32} {elapsed / options['renders'] * 1000:7.3f}ms/render")
+
+        # Where the time goes, with the production mode
+        templating.enable_render_timing()
+        templating.render_timings.clear()
+        with override_settings(TEMPLATE_RENDER_TIMING_THRESHOLD=float("inf")):
+            for _ in range(options["renders"]):
+                engine.get_template(options["template"]).render(RequestContext(request))
+
+        self.stdout.write(f"\n{'template':<32} {'renders':>7} {'total ms':>9} {'self ms':>9} {'max ms':>8}")
+        for template_name, count, total, own, slowest in templating.render_timings.summary():
+            self.stdout.write(f"{template_name:<32} {count:7d} {total * 1000:9.1f}"
+                              f" {own * 1000:9.1f} {slowest * 1000:8.2f}")
@@ -0,0 +1,57 @@
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+
+from home import images
+
+extensions = (".jpg", ".jpeg", ".png")
+
+
+class Command(BaseCommand):
+    help = ("Build the WebP/JPEG widths and the placeholders of the static images "
+            "listed in settings.IMAGE_VARIANTS, skipping the unchanged ones")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true",
+                            help="Rebuild the images which are up to date too")
+
+    def handle(self, *args, **options):
+        config = settings.IMAGE_VARIANTS
+        manifest = images.load_manifest()
+        found = dict(self.find_images(config["SOURCES"]))
+
+        built = skipped = 0
+        for name, source_path in sorted(found.items()):
+            fingerprint = images.get_fingerprint(source_path)
+            if not options["force"] and images.is_up_to_date(manifest.get(name), fingerprint):
+                skipped += 1
+                continue
+            manifest[name] = images.build_variants(name, source_path, fingerprint)
+            built += 1
+            self.stdout.write(f"Built {name}")
+
+        # Forget the images which were removed
+        for name in set(manifest) - set(found):
+            for variants in manifest.pop(name)["variants"].values():
+                for width, variant_name in variants:
+                    path = os.path.join(config["ROOT"], variant_name)
+                    if os.path.exists(path):
+                        os.remove(path)
+
+        images.save_manifest(manifest)
+        self.stdout.write(f"{built} built, {skipped} up to date")
+
+    @staticmethod
+    def find_images(sources):
+        root = os.path.abspath(settings.IMAGE_VARIANTS["ROOT"])
+        for finder in finders.get_finders():
+            for name, storage in finder.list([]):
+                # The variants are static files too
+                if os.path.abspath(storage.location) == root:
+                    continue
+                name = name.replace(os.sep, "/")
+                if name.lower().endswith(extensions) \
+                        and any(name.startswith(source.rstrip("/") + "/") for source in sources):
+                    yield name, storage.path(name)
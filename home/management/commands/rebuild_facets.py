@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from home import facets
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the facet bitmaps of the product filter, e.g. after bulk updates "
+            "which sent no signals. The products are read in chunks.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = facets.rebuild(options["chunk_size"])
+        self.stdout.write(f"Built {count} bitmaps in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,105 @@
+import random
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max
+from django.contrib.staticfiles import finders
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils.text import slugify
+
+from home import facets, search, versions
+from home.models import Category, Product, Variant, ProductImage
+from home.page_cache import invalidate_page_cache
+
+categories = {
+    "clothing": ["Piqué Biker Jacket", "T-shirt Contrast Pocket", "Basic Flowing Scarf",
+                 "Linen Overshirt", "Slim Fit Chinos"],
+    "bags": ["Multi-pocket Chest Bag", "Lether Backpack", "Canvas Tote"],
+    "accessories": ["Diagonal Textured Cap", "Knitted Beanie", "Leather Belt"],
+    "shoes": ["Ankle Boots", "Suede Loafers", "Running Sneakers"],
+}
+styles = ["Classic", "Oversized", "Vintage", "Essential", "Relaxed", "Tailored", "Washed",
+          "Organic", "Premium", "Lightweight", "Quilted", "Striped", "Cropped", "Heritage"]
+description_words = ["soft", "cotton", "wool", "linen", "leather", "durable", "breathable",
+                     "everyday", "regular", "fit", "stitched", "lined", "recycled", "matte",
+                     "brushed", "waterproof", "adjustable", "padded", "ribbed", "woven",
+                     "summer", "winter", "travel", "weekend", "office", "street"]
+
+# The product pictures of the template, copied to MEDIA_ROOT
+image_count = 14
+
+
+class Command(BaseCommand):
+    help = "Add generated products, with their variants and images, to the catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100)
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--seed", type=int, default=0,
+                            help="Seed of the random data, the same seed gives the same catalog")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        image_names = self.copy_images()
+        category_objects = [
+            Category.objects.get_or_create(slug=slug, defaults={"name": slug.title()})[0]
+            for slug in categories
+        ]
+
+        # Slugs continue after the products seeded before
+        start = (Product.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+        total = options["products"]
+        for offset in range(0, total, options["batch_size"]):
+            numbers = range(start + offset, start + min(offset + options["batch_size"], total))
+            with transaction.atomic():
+                self.create_batch(rng, numbers, category_objects, image_names)
+
+        # The grid changed, bulk_create sends no signals
+        facets.rebuild()
+        invalidate_page_cache()
+        versions.changed(*versions.tables)
+        self.stdout.write(f"Added {total} products")
+
+    def copy_images(self):
+        names = []
+        for number in range(1, image_count + 1):
+            name = f"product_image/product-{number}.jpg"
+            if not default_storage.exists(name):
+                with open(finders.find(f"img/product/product-{number}.jpg"), "rb") as file:
+                    name = default_storage.save(name, File(file))
+            names.append(name)
+        return names
+
+    def create_batch(self, rng, numbers, category_objects, image_names):
+        products = []
+        for number in numbers:
+            category = rng.choice(category_objects)
+            name = f"{rng.choice(styles)} {rng.choice(categories[category.slug])}"
+            price = Decimal(rng.randrange(1500, 25000)) / 100
+            products.append(Product(
+                category=category,
+                name=name,
+                slug=f"{slugify(name)}-{number}",
+                description=" ".join(rng.sample(description_words, 8)).capitalize() + ".",
+                price=price,
+                sale_price=(price * Decimal("0.8")).quantize(Decimal("0.01"))
+                if rng.random() < 0.2 else None,
+                rating=rng.randint(0, 5),
+                is_new=rng.random() < 0.3,
+            ))
+        # The ids are returned by the insert on PostgreSQL and SQLite 3.35+
+        Product.objects.bulk_create(products)
+        # Indexed here, bulk_create sends no signals
+        search.index_products(products)
+
+        variants, images = [], []
+        for product in products:
+            for color in rng.sample([color for color, _ in Variant.COLORS], rng.randint(1, 3)):
+                size = rng.choice(Variant.SIZES)[0]
+                variants.append(Variant(product=product, sku=f"{product.slug}-{color}-{size}",
+                                        color=color, size=size, stock=rng.randint(0, 50)))
+            images.append(ProductImage(product=product, image=rng.choice(image_names)))
+        Variant.objects.bulk_create(variants)
+        ProductImage.objects.bulk_create(images)
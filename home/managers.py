@@ -0,0 +1,36 @@
+from django.db import models
+
+
+class ProductQuerySet(models.QuerySet):
+    """
+    Custom queryset for the Product model
+    """
+
+    def for_grid(self):
+        """
+        Active products with what a product card
+        shows: the category in the same query,
+        the images and colours in one query each
+        """
+        from .models import Variant
+
+        return self.filter(is_active=True).select_related("category").prefetch_related(
+            "images",
+            models.Prefetch("variants", queryset=Variant.objects.only("product", "color")),
+        )
+
+    def page(self, after=None, size=8):
+        """
+        The newest products first, the ones older
+        than `after` (a product id) for the next
+        pages. Returns the products and the cursor
+        of the next page (None on the last page).
+        """
+        queryset = self.order_by("-id")
+        if after is not None:
+            queryset = queryset.filter(id__lt=after)
+        # One more row tells whether there's a next page
+        products = list(queryset[:size + 1])
+        if len(products) > size:
+            return products[:size], products[size - 1].id
+        return products, None
@@ -0,0 +1,355 @@
+"""
+Serving of MEDIA_ROOT (serve) and resized variants
+of the uploaded images (e.g. User.image), generated
+once and kept in a size-capped disk cache (resized)
+"""
+import os
+import re
+import time
+import mimetypes
+import hashlib
+import logging
+import tempfile
+import threading
+from functools import lru_cache
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from django.conf import settings
+from django.dispatch import receiver
+from django.core.signals import setting_changed
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+logger = logging.getLogger(__name__)
+
+range_pattern = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Larger than FileResponse's 4KB when the file is streamed through Python
+block_size = 64 * 1024
+
+# Pillow format, MIME type and save options
+formats = {
+    "webp": ("WEBP", "image/webp", {"method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"optimize": True, "progressive": True}),
+}
+
+
+class DiskCache(object):
+    """
+    Files under a directory, the least recently
+    used ones are deleted once they take more
+    than max_size bytes. A hit updates the mtime
+    of the file, so mtime is the last use.
+    """
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # Estimate, corrected by every eviction scan
+        self.size = None
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key[:2], f"{key}.{extension}")
+
+    def get(self, path):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def add(self, path, write):
+        """
+        Write a new file with write(file), atomically
+        for the other processes reading the cache
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as file:
+            try:
+                write(file)
+            except BaseException:
+                file.close()
+                os.remove(file.name)
+                raise
+        os.replace(file.name, path)
+
+        with self.lock:
+            if self.size is None:
+                self.size = self.scan_size()
+            else:
+                self.size += os.path.getsize(path)
+            if self.size > self.max_size:
+                self.evict()
+
+    def files(self):
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def scan_size(self):
+        return sum(size for mtime, size, path in self.files())
+
+    def evict(self):
+        # Down to 90% so that the next few writes don't scan again
+        files = sorted(self.files())
+        self.size = sum(size for mtime, size, path in files)
+        for mtime, size, path in files:
+            if self.size <= self.max_size * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+
+class Coalescer(object):
+    """
+    One lock per key, so that concurrent requests
+    for the same variant wait for the first one
+    instead of generating it too
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    def acquire(self, key):
+        with self.lock:
+            lock, waiting = self.locks.get(key, (threading.Lock(), 0))
+            self.locks[key] = (lock, waiting + 1)
+        lock.acquire()
+
+    def release(self, key):
+        with self.lock:
+            lock, waiting = self.locks[key]
+            if waiting == 1:
+                del self.locks[key]
+            else:
+                self.locks[key] = (lock, waiting - 1)
+        lock.release()
+
+
+coalescer = Coalescer()
+
+
+@lru_cache(maxsize=None)
+def get_disk_cache():
+    config = settings.MEDIA_RESIZE
+    return DiskCache(config["CACHE_DIR"], config["CACHE_MAX_SIZE"])
+
+
+@receiver(setting_changed)
+def reset_disk_cache(setting, **kwargs):
+    if setting == "MEDIA_RESIZE":
+        get_disk_cache.cache_clear()
+
+
+def get_format(request):
+    # An explicit ?fm= or the best one the client accepts
+    format_name = request.GET.get("fm")
+    if format_name:
+        return format_name if format_name in formats else None
+    return "webp" if "image/webp" in request.META.get("HTTP_ACCEPT", "") else "jpeg"
+
+
+def resize(source_path, width, height, format_name, file):
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        if height:
+            # Both given: crop to the exact size
+            image = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        elif width < image.width:
+            image = image.resize((width, round(image.height * width / image.width)),
+                                 Image.Resampling.LANCZOS)
+        pil_format, _, save_options = formats[format_name]
+        image.save(file, pil_format, quality=settings.MEDIA_RESIZE["QUALITY"], **save_options)
+
+
+def resized(request, path):
+    """
+    Resized variant of an uploaded image, e.g.
+    /media/resized/user_image/a.jpg?w=96&h=96
+    """
+    config = settings.MEDIA_RESIZE
+    if not any(path.startswith(prefix) for prefix in config["PATHS"]):
+        raise Http404
+
+    try:
+        width = int(request.GET["w"])
+        height = int(request.GET.get("h", 0))
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest("Invalid size")
+    # Only a few sizes, the cache can't be filled with arbitrary ones
+    if width not in config["WIDTHS"] or (height and height not in config["WIDTHS"]):
+        return HttpResponseBadRequest("Invalid size")
+    format_name = get_format(request)
+    if format_name is None:
+        return HttpResponseBadRequest("Invalid format")
+
+    source_path = safe_join(settings.MEDIA_ROOT, path)
+    try:
+        stat = os.stat(source_path)
+    except FileNotFoundError:
+        raise Http404
+
+    # A new upload under the same name changes the key
+    key = hashlib.sha1(
+        f"{path}:{stat.st_mtime_ns}:{stat.st_size}:{width}:{height}:{format_name}".encode()
+    ).hexdigest()
+    etag = f'"{key}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache = get_disk_cache()
+        variant_path = cache.path(key, format_name)
+        if cache.get(variant_path) is None:
+            coalescer.acquire(key)
+            try:
+                # Generated meanwhile by the request we waited for
+                if cache.get(variant_path) is None:
+                    start = time.perf_counter()
+                    try:
+                        cache.add(variant_path, lambda file: resize(
+                            source_path, width, height, format_name, file))
+                    except (UnidentifiedImageError, OSError):
+                        logger.exception("Resizing %s failed", path)
+                        raise Http404
+                    logger.debug("Resized %s in %.1fms", path, (time.perf_counter() - start) * 1000)
+            finally:
+                coalescer.release(key)
+        variant_stat = os.stat(variant_path)
+        response = file_response(request, variant_path, variant_stat.st_size,
+                                 formats[format_name][1], etag, variant_stat.st_mtime)
+        if response.has_header("Content-Disposition"):
+            del response["Content-Disposition"]
+
+    response["ETag"] = etag
+    response["Cache-Control"] = f"public, max-age={config['MAX_AGE']}"
+    if "fm" not in request.GET:
+        patch_vary_headers(response, ("Accept",))
+    return response
+
+
+class RangeFile(object):
+    """
+    Part of an open file for FileResponse. The file
+    is positioned at the start, so that a server
+    using sendfile() on fileno() with the
+    Content-Length sends only the range too.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def get_range(request, size, etag, mtime):
+    """
+    (start, length) of a single satisfiable
+    Range, None for the whole file and False
+    if the range can't be satisfied
+    """
+    header = request.META.get("HTTP_RANGE")
+    if not header:
+        return None
+    # If-Range: the range only applies to the same version of the file
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != int(mtime):
+        return None
+
+    match = range_pattern.match(header.replace(" ", ""))
+    # Several ranges are answered with the whole file
+    if match is None or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        # The last N bytes
+        length = min(int(last), size)
+        return (size - length, length) if length else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, end - start + 1
+
+
+def serve(request, path):
+    """
+    Serve a file of MEDIA_ROOT with conditional
+    and range requests, or have the front server
+    send it (MEDIA_SERVE["MODE"])
+    """
+    config = settings.MEDIA_SERVE
+    fullpath = safe_join(settings.MEDIA_ROOT, path)
+    try:
+        stat = os.stat(fullpath)
+    except FileNotFoundError:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    content_type = mimetypes.guess_type(fullpath)[0] or "application/octet-stream"
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+    if config["MODE"] == "x-accel-redirect":
+        # nginx serves the internal location, ranges and conditions included
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = config["ACCEL_PREFIX"] + path
+    elif config["MODE"] == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = fullpath
+    else:
+        response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+        if response is None:
+            response = file_response(request, fullpath, stat.st_size, content_type,
+                                     etag, stat.st_mtime)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = f"public, max-age={config['MAX_AGE']}"
+    return response
+
+
+def file_response(request, fullpath, size, content_type, etag, mtime):
+    byte_range = get_range(request, size, etag, mtime)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    file = open(fullpath, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, length = byte_range
+        response = FileResponse(RangeFile(file, start, length), content_type=content_type,
+                                status=206)
+        response["Content-Length"] = length
+        response["Content-Range"] = f"bytes {start}-{start + length - 1}/{size}"
+    response.block_size = block_size
+    response["Accept-Ranges"] = "bytes"
+    return response
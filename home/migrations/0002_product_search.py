@@ -0,0 +1,53 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        # rowid is the product id; prefix indexes for the as-you-type queries
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE home_product_search USING fts5("
+            "name, category, description, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        # bm25() ranking, a match in the name counts the most
+        schema_editor.execute(
+            "INSERT INTO home_product_search (home_product_search, rank) "
+            "VALUES ('rank', 'bm25(10.0, 3.0, 1.0)')"
+        )
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE home_product_search_terms "
+            "USING fts5vocab(home_product_search, row)"
+        )
+        schema_editor.execute(
+            "INSERT INTO home_product_search (rowid, name, category, description) "
+            "SELECT home_product.id, home_product.name, home_category.name, "
+            "home_product.description FROM home_product "
+            "INNER JOIN home_category ON home_product.category_id = home_category.id "
+            "WHERE home_product.is_active"
+        )
+    elif vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX home_product_name_trgm ON home_product USING gin (name gin_trgm_ops)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute("DROP TABLE home_product_search_terms")
+        schema_editor.execute("DROP TABLE home_product_search")
+    elif vendor == "postgresql":
+        schema_editor.execute("DROP INDEX home_product_name_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
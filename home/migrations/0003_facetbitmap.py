@@ -0,0 +1,30 @@
+# Generated by Django 4.1.6 on 2026-10-18 15:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0002_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=100)),
+                ('bits', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'facet bitmap',
+                'verbose_name_plural': 'facet bitmaps',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='facetbitmap',
+            constraint=models.UniqueConstraint(fields=('facet', 'value'), name='home_facetbitmap_unique'),
+        ),
+    ]
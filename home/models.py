@@ -1,3 +1,134 @@
 from django.db import models
 
-# Create your models here.
+from .managers import ProductQuerySet
+
+
+class Category(models.Model):
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True)
+
+    class Meta:
+        verbose_name = "category"
+        verbose_name_plural = "categories"
+
+    def __str__(self):
+        return self.name
+
+
+class Product(models.Model):
+    """
+    Product of the catalog, its colours and
+    sizes are the variants
+    """
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.PROTECT,
+        related_name="products",
+    )
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=200, unique=True)
+    description = models.TextField(blank=True)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Set while the product is on sale
+    sale_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    rating = models.PositiveSmallIntegerField(default=0)
+    is_new = models.BooleanField(default=False)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "product"
+        verbose_name_plural = "products"
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def current_price(self):
+        return self.sale_price if self.sale_price is not None else self.price
+
+    @property
+    def primary_image(self):
+        # Uses the prefetched images, in the ProductImage ordering
+        images = self.images.all()
+        return images[0] if images else None
+
+    @property
+    def colors(self):
+        seen = []
+        for variant in self.variants.all():
+            if variant.color not in seen:
+                seen.append(variant.color)
+        return seen
+
+
+class Variant(models.Model):
+    COLORS = [
+        ("blue", "Blue"),
+        ("black", "Black"),
+        ("grey", "Grey"),
+    ]
+    SIZES = [
+        ("xs", "XS"),
+        ("s", "S"),
+        ("m", "M"),
+        ("l", "L"),
+        ("xl", "XL"),
+    ]
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="variants",
+    )
+    sku = models.CharField(max_length=50, unique=True)
+    color = models.CharField(max_length=20, choices=COLORS)
+    size = models.CharField(max_length=5, choices=SIZES)
+    stock = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "variant"
+        verbose_name_plural = "variants"
+
+    def __str__(self):
+        return self.sku
+
+
+class ProductImage(models.Model):
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="images",
+    )
+    image = models.ImageField(upload_to="product_image")
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "product image"
+        verbose_name_plural = "product images"
+        ordering = ["position", "id"]
+
+    def __str__(self):
+        return self.image.name
+
+
+class FacetBitmap(models.Model):
+    """
+    Ids of the active products with a value of
+    a facet, as a bitmap (see home.facets)
+    """
+    facet = models.CharField(max_length=20)
+    value = models.CharField(max_length=100)
+    bits = models.BinaryField()
+
+    class Meta:
+        verbose_name = "facet bitmap"
+        verbose_name_plural = "facet bitmaps"
+        constraints = [
+            models.UniqueConstraint(fields=["facet", "value"], name="home_facetbitmap_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.facet}={self.value}"
@@ -0,0 +1,106 @@
+"""
+Full-page cache for pages which are the same
+for every visitor except for a few per-user
+fragments ({% hole %} tags). The page is rendered
+once with the holes left as markers; the
+fragments are rendered and stitched in for
+every request.
+"""
+import re
+import time
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers, \
+    patch_cache_control
+from django.template.loader import render_to_string
+
+HOLE_MARKER = "<!--page-hole:{}-->"
+hole_pattern = re.compile(HOLE_MARKER.format("(.+?)"))
+
+version_key = "home.page_cache:version"
+
+
+def get_cache():
+    return caches[settings.PAGE_CACHE]
+
+
+def get_version():
+    # A lost version starts a new one rather than reading old entries
+    return get_cache().get_or_set(version_key, time.time_ns, None)
+
+
+def invalidate_page_cache():
+    """
+    Start a new version of the cached pages, the
+    old entries are never read again and expire
+    """
+    get_cache().set(version_key, time.time_ns(), None)
+
+
+def stitch(parts, request):
+    # The parts are text, hole, text, hole, ..., text
+    return "".join(
+        render_to_string(part, request=request) if index % 2 else part
+        for index, part in enumerate(parts)
+    )
+
+
+class CachedPageMixin(object):
+    """
+    Cache the page of a TemplateView for
+    PAGE_CACHE_TIMEOUT seconds (0 disables it).
+    Anonymous visitors get the page with an ETag
+    and a 304 when they have it already.
+    """
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["page_cache_holes"] = getattr(self, "rendering_holes", False)
+        return context
+
+    def is_private(self, request):
+        # Pages with per-visitor holes, e.g. the cart of an anonymous visitor
+        return request.user.is_authenticated or any(
+            key in request.session for key in settings.PAGE_CACHE_PRIVATE_SESSION_KEYS)
+
+    def get_page_cache_key(self):
+        return f"home.page_cache:{self.request.path}"
+
+    def render_parts(self, *args, **kwargs):
+        self.rendering_holes = True
+        response = super().get(self.request, *args, **kwargs).render()
+        self.rendering_holes = False
+        return hole_pattern.split(response.content.decode(response.charset))
+
+    def get(self, request, *args, **kwargs):
+        # Query strings are not cached, they could fill the cache up
+        if not settings.PAGE_CACHE_TIMEOUT or request.GET:
+            return super().get(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = self.get_page_cache_key()
+        version = get_version()
+        entry = cache.get(key, version=version)
+        changed = entry is None
+        if changed:
+            entry = {"parts": self.render_parts(*args, **kwargs)}
+
+        if self.is_private(request):
+            if changed:
+                cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT, version=version)
+            response = HttpResponse(stitch(entry["parts"], request))
+            patch_cache_control(response, private=True)
+        else:
+            # The page of anonymous visitors is stitched only once
+            if "body" not in entry:
+                entry["body"] = stitch(entry["parts"], request)
+                entry["etag"] = '"%s"' % hashlib.md5(entry["body"].encode()).hexdigest()
+                cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT, version=version)
+            response = HttpResponse(entry["body"])
+            response["ETag"] = entry["etag"]
+            response = get_conditional_response(request, etag=entry["etag"], response=response)
+        patch_vary_headers(response, ("Cookie",))
+        return response
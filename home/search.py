@@ -0,0 +1,190 @@
+"""
+Product search. On SQLite the active products are
+kept in an FTS5 table (home_product_search), updated
+by the signals of home.signals and rebuilt by the
+reindex_search command; on PostgreSQL the names are
+matched by trigram similarity (a GIN pg_trgm index),
+elsewhere with icontains.
+"""
+import re
+import unicodedata
+
+from django.db import connections, router, transaction
+from django.db.models import CharField
+
+from .models import Product
+
+table = "home_product_search"
+# fts5vocab table, the distinct terms of the index
+terms_table = "home_product_search_terms"
+
+token_pattern = re.compile(r"\w+")
+max_tokens = 8
+# Spelling corrections tried for a word matching no term
+max_corrections = 3
+
+
+def get_connection(write=False):
+    alias = router.db_for_write(Product) if write else router.db_for_read(Product)
+    return connections[alias]
+
+
+def get_rows(products):
+    return [(product.id, product.name, product.category.name, product.description)
+            for product in products if product.is_active]
+
+
+def insert_rows(cursor, rows):
+    cursor.executemany(
+        f"INSERT INTO {table} (rowid, name, category, description) VALUES (%s, %s, %s, %s)",
+        rows,
+    )
+
+
+def index_products(products):
+    """
+    Add or update products in the index, the
+    inactive ones are removed from it
+    """
+    connection = get_connection(write=True)
+    if connection.vendor != "sqlite":
+        return
+    products = list(products)
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s",
+                           [(product.id,) for product in products])
+        insert_rows(cursor, get_rows(products))
+
+
+def remove_products(ids):
+    connection = get_connection(write=True)
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(id,) for id in ids])
+
+
+def rebuild(chunk_size=2000):
+    """
+    Index every active product again, reading
+    them chunk_size rows at a time. Returns the
+    number of indexed products.
+    """
+    connection = get_connection(write=True)
+    if connection.vendor != "sqlite":
+        return 0
+    products = Product.objects.filter(is_active=True).order_by().values_list(
+        "id", "name", "category__name", "description")
+
+    count = 0
+    # Searches see the old index until the new one is complete
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+        rows = []
+        for row in products.iterator(chunk_size=chunk_size):
+            rows.append(row)
+            if len(rows) == chunk_size:
+                insert_rows(cursor, rows)
+                count += len(rows)
+                rows = []
+        insert_rows(cursor, rows)
+        count += len(rows)
+        # Merge the b-trees written by the inserts
+        cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+    return count
+
+
+def get_tokens(query):
+    # As the unicode61 tokenizer with remove_diacritics sees them
+    text = unicodedata.normalize("NFKD", query.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return token_pattern.findall(text)[:max_tokens]
+
+
+def get_distance(first, second):
+    """
+    Edit distance counting a swap of two
+    adjacent letters as one edit
+    """
+    previous2, previous = None, list(range(len(second) + 1))
+    for i, first_char in enumerate(first, 1):
+        current = [i]
+        for j, second_char in enumerate(second, 1):
+            cost = first_char != second_char
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost))
+            if i > 1 and j > 1 and first_char == second[j - 2] and first[i - 2] == second_char:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def next_prefix(prefix):
+    # The first string after all the ones starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def expand_token(cursor, token):
+    """
+    FTS5 query of a word: the terms starting with
+    it, or the closest ones when there are none
+    """
+    prefix_query = f'"{token}"*'
+    cursor.execute(f"SELECT 1 FROM {terms_table} WHERE term >= %s AND term < %s LIMIT 1",
+                   [token, next_prefix(token)])
+    if cursor.fetchone() or len(token) < 4:
+        return prefix_query
+
+    max_distance = 1 if len(token) < 7 else 2
+    # Typos are rarely in the first letter, which keeps the candidates few
+    cursor.execute(
+        f"SELECT term FROM {terms_table} WHERE term >= %s AND term < %s "
+        f"AND length(term) BETWEEN %s AND %s",
+        [token[0], next_prefix(token[0]), len(token) - max_distance, len(token) + max_distance],
+    )
+    candidates = sorted((get_distance(token, term), term) for term, in cursor.fetchall())
+    corrections = [term for distance, term in candidates if distance <= max_distance]
+    if not corrections:
+        return prefix_query
+    return "(" + " OR ".join(f'"{term}"' for term in corrections[:max_corrections]) + ")"
+
+
+def search_fts(connection, tokens, offset, limit):
+    with connection.cursor() as cursor:
+        match = " AND ".join(expand_token(cursor, token) for token in tokens)
+        # rank is bm25() with the column weights set in the migration
+        cursor.execute(
+            f"SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY rank LIMIT %s OFFSET %s",
+            [match, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_trigram(query, offset, limit):
+    from django.contrib.postgres.lookups import TrigramWordSimilar
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    # Registered by django.contrib.postgres when it is installed
+    if "trigram_word_similar" not in CharField.get_lookups():
+        CharField.register_lookup(TrigramWordSimilar)
+    products = Product.objects.filter(is_active=True, name__trigram_word_similar=query)
+    return list(products.annotate(similarity=TrigramWordSimilarity(query, "name"))
+                .order_by("-similarity", "-id").values_list("id", flat=True)[offset:offset + limit])
+
+
+def search(query, offset=0, limit=12):
+    """
+    Ids of the active products matching the
+    query, the most relevant first
+    """
+    tokens = get_tokens(query)
+    if not tokens:
+        return []
+    connection = get_connection()
+    if connection.vendor == "sqlite":
+        return search_fts(connection, tokens, offset, limit)
+    if connection.vendor == "postgresql":
+        return search_trigram(query.strip(), offset, limit)
+    products = Product.objects.filter(is_active=True)
+    for token in tokens:
+        products = products.filter(name__icontains=token)
+    return list(products.order_by("-id").values_list("id", flat=True)[offset:offset + limit])
@@ -0,0 +1,80 @@
+from itertools import islice
+
+from django.db import transaction
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+
+from . import facets, search, versions
+from .models import Category, Product, Variant, ProductImage
+from .page_cache import invalidate_page_cache
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Variant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Variant)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_catalog_pages(sender, **kwargs):
+    # The cached home page shows the product grid. Once committed, a page
+    # rendered before would be cached with the old grid under the new version.
+    transaction.on_commit(invalidate_page_cache)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, **kwargs):
+    # The products show the slug of their category. Once committed, a
+    # request reading the new version before would get an ETag for the
+    # old rows and a 304 for them afterwards.
+    transaction.on_commit(lambda: versions.changed("category", "product"))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Variant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Variant)
+@receiver(post_delete, sender=ProductImage)
+def product_changed(sender, **kwargs):
+    transaction.on_commit(lambda: versions.changed("product"))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.index_products([instance])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def index_category_products(sender, instance, created, **kwargs):
+    # The category name is indexed with its products
+    if not created:
+        products = instance.products.select_related("category").iterator(chunk_size=2000)
+        while batch := list(islice(products, 2000)):
+            search.index_products(batch)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def update_product_facets(sender, instance, **kwargs):
+    facets.update_product(instance.pk)
+
+
+@receiver(post_save, sender=Variant)
+@receiver(post_delete, sender=Variant)
+def update_variant_facets(sender, instance, **kwargs):
+    facets.update_product(instance.product_id)
+
+
+@receiver(post_save, sender=Category)
+def rebuild_category_facets(sender, instance, created, **kwargs):
+    # The bitmaps are by slug, which may have changed
+    if not created:
+        facets.rebuild()
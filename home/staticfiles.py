@@ -0,0 +1,190 @@
+"""
+Static asset pipeline used by collectstatic when
+settings.STATIC_PIPELINE is set: the STATIC_BUNDLES
+are built and minified, every file gets a hashed
+name, and gzip/brotli variants of the text files
+are written next to them. serve() sends them with
+far-future cache headers.
+"""
+import os
+import re
+import gzip
+import mimetypes
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from django.core.files.base import ContentFile
+from django.core.exceptions import ImproperlyConfigured
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+
+# Optional, better minifiers and brotli
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+source_map_pattern = re.compile(r"^\s*(//|/\*)# sourceMappingURL=.*$", re.M)
+css_comment_pattern = re.compile(r"/\*.*?\*/", re.S)
+css_space_pattern = re.compile(r"\s*([{};,])\s*")
+
+compressed_extensions = (".css", ".js", ".svg", ".eot", ".ttf", ".otf",
+                         ".json", ".xml", ".txt", ".html", ".ico")
+
+# Hashed names never change content
+immutable_max_age = 60 * 60 * 24 * 365
+max_age = 60 * 5
+
+
+def minify_css(text):
+    if rcssmin is not None:
+        return rcssmin.cssmin(text)
+    text = css_comment_pattern.sub("", text)
+    text = css_space_pattern.sub(r"\1", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def minify_js(text):
+    # Without rjsmin the scripts are only concatenated, most are minified already
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    return text.strip()
+
+
+class PipelineStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage which also builds
+    the bundles and the compressed variants, and
+    uses the plain names until there's a manifest
+    """
+
+    def stored_name(self, name):
+        # Before the first collectstatic: the unhashed names
+        # rather than a ValueError for every {% static %}
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        for name, sources in settings.STATIC_BUNDLES.items():
+            paths[name] = (self, self.build_bundle(name, sources, paths))
+
+        yield from super().post_process(paths, dry_run, **options)
+
+        for hashed_name in self.hashed_files.values():
+            if hashed_name.endswith(compressed_extensions):
+                self.compress(hashed_name)
+
+    def build_bundle(self, name, sources, paths):
+        if name.endswith(".css"):
+            # The url()s of the stylesheets are relative to their directory
+            if any(os.path.dirname(source) != os.path.dirname(name) for source in sources):
+                raise ImproperlyConfigured(f"The stylesheets of {name} must be in its directory")
+            minify, separator = minify_css, "\n"
+        else:
+            minify, separator = minify_js, "\n;\n"
+
+        parts = []
+        for source in sources:
+            storage, path = paths[source]
+            with storage.open(path) as file:
+                text = file.read().decode("utf-8")
+            parts.append(minify(source_map_pattern.sub("", text)))
+
+        if self.exists(name):
+            self.delete(name)
+        return self._save(name, ContentFile(separator.join(parts).encode("utf-8")))
+
+    def compress(self, name):
+        with self.open(name) as file:
+            content = file.read()
+        variants = [(".gz", gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(content)))
+
+        for suffix, compressed in variants:
+            # Not worth it for the files which barely shrink
+            if len(compressed) < len(content) * 0.9:
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+
+    def url_converter(self, name, hashed_files, template=None):
+        converter = super().url_converter(name, hashed_files, template)
+
+        def convert(matchobj):
+            # Vendor stylesheets refer to files which are not shipped (source
+            # maps, unused images), keep those references as they are
+            try:
+                return converter(matchobj)
+            except ValueError:
+                return matchobj[0]
+
+        return convert
+
+
+def has_manifest():
+    return bool(getattr(staticfiles_storage, "hashed_files", None))
+
+
+@lru_cache(maxsize=None)
+def get_hashed_names():
+    return frozenset(getattr(staticfiles_storage, "hashed_files", {}).values())
+
+
+def accepted_encodings(request):
+    encodings = set()
+    for item in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+        encoding, _, params = item.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0"):
+            encodings.add(encoding.strip())
+    return encodings
+
+
+def serve(request, path):
+    """
+    Serve a file of STATIC_ROOT, compressed if
+    the client accepts it
+    """
+    fullpath = safe_join(settings.STATIC_ROOT, path)
+    if not os.path.isfile(fullpath):
+        raise Http404
+
+    stat = os.stat(fullpath)
+    if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), stat.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type = mimetypes.guess_type(fullpath)[0] or "application/octet-stream"
+    encodings = accepted_encodings(request)
+    content_encoding = None
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if encoding in encodings and os.path.isfile(fullpath + suffix):
+            fullpath, content_encoding = fullpath + suffix, encoding
+            break
+
+    response = FileResponse(open(fullpath, "rb"), content_type=content_type)
+    # FileResponse names the file, the compressed variant's name isn't wanted
+    del response["Content-Disposition"]
+    if content_encoding:
+        response["Content-Encoding"] = content_encoding
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    if path in get_hashed_names():
+        response["Cache-Control"] = f"public, max-age={immutable_max_age}, immutable"
+    else:
+        response["Cache-Control"] = f"public, max-age={max_age}"
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,28 @@
+from django import template
+from django.conf import settings
+from django.utils.html import format_html_join
+from django.templatetags.static import static
+
+from home.staticfiles import has_manifest
+
+register = template.Library()
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    The <link>/<script> tags of a STATIC_BUNDLES
+    bundle: the built (hashed) bundle with the
+    static pipeline once collectstatic wrote its
+    manifest, the separate files otherwise
+    """
+    if settings.STATIC_PIPELINE and not settings.DEBUG and has_manifest():
+        urls = [static(name)]
+    else:
+        urls = [static(source) for source in settings.STATIC_BUNDLES[name]]
+
+    if name.endswith(".css"):
+        tag = '<link rel="stylesheet" href="{}" type="text/css">'
+    else:
+        tag = '<script src="{}"></script>'
+    return format_html_join("\n", tag, ((url,) for url in urls))
@@ -0,0 +1,18 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from home.page_cache import HOLE_MARKER
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name):
+    """
+    Include a per-user fragment; on pages rendered
+    for the page cache it is left as a marker and
+    filled in for every request
+    """
+    if context.get("page_cache_holes"):
+        return mark_safe(HOLE_MARKER.format(template_name))
+    return context.template.engine.get_template(template_name).render(context)
@@ -0,0 +1,17 @@
+from django import template
+from django.urls import reverse
+
+register = template.Library()
+
+
+@register.filter
+def resized(image, size):
+    """
+    URL of a resized variant of an uploaded image,
+    {{ user.image|resized:96 }} or |resized:"96x96"
+    """
+    width, _, height = str(size).partition("x")
+    url = reverse("resized-media", kwargs={"path": image.name}) + f"?w={width}"
+    if height:
+        url += f"&h={height}"
+    return url
@@ -0,0 +1,61 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+from django.templatetags.static import static
+
+from home.images import formats, load_manifest
+
+register = template.Library()
+
+
+def get_srcset(variants):
+    return ", ".join(f"{static(name)} {width}w" for width, name in variants)
+
+
+@register.simple_tag
+def responsive_image(name, sizes="100vw", alt="", css_class="", lazy=True):
+    """
+    <picture> with the widths of the image in
+    every format, the placeholder is shown
+    until the image is loaded
+    """
+    entry = load_manifest().get(name)
+    loading = "lazy" if lazy else "eager"
+    if entry is None:
+        # Not built (yet), the original image
+        return format_html('<img src="{}" alt="{}" class="{}" loading="{}">',
+                           static(name), alt, css_class, loading)
+
+    # In the order of IMAGE_VARIANTS["FORMATS"], the last one for <img>
+    variants = entry["variants"]
+    *modern, fallback = variants
+    sources = format_html_join(
+        "", '<source type="{}" srcset="{}" sizes="{}">',
+        ((formats[format_name][1], get_srcset(variants[format_name]), sizes)
+         for format_name in modern)
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" '
+        'class="{}" loading="{}" decoding="async" '
+        'style="background: url({}) center / cover no-repeat"></picture>',
+        sources, static(variants[fallback][-1][1]), get_srcset(variants[fallback]), sizes,
+        entry["width"], entry["height"], alt, css_class, loading, entry["placeholder"],
+    )
+
+
+@register.simple_tag
+def responsive_bg(name, width=None):
+    """
+    data-setbg and placeholder style attributes of
+    a .set-bg element: the smallest variant at
+    least `width` wide, of the first format
+    """
+    entry = load_manifest().get(name)
+    if entry is None:
+        return format_html('data-setbg="{}"', static(name))
+
+    variants = next(iter(entry["variants"].values()))
+    width = width or entry["width"]
+    variant = next((name for variant_width, name in variants if variant_width >= width),
+                   variants[-1][1])
+    return format_html('data-setbg="{}" style="background-image: url({})"',
+                       static(variant), entry["placeholder"])
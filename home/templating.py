@@ -0,0 +1,191 @@
+"""
+Production template mode (settings.TEMPLATE_PRECOMPILE)
+and render timing (settings.TEMPLATE_RENDER_TIMING)
+"""
+import os
+import time
+import logging
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.template import engines, Context, TemplateDoesNotExist, TemplateSyntaxError
+from django.template.base import Template, TextNode
+from django.template.backends.django import DjangoTemplates
+from django.template.loader_tags import IncludeNode
+from django.template.loaders import cached
+
+logger = logging.getLogger(__name__)
+
+
+class Loader(cached.Loader):
+    """
+    Cached loader which replaces the {% include %}s
+    of the templates in TEMPLATE_INLINE_INCLUDES
+    with their output. Only list templates which
+    render the same for every request. The ones
+    using static files are never inlined, their
+    URLs come from the manifest of collectstatic.
+    """
+
+    def get_template(self, template_name, skip=None):
+        template = super().get_template(template_name, skip)
+        # The same object is returned from the cache afterwards
+        if not getattr(template, "inlined", False):
+            self.inline_includes(template.nodelist)
+            template.inlined = True
+        return template
+
+    def inline_includes(self, nodelist):
+        for index, node in enumerate(nodelist):
+            if isinstance(node, IncludeNode):
+                template_name = node.template.var
+                # Only {% include "name" %}, without "with" or "only"
+                if isinstance(template_name, str) and not node.template.filters \
+                        and not node.extra_context and not node.isolated_context \
+                        and template_name in settings.TEMPLATE_INLINE_INCLUDES:
+                    template = self.engine.get_template(template_name)
+                    if uses_static(template.nodelist):
+                        continue
+                    output = template.render(Context(autoescape=self.engine.autoescape))
+                    nodelist[index] = TextNode(output)
+                continue
+            for attr in node.child_nodelists:
+                child_nodelist = getattr(node, attr, None)
+                if child_nodelist:
+                    self.inline_includes(child_nodelist)
+
+    def precompile(self):
+        """
+        Compile every template of the template
+        directories so that no request pays for it
+        """
+        count = 0
+        for directory in self.get_dirs():
+            for root, dirs, files in os.walk(directory):
+                for name in files:
+                    template_name = os.path.relpath(os.path.join(root, name), directory)
+                    try:
+                        self.get_template(template_name.replace(os.sep, "/"))
+                    except (TemplateDoesNotExist, TemplateSyntaxError, UnicodeDecodeError):
+                        logger.exception("Compiling %s failed", template_name)
+                    else:
+                        count += 1
+        return count
+
+
+def uses_static(nodelist):
+    """
+    Whether a {% static %}, {% bundle %} or other
+    tag of the static_tags modules is in nodelist
+    """
+    for node in nodelist:
+        # The function of a simple tag or the class of the others
+        module = getattr(getattr(node, "func", None), "__module__", type(node).__module__)
+        if module in static_tags:
+            return True
+        for attr in node.child_nodelists:
+            child_nodelist = getattr(node, attr, None)
+            if child_nodelist and uses_static(child_nodelist):
+                return True
+    return False
+
+
+static_tags = (
+    "django.templatetags.static",
+    "home.templatetags.bundles",
+    "home.templatetags.responsive_images",
+)
+
+
+def precompile_templates():
+    count = 0
+    for engine in engines.all():
+        if isinstance(engine, DjangoTemplates):
+            for loader in engine.engine.template_loaders:
+                if isinstance(loader, Loader):
+                    count += loader.precompile()
+    return count
+
+
+def precompile_on_first_request(**kwargs):
+    # Not at startup, the management commands (collectstatic
+    # too) would compile them before the manifest exists
+    request_started.disconnect(precompile_on_first_request)
+    precompile_templates()
+
+
+def enable_precompile():
+    request_started.connect(precompile_on_first_request)
+
+
+class RenderTimings(object):
+    """
+    Render count and times of every template,
+    "self" is the time without the templates
+    included or extended by it
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.templates = {}
+
+    def start(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        # Time spent in the nested templates
+        stack.append(0)
+
+    def stop(self, template_name, elapsed):
+        stack = self.local.stack
+        own = elapsed - stack.pop()
+        if stack:
+            stack[-1] += elapsed
+
+        with self.lock:
+            count, total, total_own, slowest = self.templates.get(template_name, (0, 0, 0, 0))
+            self.templates[template_name] = (count + 1, total + elapsed, total_own + own,
+                                             max(slowest, elapsed))
+
+        if elapsed * 1000 >= settings.TEMPLATE_RENDER_TIMING_THRESHOLD:
+            logger.info("%s rendered in %.2fms (%.2fms without nested templates)",
+                        template_name, elapsed * 1000, own * 1000)
+
+    def summary(self):
+        """
+        (template, count, total, self, max) tuples,
+        the largest self time first
+        """
+        with self.lock:
+            rows = [(name, *values) for name, values in self.templates.items()]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def clear(self):
+        with self.lock:
+            self.templates.clear()
+
+
+render_timings = RenderTimings()
+
+
+def timed(render):
+    @wraps(render)
+    def _render(self, context):
+        render_timings.start()
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            render_timings.stop(self.origin.template_name or self.origin.name,
+                                time.perf_counter() - start)
+    _render.timed = True
+    return _render
+
+
+def enable_render_timing():
+    # Every Template, including the ones rendered by {% include %}/{% extends %}
+    if not getattr(Template._render, "timed", False):
+        Template._render = timed(Template._render)
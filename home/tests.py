@@ -1,3 +1,447 @@
-from django.test import TestCase
+import io
+import os
+import sys
+import gzip
+import tempfile
+import subprocess
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.text import slugify
+from django.test import TestCase, RequestFactory, override_settings
+from django.template import Template, Context
+from django.core.management import call_command
+from django.template.loader_tags import IncludeNode
+from django.template.backends.django import DjangoTemplates
+
+from account import sessions
+from account.models import User
+from . import checks, facets, media, search, staticfiles
+from .models import Category, FacetBitmap, Product, Variant
+from .page_cache import get_cache, invalidate_page_cache
+
+
+class PageCacheTest(TestCase):
+    """
+    Tests for the cached home page
+    """
+
+    def setUp(self):
+        get_cache().clear()
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    def test_anonymous_etag(self):
+        response = self.client.get(reverse("home:main"))
+        self.assertContains(response, "Sign in")
+        self.assertNotContains(response, "page-hole")
+
+        response = self.client.get(reverse("home:main"),
+                                   HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_authenticated_header(self):
+        self.client.get(reverse("home:main"))
+        user = User.objects.create_user(phone="09120000000", full_name="Test User",
+                                        password="testpassword")
+        self.client.force_login(user)
+
+        response = self.client.get(reverse("home:main"))
+        self.assertContains(response, "Logout")
+        self.assertNotContains(response, "Sign in")
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_invalidation(self):
+        self.client.get(reverse("home:main"))
+        response = self.client.get(reverse("home:main"))
+        self.assertTemplateNotUsed(response, "home/index.html")
+
+        invalidate_page_cache()
+        response = self.client.get(reverse("home:main"))
+        self.assertTemplateUsed(response, "home/index.html")
+
+    def test_invalidated_on_commit(self):
+        self.client.get(reverse("home:main"))
+        category = Category.objects.create(name="Bags", slug="bags")
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(category=category, name="Bag", slug="bag", price=20)
+            # Not before the commit, the page would be cached without the product
+            response = self.client.get(reverse("home:main"))
+            self.assertTemplateNotUsed(response, "home/index.html")
+        response = self.client.get(reverse("home:main"))
+        self.assertTemplateUsed(response, "home/index.html")
+
+
+class TemplateLoaderTest(TestCase):
+    """
+    Tests for the production template loader
+    """
+
+    @override_settings(TEMPLATE_INLINE_INCLUDES=["includes/footer.html", "includes/search.html"])
+    def test_static_includes_inlined(self):
+        engine = DjangoTemplates({
+            "NAME": "test", "DIRS": settings.TEMPLATES[0]["DIRS"], "APP_DIRS": False,
+            "OPTIONS": {"loaders": [("home.templating.Loader", [
+                "django.template.loaders.filesystem.Loader",
+            ])]},
+        }).engine
+        template = engine.get_template("base.html")
+
+        includes = [node.template.var for node in template.nodelist.get_nodes_by_type(IncludeNode)]
+        self.assertNotIn("includes/search.html", includes)
+        self.assertIn("includes/header.html", includes)
+        # Its {% static %} URLs depend on the manifest
+        self.assertIn("includes/footer.html", includes)
+
+    def test_production_without_manifest(self):
+        # Before the first collectstatic, which has to run too
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, DEBUG="False", STATIC_ROOT=directory,
+                       EMAIL_HOST_USER="test", EMAIL_HOST_PASSWORD="test")
+            result = subprocess.run([sys.executable, "manage.py", "check"], env=env,
+                                    cwd=settings.BASE_DIR, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class StaticServeTest(TestCase):
+    """
+    Tests for serving the precompressed static files
+    """
+
+    def setUp(self):
+        self.static_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.static_root.cleanup)
+        with open(os.path.join(self.static_root.name, "site.css"), "w") as file:
+            file.write("body{color:red}" * 100)
+        with open(os.path.join(self.static_root.name, "site.css.gz"), "wb") as file:
+            file.write(gzip.compress(b"body{color:red}" * 100))
+
+    def get(self, **headers):
+        with self.settings(STATIC_ROOT=self.static_root.name):
+            return staticfiles.serve(RequestFactory().get("/static/site.css", **headers), "site.css")
+
+    def test_compressed_variant(self):
+        response = self.get(HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "text/css")
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+        response = self.get(HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(b"".join(response.streaming_content), b"body{color:red}" * 100)
+
+    def test_without_manifest(self):
+        # Before the first collectstatic
+        with self.settings(DEBUG=False, STATIC_PIPELINE=True, STATIC_ROOT=self.static_root.name,
+                           STATICFILES_STORAGE="home.staticfiles.PipelineStorage"):
+            response = self.client.get(reverse("home:main"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "/static/img/footer-logo.png")
+        for source in settings.STATIC_BUNDLES["js/site.js"]:
+            self.assertContains(response, f"/static/{source}")
+
+
+class ImageVariantsTest(TestCase):
+    """
+    Tests for the responsive image variants
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.static_dir = os.path.join(directory.name, "static")
+        os.makedirs(os.path.join(self.static_dir, "img", "product"))
+        Image.new("RGB", (800, 400), "red").save(
+            os.path.join(self.static_dir, "img", "product", "product.jpg"))
+
+        settings_override = self.settings(
+            STATICFILES_DIRS=[self.static_dir],
+            IMAGE_VARIANTS={**settings.IMAGE_VARIANTS, "SOURCES": ["img/product"],
+                            "ROOT": os.path.join(directory.name, "variants")},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def build(self):
+        output = io.StringIO()
+        call_command("build_image_variants", stdout=output)
+        return output.getvalue()
+
+    def test_build_incremental(self):
+        self.assertIn("1 built, 0 up to date", self.build())
+        self.assertIn("0 built, 1 up to date", self.build())
+
+        html = Template('{% load responsive_images %}'
+                        '{% responsive_image "img/product/product.jpg" %}').render(Context())
+        self.assertIn('<source type="image/webp" srcset="/static/img/product/product.320w.webp 320w', html)
+        self.assertIn("product.800w.jpeg 800w", html)
+        self.assertIn('loading="lazy"', html)
+        self.assertIn("data:image/webp;base64,", html)
+
+
+class ResizedMediaTest(TestCase):
+    """
+    Tests for the resized media endpoint
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        media_root = os.path.join(directory.name, "media")
+        os.makedirs(os.path.join(media_root, "user_image"))
+        Image.new("RGB", (1000, 500), "blue").save(os.path.join(media_root, "user_image", "a.jpg"))
+
+        settings_override = self.settings(
+            MEDIA_ROOT=media_root,
+            MEDIA_RESIZE={**settings.MEDIA_RESIZE,
+                          "CACHE_DIR": os.path.join(directory.name, "cache")},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get(self, query, **headers):
+        return self.client.get(reverse("resized-media", kwargs={"path": "user_image/a.jpg"})
+                               + query, **headers)
+
+    def test_resized_and_cached(self):
+        with mock.patch("home.media.resize", wraps=media.resize) as resize:
+            response = self.get("?w=96&h=96", HTTP_ACCEPT="image/webp,*/*")
+            self.assertEqual(response["Content-Type"], "image/webp")
+            with Image.open(io.BytesIO(b"".join(response.streaming_content))) as image:
+                self.assertEqual(image.size, (96, 96))
+
+            response = self.get("?w=96&h=96", HTTP_ACCEPT="image/webp,*/*")
+            self.assertEqual(resize.call_count, 1)
+
+        response = self.get("?w=96&h=96", HTTP_ACCEPT="image/webp,*/*",
+                            HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_invalid_size(self):
+        self.assertEqual(self.get("?w=97").status_code, 400)
+
+
+class MediaServeTest(TestCase):
+    """
+    Tests for serving the uploaded files
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(os.path.join(directory.name, "file.bin"), "wb") as file:
+            file.write(bytes(range(256)) * 4)
+
+        settings_override = self.settings(MEDIA_ROOT=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get(self, **headers):
+        return self.client.get(reverse("media", kwargs={"path": "file.bin"}), **headers)
+
+    def test_ranges(self):
+        response = self.get(HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/1024")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.get(HTTP_RANGE="bytes=-6")
+        self.assertEqual(b"".join(response.streaming_content), bytes(range(250, 256)))
+
+        self.assertEqual(self.get(HTTP_RANGE="bytes=2000-").status_code, 416)
+        # A range of another version of the file
+        self.assertEqual(self.get(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"old"').status_code, 200)
+
+    def test_conditional(self):
+        response = self.get()
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_offloaded(self):
+        with self.settings(MEDIA_SERVE={**settings.MEDIA_SERVE, "MODE": "x-accel-redirect"}):
+            response = self.get()
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/file.bin")
+        self.assertEqual(response.content, b"")
+
+
+class CatalogTest(TestCase):
+    """
+    Tests for the product grid of the home page
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = self.settings(MEDIA_ROOT=directory.name, PAGE_CACHE_TIMEOUT=0,
+                                          CATALOG_PAGE_SIZE=4)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def seed(self, products):
+        call_command("seed_catalog", products=products, stdout=io.StringIO())
+
+    def test_constant_queries(self):
+        self.seed(4)
+        with self.assertNumQueries(3):
+            products, next_after = Product.objects.for_grid().page(None, 4)
+            [(product.category.name, product.primary_image, product.colors) for product in products]
+        self.assertIsNone(next_after)
+
+        self.seed(40)
+        with self.assertNumQueries(3):
+            products, next_after = Product.objects.for_grid().page(next_after, 4)
+            [(product.category.name, product.primary_image, product.colors) for product in products]
+        self.assertEqual(len(products), 4)
+
+    def test_keyset_pages(self):
+        self.seed(6)
+        newest = list(Product.objects.order_by("-id"))
+
+        response = self.client.get(reverse("home:main"))
+        self.assertEqual(response.context["products"], newest[:4])
+        self.assertContains(response, f"?after={newest[3].id}")
+
+        response = self.client.get(reverse("home:main"), {"after": newest[3].id})
+        self.assertEqual(response.context["products"], newest[4:])
+        self.assertIsNone(response.context["next_after"])
+
+
+class SearchTest(TestCase):
+    """
+    Tests for the product search
+    """
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Clothing", slug="clothing")
+        self.jacket = self.create("Piqué Biker Jacket", description="Leather")
+        self.shirt = self.create("Linen Overshirt", description="Worn under a jacket")
+
+    def create(self, name, **fields):
+        return Product.objects.create(category=self.category, name=name, slug=slugify(name),
+                                      price=10, **fields)
+
+    def test_ranked_prefix_and_typos(self):
+        # A match in the name ranks first
+        self.assertEqual(search.search("jacket"), [self.jacket.id, self.shirt.id])
+        self.assertEqual(search.search("pique bik"), [self.jacket.id])
+        self.assertEqual(search.search("jakcet leathr"), [self.jacket.id])
+        self.assertEqual(search.search("umbrella"), [])
+
+    def test_signal_updates(self):
+        self.jacket.name = "Suede Loafers"
+        self.jacket.save()
+        self.assertEqual(search.search("loafers"), [self.jacket.id])
+        self.shirt.is_active = False
+        self.shirt.save()
+        self.assertEqual(search.search("jacket"), [])
+
+        self.category.name = "Shoes"
+        self.category.save()
+        self.assertEqual(search.search("shoes"), [self.jacket.id])
+        self.jacket.delete()
+        self.assertEqual(search.search("shoes"), [])
+
+    def test_reindex(self):
+        Product.objects.filter(id=self.jacket.id).update(name="Canvas Tote")
+        self.assertEqual(search.search("tote"), [])
+        call_command("reindex_search", chunk_size=1, stdout=io.StringIO())
+        self.assertEqual(search.search("tote"), [self.jacket.id])
+
+    def test_view_pages(self):
+        with self.settings(SEARCH_PAGE_SIZE=1):
+            response = self.client.get(reverse("home:search"), {"q": "jacket"})
+            self.assertEqual(response.context["products"], [self.jacket])
+            self.assertTrue(response.context["has_next"])
+
+            response = self.client.get(reverse("home:search"), {"q": "jacket", "page": 2})
+            self.assertEqual(response.context["products"], [self.shirt])
+            self.assertFalse(response.context["has_next"])
+
+
+class FacetTest(TestCase):
+    """
+    Tests for the facet index of the product filter
+    """
+
+    def setUp(self):
+        facets.get_cache().delete(facets.version_key)
+        bags = Category.objects.create(name="Bags", slug="bags")
+        shoes = Category.objects.create(name="Shoes", slug="shoes")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tote = self.create(bags, "Canvas Tote", 40, [("black", "m"), ("grey", "m")])
+            self.backpack = self.create(bags, "Leather Backpack", 120, [("black", "l")])
+            self.boots = self.create(shoes, "Ankle Boots", 90, [("grey", "l")])
+
+    def create(self, category, name, price, variants):
+        product = Product.objects.create(category=category, name=name, slug=slugify(name),
+                                         price=price)
+        for color, size in variants:
+            Variant.objects.create(product=product, sku=f"{product.slug}-{color}-{size}",
+                                   color=color, size=size)
+        return product
+
+    def test_counts_and_pages(self):
+        index = facets.get_index()
+        selection = {"color": ["black"], "size": ["l", "m"]}
+        ids, next_after = index.page(index.match(selection), size=1)
+        self.assertEqual((ids, next_after), ([self.backpack.id], self.backpack.id))
+        self.assertEqual(index.page(index.match(selection), after=next_after, size=1),
+                         ([self.tote.id], None))
+
+        counts = index.counts(selection)
+        self.assertEqual(counts["category"], [("bags", 2), ("shoes", 0)])
+        # The colour counts ignore the colour selection
+        self.assertEqual(counts["color"], [("black", 2), ("grey", 2)])
+        self.assertEqual(counts["price"], [("0-50", 1), ("50-100", 0), ("100-150", 1)])
+
+    def test_incremental_updates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.backpack.sale_price = 45
+            self.backpack.save()
+            self.boots.variants.update(color="black")
+            # update() sends no signal, a variant change does
+            Variant.objects.create(product=self.boots, sku="boots-blue", color="blue", size="s")
+            self.tote.delete()
+
+        index = facets.get_index()
+        self.assertEqual(index.counts({})["price"], [("0-50", 1), ("50-100", 1)])
+        self.assertEqual(index.page(index.match({"color": ["black"]})),
+                         ([self.boots.id, self.backpack.id], None))
+        self.assertEqual(index.all.bit_count(), 2)
+
+    def test_reloaded_on_new_version(self):
+        index = facets.get_index()
+        self.assertIs(facets.get_index(), index)
+        # Another process rebuilt it and moved the shared version on
+        FacetBitmap.objects.filter(facet="category", value="shoes").delete()
+        facets.changed()
+        self.assertEqual(facets.get_index().get_values("category"), ["bags"])
+
+    def test_process_local_cache_check(self):
+        redis = {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+                 "LOCATION": "redis://127.0.0.1:6379/1"}
+        with self.settings(CACHES=dict(settings.CACHES, sessions=redis)):
+            errors = checks.check_shared_caches(None)
+            self.assertEqual({error.id for error in errors}, {"home.E001"})
+            self.assertTrue(any("FACET_CACHE" in error.msg for error in errors))
+        with self.settings(CACHES=dict(settings.CACHES, sessions=redis, default=redis,
+                                           ratelimit=redis, users=redis, pages=redis)):
+            errors = checks.check_shared_caches(None)
+            self.assertEqual([error.msg.split()[0] for error in errors], ["VERIFICATION_STORE"])
+            with self.settings(VERIFICATION_STORE={
+                "BACKEND": "account.verification.RedisVerificationStore",
+                "OPTIONS": {"url": "redis://127.0.0.1:6379/1"},
+            }):
+                self.assertEqual(checks.check_shared_caches(None), [])
+
+    def test_filtered_home_page(self):
+        with self.settings(PAGE_CACHE_TIMEOUT=0):
+            response = self.client.get(reverse("home:main"), {"category": "shoes"})
+        self.assertEqual(response.context["products"], [self.boots])
+        self.assertContains(response, "Bags (2)")
+        self.assertContains(response, 'class="active">Shoes (1)')
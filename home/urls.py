@@ -3,5 +3,6 @@ from . import views
 
 app_name = "home"
 urlpatterns = [
-    path("", views.HomeView.as_view(), name="main")
+    path("", views.HomeView.as_view(), name="main"),
+    path("search", views.SearchView.as_view(), name="search"),
 ]
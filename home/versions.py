@@ -0,0 +1,42 @@
+"""
+Version counters of the catalog tables, moved on
+by every change to them (see home.signals), so
+that a response built from a table can be known
+to be current without reading the table, e.g.
+for the ETags of the catalog API. The counters
+are only in settings.CATALOG_VERSION_CACHE, which
+every process has to share (see home.checks).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+tables = ("category", "product")
+
+version_key = "home.versions:{}"
+
+
+def get_cache():
+    return caches[settings.CATALOG_VERSION_CACHE]
+
+
+def get_versions(*names):
+    """
+    {table: version}, in one cache read
+    """
+    keys = {name: version_key.format(name) for name in names}
+    versions = get_cache().get_many(keys.values())
+    for name, key in keys.items():
+        if key not in versions:
+            # A lost counter starts past every old version rather than at 0
+            versions[key] = get_cache().get_or_set(key, time.time_ns, None)
+    return {name: versions[key] for name, key in keys.items()}
+
+
+def changed(*names):
+    for name in names:
+        try:
+            get_cache().incr(version_key.format(name))
+        except ValueError:
+            get_cache().set(version_key.format(name), time.time_ns(), None)
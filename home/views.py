@@ -1,6 +1,104 @@
+from django.conf import settings
 from django.shortcuts import render
+from django.utils.http import urlencode
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import ensure_csrf_cookie
 from django.views.generic import TemplateView
 
+from . import facets, search
+from .models import Category, Product, Variant
+from .page_cache import CachedPageMixin
 
-class HomeView(TemplateView):
-    template_name = "home/index.html"
\ No newline at end of file
+
+# The product cards add to the cart with JavaScript, which sends the CSRF cookie
+@method_decorator(ensure_csrf_cookie, name="dispatch")
+class HomeView(CachedPageMixin, TemplateView):
+    template_name = "home/index.html"
+
+    def get_after(self):
+        # Keyset cursor of the product grid, ?after=<product id>
+        try:
+            return int(self.request.GET["after"])
+        except (KeyError, ValueError):
+            return None
+
+    def get_selection(self):
+        # Chosen values of the facets, e.g. ?color=black&color=grey&size=m
+        return {facet: self.request.GET.getlist(facet) for facet in facets.facets
+                if self.request.GET.getlist(facet)}
+
+    def get_facets(self, index, selection):
+        labels = {
+            "category": dict(Category.objects.values_list("slug", "name")),
+            "color": dict(Variant.COLORS),
+            "size": dict(Variant.SIZES),
+            "price": {band: f"${band}" for band in facets.get_price_bands()},
+        }
+        result = []
+        for facet, counts in index.counts(selection).items():
+            values = []
+            for value, count in counts:
+                chosen = selection.get(facet, [])
+                active = value in chosen
+                # The link adds the value to the selection or removes it
+                toggled = {**selection, facet: [item for item in chosen if item != value]
+                           if active else chosen + [value]}
+                values.append({
+                    "label": labels[facet].get(value, value),
+                    "count": count,
+                    "active": active,
+                    "query": urlencode(toggled, doseq=True),
+                })
+            if values:
+                result.append({"name": facet.title(), "values": values})
+        return result
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        after = self.get_after()
+        size = settings.CATALOG_PAGE_SIZE
+        selection = self.get_selection()
+        index = facets.get_index()
+        if selection:
+            # Filtered from the bitmaps, the products are read by id
+            ids, next_after = index.page(index.match(selection), after, size)
+            products = Product.objects.for_grid().in_bulk(ids)
+            products = [products[id] for id in ids if id in products]
+        else:
+            # The same few queries for any catalog size or page
+            products, next_after = Product.objects.for_grid().page(after, size)
+        context.update(
+            products=products,
+            after=after,
+            next_after=next_after,
+            facets=self.get_facets(index, selection),
+            filter_query=urlencode(selection, doseq=True),
+        )
+        return context
+
+
+@method_decorator(ensure_csrf_cookie, name="dispatch")
+class SearchView(TemplateView):
+    template_name = "home/search.html"
+
+    def get_page(self):
+        try:
+            return max(int(self.request.GET.get("page", 1)), 1)
+        except ValueError:
+            return 1
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "").strip()
+        page = self.get_page()
+        size = settings.SEARCH_PAGE_SIZE
+        # One more id tells whether there's a next page
+        ids = search.search(query, (page - 1) * size, size + 1)
+        products = Product.objects.for_grid().in_bulk(ids[:size])
+        context.update(
+            query=query,
+            page=page,
+            products=[products[id] for id in ids[:size] if id in products],
+            has_next=len(ids) > size,
+        )
+        return context
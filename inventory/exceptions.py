@@ -0,0 +1,9 @@
+class OutOfStock(Exception):
+    """
+    Raised when a variant has less stock than
+    the quantity to reserve
+    """
+
+    def __init__(self, variant_id):
+        super().__init__(f"Variant {variant_id} is out of stock")
+        self.variant_id = variant_id
@@ -0,0 +1,123 @@
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.db import connection, OperationalError
+from django.db.models import Sum
+from django.core.management.base import BaseCommand
+
+from home.models import Category, Product, Variant
+from inventory import stock
+from inventory.exceptions import OutOfStock
+from inventory.models import Reservation
+
+
+class Command(BaseCommand):
+    help = ("Reserve random carts from many threads at once, with confirmations, "
+            "releases and expiries meanwhile, and check that no stock was oversold")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--carts", type=int, default=500,
+                            help="Number of carts reserved by every thread")
+        parser.add_argument("--variants", type=int, default=20)
+        parser.add_argument("--stock", type=int, default=100,
+                            help="Initial stock of every variant, less than the carts ask for")
+
+    def handle(self, *args, **options):
+        # A file database, so that the threads share the data
+        directory = tempfile.mkdtemp()
+        connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, "benchmark.sqlite3")
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            initial = self.create_variants(options["variants"], options["stock"])
+            self.run(initial, options["threads"], options["carts"])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def create_variants(self, count, quantity):
+        category = Category.objects.create(name="Benchmark", slug="benchmark")
+        product = Product.objects.create(category=category, name="Benchmark", slug="benchmark",
+                                         price=10)
+        Variant.objects.bulk_create(
+            Variant(product=product, sku=f"benchmark-{number}", color="black", size="m",
+                    stock=quantity)
+            for number in range(count)
+        )
+        return dict(Variant.objects.values_list("id", "stock"))
+
+    def run(self, initial, threads, carts):
+        results = Counter()
+        confirmed = Counter()
+        lock = threading.Lock()
+        running = threading.Event()
+        running.set()
+
+        def buy(seed):
+            rng = random.Random(seed)
+            ids = list(initial)
+            counts, sold = Counter(), Counter()
+            for _ in range(carts):
+                items = {id: rng.randint(1, 2) for id in rng.sample(ids, rng.randint(1, 3))}
+                # Half the checkouts are confirmed, the others abandoned or left to expire
+                action = rng.choice(["confirm", "confirm", "release", "expire"])
+                try:
+                    key = stock.reserve(items, timeout=0 if action == "expire" else 3600)
+                    counts["reserved"] += 1
+                    if action == "confirm":
+                        sold.update(stock.confirm(key))
+                    elif action == "release":
+                        stock.release(key)
+                except OutOfStock:
+                    counts["out of stock"] += 1
+                except OperationalError:
+                    # The busy timeout of SQLite ran out, the transaction was rolled back
+                    counts["errors"] += 1
+            with lock:
+                results.update(counts)
+                confirmed.update(sold)
+            connection.close()
+
+        def expire():
+            while running.is_set():
+                results["expired"] += stock.expire(batch_size=100)
+                time.sleep(0.01)
+            connection.close()
+
+        workers = [threading.Thread(target=buy, args=(number,)) for number in range(threads)]
+        expirer = threading.Thread(target=expire)
+        start = time.perf_counter()
+        expirer.start()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        running.clear()
+        expirer.join()
+        results["expired"] += stock.expire()
+
+        # Every unit is in stock, sold or still held
+        current = dict(Variant.objects.values_list("id", "stock"))
+        held = dict(Reservation.objects.values("variant").annotate(quantity=Sum("quantity"))
+                    .values_list("variant", "quantity"))
+        oversold = sum(max(confirmed[id] - quantity, 0) for id, quantity in initial.items())
+        unbalanced = [id for id, quantity in initial.items()
+                      if current[id] < 0 or current[id] + confirmed[id] + held.get(id, 0) != quantity]
+
+        attempts = threads * carts
+        self.stdout.write(f"{threads} threads, {attempts} carts, {len(initial)} variants "
+                          f"of {sum(initial.values())} units:")
+        self.stdout.write(f"  reserved       {results['reserved']:>8} "
+                          f"({results['reserved'] / elapsed:.0f}/s, {attempts / elapsed:.0f} carts/s)")
+        self.stdout.write(f"  out of stock   {results['out of stock']:>8}")
+        self.stdout.write(f"  errors         {results['errors']:>8}")
+        self.stdout.write(f"  expired        {results['expired']:>8}")
+        self.stdout.write(f"  units sold     {sum(confirmed.values()):>8}")
+        self.stdout.write(f"  units in stock {sum(current.values()):>8}")
+        self.stdout.write(f"  oversold       {oversold:>8}")
+        if oversold or unbalanced:
+            self.stderr.write(f"  stock is wrong for the variants {unbalanced}")
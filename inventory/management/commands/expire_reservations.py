@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory import stock
+
+
+class Command(BaseCommand):
+    help = "Give the stock of the expired reservations back to their variants"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Number of reservations expired in each transaction",
+        )
+        parser.add_argument(
+            "--pause", type=float, default=0,
+            help="Seconds to sleep between two batches",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        expired = stock.expire(options["batch_size"], options["pause"])
+        self.stdout.write(f"Expired {expired} reservations in {time.perf_counter() - start:.3f}s")
@@ -0,0 +1,27 @@
+from django.db import models
+
+from home.models import Variant
+
+
+class Reservation(models.Model):
+    """
+    Stock of a variant held for a checkout, taken
+    from Variant.stock already and given back if
+    it expires before the checkout is confirmed
+    """
+    # The reservations of a checkout share the key
+    key = models.CharField(max_length=32, db_index=True)
+    variant = models.ForeignKey(
+        Variant,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+    )
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "reservation"
+        verbose_name_plural = "reservations"
+
+    def __str__(self):
+        return f"{self.key}: {self.quantity} x {self.variant_id}"
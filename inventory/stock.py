@@ -0,0 +1,151 @@
+"""
+Stock reservations of the checkout. Stock is
+taken with conditional updates,
+
+    UPDATE variant SET stock = stock - n
+    WHERE id = ... AND stock >= n
+
+so concurrent buyers can't oversell: the check
+and the change are one statement, and the one
+which comes second updates no row. Reservations
+are handed on, by a confirmed checkout or an
+expiry, by deleting their row; whoever deletes it
+owns it, so a reservation is never both sold and
+given back.
+
+Every transaction here starts with a write. On
+SQLite it takes the write lock at once and the
+other writers wait for it (the busy timeout)
+rather than failing to upgrade a read lock, and
+it is held only for a few statements.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from home.models import Variant
+from male_fashion.utils import in_batches
+from .exceptions import OutOfStock
+from .models import Reservation
+
+
+def take(variant_id, quantity):
+    # Whether the stock was there and has been taken
+    if quantity <= 0:
+        # "stock - quantity" would add stock
+        raise ValueError(f"Invalid quantity {quantity} of variant {variant_id}")
+    return Variant.objects.filter(id=variant_id, stock__gte=quantity) \
+        .update(stock=F("stock") - quantity) == 1
+
+
+def give_back(items):
+    for variant_id, quantity in items.items():
+        Variant.objects.filter(id=variant_id).update(stock=F("stock") + quantity)
+
+
+def get_lines(items):
+    """
+    The (variant id, quantity) lines of a cart,
+    {variant id: quantity} or pairs, sorted by
+    variant. ValueError for a quantity under 1 or
+    a variant given twice.
+    """
+    lines = sorted((int(variant_id), quantity) for variant_id, quantity in
+                   (items.items() if isinstance(items, dict) else items))
+    for index, (variant_id, quantity) in enumerate(lines):
+        if quantity <= 0:
+            raise ValueError(f"Invalid quantity {quantity} of variant {variant_id}")
+        if index and lines[index - 1][0] == variant_id:
+            raise ValueError(f"Variant {variant_id} given twice")
+    return lines
+
+
+def reserve(items, key=None, timeout=None):
+    """
+    Reserve the quantities of a cart, {variant id:
+    quantity}, all of them or none: OutOfStock is
+    raised for the first one missing. Returns the
+    key of the reservations.
+    """
+    # Checked before any stock is taken
+    lines = get_lines(items)
+    key = key or uuid.uuid4().hex
+    if timeout is None:
+        timeout = settings.RESERVATION_TIMEOUT
+    expires_at = timezone.now() + timedelta(seconds=timeout)
+    with transaction.atomic():
+        # Always in the same order, concurrent carts can't deadlock
+        for variant_id, quantity in lines:
+            if not take(variant_id, quantity):
+                raise OutOfStock(variant_id)
+        Reservation.objects.bulk_create(
+            Reservation(key=key, variant_id=variant_id, quantity=quantity, expires_at=expires_at)
+            for variant_id, quantity in lines
+        )
+    return key
+
+
+def claim(rows):
+    """
+    Delete the reservations of the (id, variant id,
+    quantity) rows, returns the rows of those which
+    were still there
+    """
+    return [row for row in rows if Reservation.objects.filter(id=row[0]).delete()[0]]
+
+
+def get_items(rows):
+    items = {}
+    for id, variant_id, quantity in rows:
+        items[variant_id] = items.get(variant_id, 0) + quantity
+    return items
+
+
+def get_rows(reservations):
+    # Read before the transactions, the rows never change
+    return list(reservations.values_list("id", "variant", "quantity"))
+
+
+def confirm(key):
+    """
+    Turn the reservations of a key into a sale,
+    their stock stays taken. Returns {variant id:
+    quantity} of the ones which hadn't been expired.
+    """
+    rows = get_rows(Reservation.objects.filter(key=key))
+    with transaction.atomic():
+        return get_items(claim(rows))
+
+
+def release(key):
+    """
+    Give the stock of the reservations of a key
+    back, e.g. for an abandoned checkout
+    """
+    rows = get_rows(Reservation.objects.filter(key=key))
+    with transaction.atomic():
+        items = get_items(claim(rows))
+        give_back(items)
+    return items
+
+
+def expire(batch_size=500, pause=0):
+    """
+    Give back the stock of the expired reservations,
+    batch_size of them per transaction so that the
+    other writers are never kept waiting long.
+    Returns the number of reservations expired.
+    """
+    def give_back_claimed(rows):
+        claimed = claim(rows)
+        # One update per variant of the batch
+        give_back(get_items(claimed))
+        return len(claimed)
+
+    expired = Reservation.objects.filter(expires_at__lte=timezone.now()).order_by("expires_at") \
+        .values_list("id", "variant", "quantity")
+    return in_batches(expired, give_back_claimed, batch_size, pause)
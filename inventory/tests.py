@@ -0,0 +1,68 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from home.models import Category, Product, Variant
+from .exceptions import OutOfStock
+from .models import Reservation
+from . import stock
+
+
+class StockTest(TestCase):
+    """
+    Tests for the stock reservations
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name="Bags", slug="bags")
+        product = Product.objects.create(category=category, name="Bag", slug="bag", price=20)
+        self.variants = [
+            Variant.objects.create(product=product, sku=f"bag-{number}", color="black",
+                                   size="m", stock=3)
+            for number in range(2)
+        ]
+        self.ids = [variant.id for variant in self.variants]
+
+    def get_stock(self):
+        return [Variant.objects.get(id=id).stock for id in self.ids]
+
+    def test_reserve_all_or_nothing(self):
+        stock.reserve({self.ids[0]: 2, self.ids[1]: 1})
+        self.assertEqual(self.get_stock(), [1, 2])
+        with self.assertRaises(OutOfStock) as raised:
+            stock.reserve({self.ids[0]: 2, self.ids[1]: 1})
+        self.assertEqual(raised.exception.variant_id, self.ids[0])
+        # The other line isn't held either
+        with self.assertRaises(OutOfStock):
+            stock.reserve({self.ids[0]: 1, self.ids[1]: 3})
+        self.assertEqual(self.get_stock(), [1, 2])
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_invalid_quantities(self):
+        for items in ({self.ids[0]: 1, self.ids[1]: -2}, {self.ids[0]: 0},
+                      [(self.ids[0], 1), (self.ids[0], 1)],
+                      {self.ids[0]: 1, str(self.ids[0]): 1}):
+            with self.assertRaises(ValueError):
+                stock.reserve(items)
+        # Nothing taken, nothing added
+        self.assertEqual(self.get_stock(), [3, 3])
+        self.assertFalse(Reservation.objects.exists())
+
+    def test_confirm_release_and_expire(self):
+        sold = stock.reserve({self.ids[0]: 2})
+        released = stock.reserve({self.ids[0]: 1, self.ids[1]: 1})
+        self.assertEqual(stock.release(released), {self.ids[0]: 1, self.ids[1]: 1})
+        self.assertEqual(stock.confirm(sold), {self.ids[0]: 2})
+        self.assertEqual(self.get_stock(), [1, 3])
+
+        expiring = stock.reserve({self.ids[1]: 2}, timeout=60)
+        stock.reserve({self.ids[1]: 1})
+        with mock.patch("django.utils.timezone.now",
+                        return_value=timezone.now() + timedelta(seconds=61)):
+            self.assertEqual(stock.expire(batch_size=1), 1)
+        self.assertEqual(self.get_stock(), [1, 2])
+        # Expired, so it can't be sold any more
+        self.assertEqual(stock.confirm(expiring), {})
+        self.assertEqual(stock.expire(), 0)
@@ -12,5 +12,11 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'male_fashion.settings')
+# Serve the async versions of the account views
+os.environ.setdefault('ACCOUNT_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
+
+# Only in the serving processes, not in every management command
+from account.verification import start_sweeper  # noqa: E402
+start_sweeper()
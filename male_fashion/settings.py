@@ -13,7 +13,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-sz!-o4m@j-iexv9=(fk3wupn2o2d8up%ua92&i(3bn*b_67ecf'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = config("DEBUG", default=True, cast=bool)
 
 ALLOWED_HOSTS = []
 
@@ -26,19 +26,26 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    'home.apps.StaticFilesConfig',
 
     # local
     'home.apps.HomeConfig',
     'account.apps.AccountConfig',
+    'cart.apps.CartConfig',
+    'wishlist.apps.WishlistConfig',
+    'inventory.apps.InventoryConfig',
+    'orders.apps.OrdersConfig',
+    'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'account.sessions.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
+    'account.ratelimit.RateLimitMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'account.middleware.ServiceBusyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -62,6 +69,29 @@ TEMPLATES = [
     },
 ]
 
+# Production template mode: every template is compiled on the first request
+# and kept, and the {% include %}s of TEMPLATE_INLINE_INCLUDES (templates which
+# render the same for every request, and use no static files) are replaced by
+# their output
+TEMPLATE_PRECOMPILE = config("TEMPLATE_PRECOMPILE", default=not DEBUG, cast=bool)
+TEMPLATE_INLINE_INCLUDES = [
+    "includes/preloader.html",
+    "includes/search.html",
+]
+if TEMPLATE_PRECOMPILE:
+    TEMPLATES[0]["APP_DIRS"] = False
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [
+        ("home.templating.Loader", [
+            "django.template.loaders.filesystem.Loader",
+            "django.template.loaders.app_directories.Loader",
+        ]),
+    ]
+
+# Log the templates taking longer than the threshold (ms) to render, see
+# home.templating.render_timings for the totals per template
+TEMPLATE_RENDER_TIMING = config("TEMPLATE_RENDER_TIMING", default=False, cast=bool)
+TEMPLATE_RENDER_TIMING_THRESHOLD = config("TEMPLATE_RENDER_TIMING_THRESHOLD", default=5.0, cast=float)
+
 WSGI_APPLICATION = 'male_fashion.wsgi.application'
 
 
@@ -94,6 +124,23 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Work factor of the PBKDF2 hasher, measured by "manage.py calibrate_hasher"
+PASSWORD_HASHER_ITERATIONS = config("PASSWORD_HASHER_ITERATIONS", default=390000, cast=int)
+
+PASSWORD_HASHERS = [
+    "account.hashers.CalibratedPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+# Password hashing runs on a bounded thread pool; requests get a 503 when
+# all the workers are busy and the queue stays full for the timeout
+PASSWORD_HASHING_WORKERS = 4
+PASSWORD_HASHING_QUEUE_SIZE = 32
+PASSWORD_HASHING_TIMEOUT = 5
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -114,12 +161,104 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     path.join(BASE_DIR, "static")
 ]
+STATIC_ROOT = config("STATIC_ROOT", default=path.join(BASE_DIR, "staticfiles"))
+
+# Not collected: vendor sources and files no template or stylesheet uses
+STATICFILES_IGNORE_PATTERNS = [
+    "Source",
+    "sass",
+    "*.map",
+    "*.less",
+    "*.scss",
+    "account/fonts/iconic/*",
+    "account/fonts/source-sans-pro/*",
+    "account/fonts/font-awesome-4.7.0/less/*",
+    "account/fonts/font-awesome-4.7.0/scss/*",
+    "account/profile/css/font-awesome/*",
+    "account/profile/font-icon/font-awesome/*",
+    "account/profile/image/*",
+    "account/vendor/perfect-scrollbar/*",
+]
+
+# Built by collectstatic with the static pipeline, included with {% bundle %}
+STATIC_BUNDLES = {
+    "css/site.css": [
+        "css/bootstrap.min.css",
+        "css/font-awesome.min.css",
+        "css/elegant-icons.css",
+        "css/magnific-popup.css",
+        "css/nice-select.css",
+        "css/owl.carousel.min.css",
+        "css/slicknav.min.css",
+        "css/style.css",
+    ],
+    "js/site.js": [
+        "js/jquery-3.3.1.min.js",
+        "js/bootstrap.min.js",
+        "js/jquery.nice-select.min.js",
+        "js/jquery.nicescroll.min.js",
+        "js/jquery.magnific-popup.min.js",
+        "js/jquery.countdown.min.js",
+        "js/jquery.slicknav.js",
+        "js/mixitup.min.js",
+        "js/owl.carousel.min.js",
+        "js/main.js",
+        "js/cart.js",
+        "js/wishlist.js",
+    ],
+}
+
+# Widths, formats and placeholders of the static images used with
+# {% responsive_image %}/{% responsive_bg %}, see build_image_variants
+IMAGE_VARIANTS = {
+    "ROOT": path.join(BASE_DIR, "variants"),
+    "SOURCES": ["img/hero", "img/banner", "img/product", "img/blog"],
+    "WIDTHS": [320, 640, 960, 1440, 1920],
+    "FORMATS": ["webp", "jpeg"],
+    "QUALITY": 80,
+    "PLACEHOLDER_WIDTH": 16,
+}
+if path.isdir(IMAGE_VARIANTS["ROOT"]):
+    STATICFILES_DIRS.append(IMAGE_VARIANTS["ROOT"])
+
+# Bundled, hashed and precompressed static files (run collectstatic), see
+# home.staticfiles. Served by home.staticfiles.serve unless DEBUG is set;
+# a front server can serve STATIC_ROOT itself (e.g. nginx gzip_static).
+# The manifest is read when the server starts, so deploy with collectstatic
+# first and then start (or restart) the server; until then the unhashed
+# names and the separate files of the bundles are used.
+STATIC_PIPELINE = config("STATIC_PIPELINE", default=not DEBUG, cast=bool)
+if STATIC_PIPELINE:
+    STATICFILES_STORAGE = "home.staticfiles.PipelineStorage"
+
 MEDIA_URL = "media/"
 MEDIA_ROOT = path.join(BASE_DIR, "media")
 
+# How home.media.serve sends the uploaded files: "django" (FileResponse,
+# sendfile() when the WSGI server supports it), "x-accel-redirect" (nginx,
+# with an internal location at ACCEL_PREFIX aliased to MEDIA_ROOT) or
+# "x-sendfile" (Apache mod_xsendfile, lighttpd)
+MEDIA_SERVE = {
+    "MODE": config("MEDIA_SERVE_MODE", default="django"),
+    "ACCEL_PREFIX": "/protected-media/",
+    "MAX_AGE": 60 * 60,
+}
+
+# Resized variants of the uploaded images, see home.media
+MEDIA_RESIZE = {
+    "PATHS": ["user_image/", "product_image/"],
+    "WIDTHS": [48, 96, 128, 192, 256, 384, 512],
+    "QUALITY": 80,
+    "CACHE_DIR": path.join(BASE_DIR, "media_cache"),
+    "CACHE_MAX_SIZE": 200 * 1024 * 1024,
+    "MAX_AGE": 60 * 60 * 24,
+}
+
+# CustomBackend comes first so that authenticate() finds the user
+# by phone or email with a single query
 AUTHENTICATION_BACKENDS = [
-    "django.contrib.auth.backends.ModelBackend",
     "account.authentication.CustomBackend",
+    "django.contrib.auth.backends.ModelBackend",
 ]
 
 # Default primary key field type
@@ -129,9 +268,196 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'account.User'
 TEMPLATE_CONTEXT_PROCESSORS = "django.contrib.messages.context_processors.messages"
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Emails are queued and sent by a background thread over a reused
+# connection of MAILER["BACKEND"] (failed ones end up as FailedEmail)
+EMAIL_BACKEND = 'account.mailer.QueuedEmailBackend'
+MAILER = {
+    "BACKEND": "django.core.mail.backends.smtp.EmailBackend",
+    "BATCH_SIZE": 20,
+    "MAX_ATTEMPTS": 5,
+    "RETRY_DELAY": 5,
+    "IDLE_TIMEOUT": 30,
+}
 EMAIL_USE_TLS = True
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_HOST_USER = config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 EMAIL_PORT = 587
+
+# Caches
+# The "verification" cache keeps the short-lived OTP and email-link data.
+# LocMemCache is an in-process LRU cache, only right for a single process:
+# a code sent by one worker isn't found by another. With several workers
+# set CACHE_URL (e.g. redis://127.0.0.1:6379/1), the SHARED_CACHES and the
+# verification store use that server, "manage.py check --deploy" fails
+# otherwise.
+CACHE_URL = config("CACHE_URL", default="")
+SHARED_CACHES = ["default", "sessions", "ratelimit", "users", "pages"]
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "verification": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "verification",
+        "TIMEOUT": 60 * 10,
+        "OPTIONS": {
+            "MAX_ENTRIES": 10000,
+        },
+    },
+    "sessions": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "sessions",
+        "OPTIONS": {
+            "MAX_ENTRIES": 50000,
+        },
+    },
+    "ratelimit": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "ratelimit",
+        "OPTIONS": {
+            "MAX_ENTRIES": 100000,
+        },
+    },
+    # Users loaded for request.user, see account.authentication. Shared, so
+    # that a deactivated user or a changed password is seen by every worker.
+    "users": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "users",
+        "TIMEOUT": 60,
+        "OPTIONS": {
+            "MAX_ENTRIES": 10000,
+        },
+    },
+    # Pages cached by home.page_cache
+    "pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "pages",
+        "OPTIONS": {
+            "MAX_ENTRIES": 1000,
+        },
+    },
+}
+if CACHE_URL:
+    for alias in SHARED_CACHES:
+        CACHES[alias] = {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+            "KEY_PREFIX": alias,
+            "TIMEOUT": CACHES[alias].get("TIMEOUT", 300),
+        }
+
+USER_CACHE = "users"
+
+# A change of the catalog starts a new version of the cached pages. With a
+# process-local cache the other workers serve their old pages until these
+# expire, PAGE_CACHE_TIMEOUT seconds at most.
+PAGE_CACHE = "pages"
+# Seconds the full pages are cached, 0 disables the page cache
+PAGE_CACHE_TIMEOUT = 60 * 5
+# Anonymous visitors with these in their session get their own page too
+PAGE_CACHE_PRIVATE_SESSION_KEYS = ["cart"]
+
+# Products per page of the home page grid
+CATALOG_PAGE_SIZE = 8
+# Products per page of the search results
+SEARCH_PAGE_SIZE = 12
+
+# Cache of the version of the product facet index, see home.facets; shared
+# by the workers, or they keep filtering with their old index
+FACET_CACHE = "default"
+# Upper limits of the price bands of the product filter
+FACET_PRICE_BANDS = [50, 100, 150]
+# Cache of the version counters of the catalog tables, see home.versions;
+# shared by the workers, or they answer 304 for a changed catalog
+CATALOG_VERSION_CACHE = "default"
+
+# Largest quantity of a cart item, and most items of a cart (the session
+# of anonymous visitors is a cookie)
+CART_MAX_QUANTITY = 10
+CART_MAX_ITEMS = 50
+
+# Cache of the wishlist and compare counts of the header, shared by the
+# workers (each moves the counts of the changes it makes)
+WISHLIST_CACHE = "default"
+WISHLIST_COUNT_TIMEOUT = 60 * 60 * 24
+# Products the cards can be checked for at once
+WISHLIST_MAX_FLAGS = 100
+COMPARE_MAX_PRODUCTS = 4
+
+# Seconds the stock of a checkout is held for
+RESERVATION_TIMEOUT = 15 * 60
+
+# Orders per page of the order history
+ORDER_HISTORY_PAGE_SIZE = 10
+
+# Products per page of the catalog API, by default and at most (?limit=)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+# Products read at a time by the streamed export
+API_EXPORT_CHUNK_SIZE = 2000
+
+# Storage of pending registrations, password resets and profile changes.
+# Use "account.verification.ModelVerificationStore" to keep them in the
+# Otp, ResetPasswordOtp and ChangedUser tables instead.
+VERIFICATION_STORE = {
+    "BACKEND": "account.verification.CacheVerificationStore",
+    "OPTIONS": {
+        "alias": "verification",
+    },
+}
+if CACHE_URL:
+    # Updated atomically, unlike the records of a cache
+    VERIFICATION_STORE = {
+        "BACKEND": "account.verification.RedisVerificationStore",
+        "OPTIONS": {
+            "url": CACHE_URL,
+        },
+    }
+VERIFICATION_TIMEOUT = 60 * 10
+# Seconds between two purges of the expired verification rows by a thread
+# of the WSGI/ASGI server processes (None disables it, use
+# "manage.py purge_verifications" from cron instead)
+VERIFICATION_SWEEP_INTERVAL = None
+
+# Use the async account views (set by male_fashion/asgi.py)
+ACCOUNT_ASYNC_VIEWS = config("ACCOUNT_ASYNC_VIEWS", default=False, cast=bool)
+
+# Outgoing SMS (OTP codes). Every provider has a bounded queue emptied in
+# batches by MAX_CONCURRENCY threads, "default" is used for the OTP codes.
+SMS_GATEWAY = {
+    "QUEUE_SIZE": 1000,
+    "PROVIDERS": {
+        "default": {
+            "BACKEND": "account.sms.ConsoleSmsProvider",
+            "MAX_CONCURRENCY": 2,
+            "BATCH_SIZE": 50,
+        },
+    },
+}
+
+# Request counts, per period, of the endpoints sending OTP codes or
+# checking passwords, by URL name. The keys are "ip", "token" (from the
+# query string) or a field of the submitted form; the rates are
+# "<count>/<s|m|h|d>".
+RATE_LIMITS = {
+    "account:login": {"ip": "20/m", "username": "5/m"},
+    "account:register": {"ip": "10/h", "phone": "3/h"},
+    "account:check-otp": {"ip": "30/m", "token": "5/m"},
+    "account:password-reset-phone": {"ip": "10/h", "phone": "3/h"},
+    "account:password-reset-otp": {"ip": "30/m", "token": "5/m"},
+    "account:change-phone": {"ip": "30/m", "token": "5/m"},
+}
+RATE_LIMIT_METHODS = ("POST",)
+RATE_LIMIT_CACHE = "ratelimit"
+# Use the header set by the reverse proxy (e.g. "HTTP_X_REAL_IP") behind one
+RATE_LIMIT_IP_META = "REMOTE_ADDR"
+
+# Sessions are read from the "sessions" cache and written to the database
+# in batches, at most every SESSION_WRITE_BEHIND_INTERVAL seconds and when
+# the worker exits. The cache has to be shared by the workers.
+# Anonymous visitors keep their session in a signed cookie.
+SESSION_ENGINE = "account.sessions"
+SESSION_CACHE_ALIAS = "sessions"
+SESSION_WRITE_BEHIND_INTERVAL = 2
+SESSION_ANONYMOUS_SIGNED_COOKIES = True
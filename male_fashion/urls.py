@@ -1,11 +1,23 @@
-from django.conf.urls.static import static
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.contrib import admin
 
+from home import media, staticfiles
 from . import settings
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include("home.urls")),
-    path('account/', include("account.urls"))
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('account/', include("account.async_urls" if settings.ACCOUNT_ASYNC_VIEWS
+                             else "account.urls")),
+    path('cart/', include("cart.urls")),
+    path('wishlist/', include("wishlist.urls")),
+    path('orders/', include("orders.urls")),
+    path('api/', include("api.urls")),
+    path(f"{settings.MEDIA_URL}resized/<path:path>", media.resized, name="resized-media"),
+    path(f"{settings.MEDIA_URL}<path:path>", media.serve, name="media"),
+]
+
+if settings.STATIC_PIPELINE and not settings.DEBUG:
+    urlpatterns.append(
+        re_path(r"^%s(?P<path>.*)$" % settings.STATIC_URL.lstrip("/"), staticfiles.serve)
+    )
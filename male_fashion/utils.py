@@ -0,0 +1,34 @@
+"""
+Helpers shared by the apps.
+
+Batched deletes: the rows of a queryset handled
+batch_size at a time, each batch in its own short
+write transaction, so that purging a large backlog
+never keeps the other writers waiting long
+"""
+import time
+
+from django.db import transaction
+
+
+def in_batches(queryset, process, batch_size=500, pause=0):
+    """
+    Call process() with the first batch_size rows
+    of queryset until fewer are left, sleeping
+    pause seconds between two batches; process()
+    has to delete them. Order the queryset by an
+    indexed column. Returns the sum of what
+    process() returned.
+    """
+    total = 0
+    while True:
+        batch = list(queryset[:batch_size])
+        if not batch:
+            return total
+        with transaction.atomic():
+            total += process(batch)
+        if len(batch) < batch_size:
+            return total
+        # Give the other writers a chance to take the lock
+        if pause:
+            time.sleep(pause)
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'male_fashion.settings')
 
 application = get_wsgi_application()
+
+# Only in the serving processes, not in every management command
+from account.verification import start_sweeper  # noqa: E402
+start_sweeper()
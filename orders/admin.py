@@ -0,0 +1,26 @@
+from django.contrib import admin
+
+from .models import Order, OrderLine
+
+
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    extra = 0
+    raw_id_fields = ('variant',)
+
+
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'user', 'status', 'item_count', 'total', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    readonly_fields = ('item_count', 'total', 'thumbnail')
+    inlines = (OrderLineInline,)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # The lines may have changed
+        form.instance.update_summary()
+
+
+admin.site.register(Order, OrderAdmin)
@@ -0,0 +1,97 @@
+import random
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+from django.core.management.base import BaseCommand
+
+from account.sessions import flush_pending_sessions
+from account.models import User
+from home.models import Category, Product, Variant
+from orders.models import Order, OrderLine
+from orders.views import encode_cursor
+
+
+class Command(BaseCommand):
+    help = ("Latency of the first, middle and last pages of the order history of a "
+            "user with many orders, keyset pages against OFFSET ones")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=10000)
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(ALLOWED_HOSTS=["testserver"]):
+                user = self.create_orders(options["orders"], options["batch_size"])
+                self.run_cases(user, options["requests"])
+        finally:
+            # Written now, their database is gone at exit
+            flush_pending_sessions()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def create_orders(self, count, batch_size):
+        rng = random.Random(0)
+        category = Category.objects.create(name="Benchmark", slug="benchmark")
+        product = Product.objects.create(category=category, name="Benchmark", slug="benchmark",
+                                         price=10)
+        variant = Variant.objects.create(product=product, sku="benchmark", color="black",
+                                         size="m")
+        user = User.objects.create_user(phone="09120000000", full_name="Benchmark User",
+                                        password="benchmark-password")
+        now = timezone.now()
+        for offset in range(0, count, batch_size):
+            orders = Order.objects.bulk_create(
+                # A few orders a day, some at the same time
+                Order(user=user, created_at=now - timedelta(hours=number // 2 * 6),
+                      status="delivered")
+                for number in range(offset, min(offset + batch_size, count))
+            )
+            lines = []
+            for order in orders:
+                quantities = [rng.randint(1, 3) for _ in range(rng.randint(1, 4))]
+                lines += [
+                    OrderLine(order=order, variant=variant, product_name=product.name,
+                              variant_name="Black, M", price=product.price, quantity=quantity)
+                    for quantity in quantities
+                ]
+                order.item_count = sum(quantities)
+                order.total = order.item_count * product.price
+            OrderLine.objects.bulk_create(lines)
+            Order.objects.bulk_update(orders, ["item_count", "total"])
+        return user
+
+    def run_cases(self, user, requests):
+        client = Client()
+        client.force_login(user, backend="account.authentication.CustomBackend")
+        size = settings.ORDER_HISTORY_PAGE_SIZE
+        orders = Order.objects.filter(user=user)
+        count = orders.count()
+        keys = list(orders.order_by("-created_at", "-id").values_list("created_at", "id"))
+
+        self.stdout.write(f"{count} orders, {OrderLine.objects.count()} lines:")
+        self.stdout.write(f"  {'':<12} {'request':>10} {'keyset':>10} {'OFFSET':>10}")
+        for name, offset in (("first page", 0), ("middle page", count // 2),
+                             ("last page", count - size)):
+            after = keys[offset - 1] if offset else None
+            url = f"/orders/?after={encode_cursor(after)}" if after else "/orders/"
+            request = self.measure(lambda: client.get(url), requests)
+            keyset = self.measure(lambda: orders.page(after, size), requests)
+            offset_page = self.measure(
+                lambda: list(orders.order_by("-created_at", "-id")[offset:offset + size]),
+                requests)
+            self.stdout.write(f"  {name:<12} {request * 1000:8.2f}ms {keyset * 1000:8.2f}ms "
+                              f"{offset_page * 1000:8.2f}ms")
+
+    def measure(self, function, requests):
+        # Warm up
+        function()
+        start = time.perf_counter()
+        for _ in range(requests):
+            function()
+        return (time.perf_counter() - start) / requests
@@ -0,0 +1,27 @@
+from django.db import models
+
+
+class OrderQuerySet(models.QuerySet):
+    """
+    Custom queryset for the Order model
+    """
+
+    def page(self, after=None, size=10):
+        """
+        The newest orders first, the ones older than
+        `after` (a (created_at, id) pair) for the next
+        pages. Returns the orders and the cursor of
+        the next page (None on the last page).
+        """
+        queryset = self.order_by("-created_at", "-id")
+        if after is not None:
+            created_at, id = after
+            # A range of the (user, created_at, id) index, the id breaks the ties
+            queryset = queryset.filter(created_at__lte=created_at) \
+                .exclude(created_at=created_at, id__gte=id)
+        # One more row tells whether there's a next page
+        orders = list(queryset[:size + 1])
+        if len(orders) > size:
+            last = orders[size - 1]
+            return orders[:size], (last.created_at, last.id)
+        return orders, None
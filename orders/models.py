@@ -0,0 +1,90 @@
+from django.db import models
+from django.conf import settings
+from django.utils import timezone
+
+from home.models import Variant
+from .managers import OrderQuerySet
+
+
+class Order(models.Model):
+    """
+    Order of a user, with a summary of its lines
+    so that the order history reads no line
+    """
+    STATUSES = [
+        ("pending", "Pending"),
+        ("paid", "Paid"),
+        ("shipped", "Shipped"),
+        ("delivered", "Delivered"),
+        ("cancelled", "Cancelled"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="orders",
+    )
+    status = models.CharField(max_length=20, choices=STATUSES, default="pending")
+    # Summary of the lines, see update_summary()
+    item_count = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    thumbnail = models.ImageField(upload_to="product_image", blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = OrderQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "order"
+        verbose_name_plural = "orders"
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="orders_order_history"),
+        ]
+
+    def __str__(self):
+        return f"#{self.id}"
+
+    def update_summary(self):
+        """
+        Count and total of the lines and the picture
+        of the first product which has one
+        """
+        lines = list(self.lines.select_related("variant__product")
+                     .prefetch_related("variant__product__images"))
+        self.item_count = sum(line.quantity for line in lines)
+        self.total = sum(line.subtotal for line in lines)
+        images = [line.variant.product.primary_image for line in lines if line.variant]
+        self.thumbnail = next((image.image.name for image in images if image), "")
+        self.save(update_fields=["item_count", "total", "thumbnail"])
+
+
+class OrderLine(models.Model):
+    """
+    Variant bought in an order, with its name
+    and price at the time
+    """
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name="lines",
+    )
+    variant = models.ForeignKey(
+        Variant,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="order_lines",
+    )
+    product_name = models.CharField(max_length=200)
+    variant_name = models.CharField(max_length=50)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = "order line"
+        verbose_name_plural = "order lines"
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
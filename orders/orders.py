@@ -0,0 +1,26 @@
+from django.db import transaction
+
+from .models import Order, OrderLine
+
+
+def create_order(user, lines):
+    """
+    Order of the (variant, quantity, subtotal) lines
+    of cart.get_lines(), at the current prices,
+    with its summary
+    """
+    with transaction.atomic():
+        order = Order.objects.create(user=user)
+        OrderLine.objects.bulk_create(
+            OrderLine(
+                order=order,
+                variant=variant,
+                product_name=variant.product.name,
+                variant_name=f"{variant.get_color_display()}, {variant.get_size_display()}",
+                price=variant.product.current_price,
+                quantity=quantity,
+            )
+            for variant, quantity, subtotal in lines
+        )
+        order.update_summary()
+    return order
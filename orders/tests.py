@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.urls import reverse
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from account import sessions
+from account.models import User
+from cart.cart import get_lines
+from home.models import Category, Product, ProductImage, Variant
+from .models import Order
+from .orders import create_order
+from .views import encode_cursor, decode_cursor
+
+
+class OrderTest(TestCase):
+    """
+    Tests for the orders and the order history
+    """
+
+    def setUp(self):
+        category = Category.objects.create(name="Bags", slug="bags")
+        self.variants = []
+        for number, price in enumerate([20, 35]):
+            product = Product.objects.create(category=category, name=f"Bag {number}",
+                                             slug=f"bag-{number}", price=price)
+            self.variants.append(Variant.objects.create(product=product, sku=f"bag-{number}",
+                                                        color="black", size="m"))
+        ProductImage.objects.create(product=self.variants[1].product,
+                                    image="product_image/product-2.jpg")
+        self.user = User.objects.create_user(phone="09120000000", full_name="Test User",
+                                             password="testpassword")
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    def test_summary(self):
+        order = create_order(self.user, get_lines({self.variants[0].id: 2,
+                                                   self.variants[1].id: 1}))
+        order.refresh_from_db()
+        self.assertEqual(order.item_count, 3)
+        self.assertEqual(order.total, 2 * 20 + 35)
+        self.assertEqual(order.thumbnail.name, "product_image/product-2.jpg")
+        self.assertEqual(order.lines.get(variant=self.variants[0]).variant_name, "Black, M")
+
+    def test_history(self):
+        now = timezone.now()
+        # Orders at the same time are told apart by their id
+        orders = Order.objects.bulk_create(
+            Order(user=self.user, created_at=now - timedelta(days=number // 2), total=number)
+            for number in range(25)
+        )
+        expected = sorted(orders, key=lambda order: (order.created_at, order.id), reverse=True)
+        self.client.force_login(self.user, backend="account.authentication.CustomBackend")
+
+        seen = []
+        url = reverse("orders:history")
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertFalse(any("orders_orderline" in query["sql"] for query in queries))
+            seen += response.context["orders"]
+            next_after = response.context["next_after"]
+            url = f"{reverse('orders:history')}?after={next_after}" if next_after else None
+        self.assertEqual([order.id for order in seen], [order.id for order in expected])
+
+        self.assertEqual(decode_cursor(encode_cursor((now, 7))), (now, 7))
+        self.assertIsNone(decode_cursor("x-1"))
+
+    def test_bad_cursor(self):
+        self.client.force_login(self.user, backend="account.authentication.CustomBackend")
+        for cursor in ("", "1", "1-2-3", "x-1", "100000000000000000000-1",
+                       "1-100000000000000000000", "-5-1"):
+            self.assertIsNone(decode_cursor(cursor), cursor)
+            response = self.client.get(reverse("orders:history"), {"after": cursor})
+            self.assertEqual(response.status_code, 200)
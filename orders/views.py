@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.shortcuts import render, redirect
+from django.views import View
+
+from .models import Order
+
+epoch = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(after):
+    # (created_at, id) as "<microseconds since 1970>-<id>", exact unlike a float timestamp
+    created_at, id = after
+    return f"{(created_at - epoch) // timedelta(microseconds=1)}-{id}"
+
+
+def decode_cursor(value):
+    # None for a malformed cursor, or one out of the range of a datetime or a column
+    try:
+        microseconds, id = (int(part) for part in value.split("-"))
+        created_at = epoch + timedelta(microseconds=microseconds)
+    except (ValueError, OverflowError, OSError):
+        return None
+    if not 0 < id < 2 ** 63:
+        return None
+    return created_at, id
+
+
+class OrderHistory(View):
+    """
+    Orders of the user, newest first, paged with
+    the (created_at, id) of the last one shown
+    """
+
+    def get(self, request):
+        if not request.user.is_authenticated:
+            return redirect("account:login")
+        after = decode_cursor(request.GET.get("after", ""))
+        orders, next_after = Order.objects.filter(user=request.user) \
+            .page(after, settings.ORDER_HISTORY_PAGE_SIZE)
+        return render(request, "orders/history.html", {
+            "orders": orders,
+            "after": after,
+            "next_after": encode_cursor(next_after) if next_after else None,
+        })
@@ -0,0 +1,29 @@
+'use strict';
+
+(function ($) {
+
+    /*------------------
+        Add To Cart
+    --------------------*/
+    function getCookie(name) {
+        var match = document.cookie.match('(?:^|; )' + name + '=([^;]*)');
+        return match ? decodeURIComponent(match[1]) : null;
+    }
+
+    $(document).on('click', '.add-cart[data-cart-add]', function (event) {
+        event.preventDefault();
+        $.ajax({
+            url: $(this).data('cart-add'),
+            method: 'POST',
+            dataType: 'json',
+            headers: {
+                'X-CSRFToken': getCookie('csrftoken'),
+                'X-Requested-With': 'XMLHttpRequest'
+            }
+        }).done(function (cart) {
+            $('.cart-count').text(cart.count);
+            $('.cart-total').text('$' + cart.total);
+        });
+    });
+
+})(jQuery);
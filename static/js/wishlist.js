@@ -0,0 +1,56 @@
+'use strict';
+
+(function ($) {
+
+    /*------------------
+        Wishlist & Compare
+    --------------------*/
+    function getCookie(name) {
+        var match = document.cookie.match('(?:^|; )' + name + '=([^;]*)');
+        return match ? decodeURIComponent(match[1]) : null;
+    }
+
+    // The header has the counts, and the address of the flags, for signed in users only
+    var savedUrl = $('.wishlist-count').first().data('saved');
+    var $cards = $('[data-list-update][data-product]');
+
+    // The pages are cached for everyone, the cards of the user are marked here
+    if (savedUrl && $cards.length) {
+        var ids = [];
+        $cards.each(function () {
+            if (ids.indexOf($(this).data('product')) === -1) {
+                ids.push($(this).data('product'));
+            }
+        });
+        $.getJSON(savedUrl, {ids: ids.join(',')}).done(function (saved) {
+            $cards.each(function () {
+                var list = saved[$(this).data('list')] || [];
+                $(this).toggleClass('active', list.indexOf($(this).data('product')) !== -1);
+            });
+        });
+    }
+
+    $(document).on('click', '[data-list-update][data-product]', function (event) {
+        event.preventDefault();
+        var $link = $(this);
+        $.ajax({
+            url: $link.data('list-update'),
+            method: 'POST',
+            data: {toggle: $link.data('product')},
+            dataType: 'json',
+            headers: {
+                'X-CSRFToken': getCookie('csrftoken'),
+                'X-Requested-With': 'XMLHttpRequest'
+            }
+        }).done(function (result) {
+            var $links = $('[data-list="' + $link.data('list') + '"][data-product="' + $link.data('product') + '"]');
+            $links.toggleClass('active', result.added.length > 0);
+            $('.' + $link.data('list') + '-count').text(result.count);
+        }).fail(function (xhr) {
+            if (xhr.status === 403 && xhr.responseJSON) {
+                window.location = xhr.responseJSON.login;
+            }
+        });
+    });
+
+})(jQuery);
@@ -0,0 +1,135 @@
+"""
+Wishlist and compare list of the users: one
+SavedProduct row per user and product, with a
+bit in it for each list. The number of products
+in each list is cached for the header and moved
+by the number of rows added or removed, rather
+than counted again after every change. The rows
+deleted with their product or user drop the
+counts, counted again on the next read.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.lookups import GreaterThan
+
+from home.models import Product
+from .models import SavedProduct
+
+# Bit of each list in SavedProduct.lists
+lists = {"wishlist": 1, "compare": 2}
+
+
+def get_cache():
+    return caches[settings.WISHLIST_CACHE]
+
+
+def get_count_key(name, user_id):
+    return f"wishlist.count:{name}:{user_id}"
+
+
+def in_list(name):
+    # Condition of the rows in the list
+    return GreaterThan(F("lists").bitand(lists[name]), 0)
+
+
+def get_counts(user):
+    """
+    {list name: number of products}, counted in
+    one query when not cached
+    """
+    keys = {name: get_count_key(name, user.pk) for name in lists}
+    cached = get_cache().get_many(keys.values())
+    if len(cached) == len(keys):
+        return {name: cached[key] for name, key in keys.items()}
+    counts = SavedProduct.objects.filter(user=user).aggregate(**{
+        name: Count("id", filter=in_list(name)) for name in lists
+    })
+    for name, count in counts.items():
+        # Not over a count moved by a change committed meanwhile
+        get_cache().add(keys[name], count, settings.WISHLIST_COUNT_TIMEOUT)
+    return counts
+
+
+def change_count(name, user_id, delta):
+    if not delta:
+        return
+    try:
+        get_cache().incr(get_count_key(name, user_id), delta)
+    except ValueError:
+        # Not cached, counted on the next read
+        pass
+
+
+def forget_counts(user_id):
+    get_cache().delete_many([get_count_key(name, user_id) for name in lists])
+
+
+def get_saved(user, product_ids):
+    """
+    {list name: ids of the products in it} of the
+    given products, e.g. the cards of a grid, in
+    one query
+    """
+    saved = {name: set() for name in lists}
+    if not user.is_authenticated:
+        return saved
+    rows = SavedProduct.objects.filter(user=user, product__in=product_ids) \
+        .values_list("product", "lists")
+    for product_id, bits in rows:
+        for name, bit in lists.items():
+            if bits & bit:
+                saved[name].add(product_id)
+    return saved
+
+
+def get_product_ids(user, name):
+    # Newest first
+    return SavedProduct.objects.filter(in_list(name), user=user) \
+        .order_by("-id").values_list("product", flat=True)
+
+
+def update(user, name, add=(), remove=(), toggle=()):
+    """
+    Add and remove products of a list at once,
+    the toggled ones are added when not in it
+    and removed otherwise. Returns the ids of the
+    products added and removed.
+    """
+    bit = lists[name]
+    add, remove, toggle = set(add), set(remove), set(toggle)
+    with transaction.atomic():
+        # One change of the lists of a user at a time, the counts stay exact
+        get_user_model().objects.select_for_update().only("pk").get(pk=user.pk)
+        saved = dict(SavedProduct.objects.filter(user=user, product__in=add | remove | toggle)
+                     .values_list("product", "lists"))
+        current = {id for id, bits in saved.items() if bits & bit}
+
+        removed = (remove | toggle) & current
+        added = (add | toggle) - current - removed
+        if added:
+            added = set(Product.objects.filter(id__in=added, is_active=True)
+                        .values_list("id", flat=True))
+        if added and name == "compare":
+            # Only the first ones which fit
+            room = settings.COMPARE_MAX_PRODUCTS - (
+                SavedProduct.objects.filter(in_list(name), user=user).count() - len(removed))
+            added = set(sorted(added)[:max(room, 0)])
+
+        if removed:
+            SavedProduct.objects.filter(user=user, product__in=removed) \
+                .update(lists=F("lists").bitand(~bit))
+            SavedProduct.objects.filter(user=user, product__in=removed, lists=0).delete()
+        if added & saved.keys():
+            SavedProduct.objects.filter(user=user, product__in=added & saved.keys()) \
+                .update(lists=F("lists").bitor(bit))
+        if added - saved.keys():
+            SavedProduct.objects.bulk_create(
+                SavedProduct(user=user, product_id=id, lists=bit)
+                for id in added - saved.keys()
+            )
+    # The views run in autocommit, the rows are committed by now
+    change_count(name, user.pk, len(added) - len(removed))
+    return sorted(added), sorted(removed)
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.6 on 2026-10-18 15:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('home', '0003_facetbitmap'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lists', models.PositiveSmallIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved', to='home.product')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_products', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'saved product',
+                'verbose_name_plural': 'saved products',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='savedproduct',
+            constraint=models.UniqueConstraint(fields=('user', 'product'), name='wishlist_savedproduct_unique'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.db import models
+from django.conf import settings
+
+from home.models import Product
+
+
+class SavedProduct(models.Model):
+    """
+    Product in the wishlist or compare list of a
+    user, one row for both with a bit for each
+    list (see wishlist.lists)
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="saved_products",
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="saved",
+    )
+    lists = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "saved product"
+        verbose_name_plural = "saved products"
+        constraints = [
+            models.UniqueConstraint(fields=["user", "product"],
+                                    name="wishlist_savedproduct_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.product}"
@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.dispatch import receiver
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete
+
+from . import lists
+from .models import SavedProduct
+
+
+@receiver(post_delete, sender=SavedProduct)
+def forget_counts(instance, origin, **kwargs):
+    # lists.update() moves the counts of the rows it deletes itself, the
+    # ones deleted with their products or users (also in bulk, a queryset
+    # of them is the origin then) are counted again
+    if isinstance(origin, SavedProduct) \
+            or (isinstance(origin, QuerySet) and origin.model is SavedProduct):
+        return
+    transaction.on_commit(lambda: lists.forget_counts(instance.user_id))
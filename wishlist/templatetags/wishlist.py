@@ -0,0 +1,15 @@
+from django import template
+
+from wishlist.lists import get_counts
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def saved_counts(context):
+    """
+    Number of products in each list of the user,
+    cached, None for anonymous visitors
+    """
+    user = context["request"].user
+    return get_counts(user) if user.is_authenticated else None
@@ -0,0 +1,108 @@
+from django.urls import reverse
+from django.test import TestCase, override_settings
+
+from account import sessions
+from account.models import User
+from home.models import Category, Product
+from .models import SavedProduct
+from . import lists
+
+
+class WishlistTest(TestCase):
+    """
+    Tests for the wishlist and compare list
+    """
+
+    def setUp(self):
+        lists.get_cache().clear()
+        category = Category.objects.create(name="Bags", slug="bags")
+        self.products = [
+            Product.objects.create(category=category, name=f"Bag {number}",
+                                   slug=f"bag-{number}", price=20)
+            for number in range(6)
+        ]
+        self.ids = [product.id for product in self.products]
+        self.user = User.objects.create_user(phone="09120000000", full_name="Test User",
+                                             password="testpassword")
+        self.client.force_login(self.user, backend="account.authentication.CustomBackend")
+
+    def tearDown(self):
+        # The sessions the test buffered are never written
+        sessions.write_behind.pending.clear()
+
+    def post(self, url_name, **data):
+        return self.client.post(reverse(url_name), data, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+
+    def test_bulk_update_and_counts(self):
+        # Counted once, then moved by the changes
+        self.assertEqual(lists.get_counts(self.user), {"wishlist": 0, "compare": 0})
+        response = self.post("wishlist:update", add=",".join(map(str, self.ids[:4])))
+        self.assertEqual(response.json(), {"added": self.ids[:4], "removed": [], "count": 4})
+        self.post("wishlist:compare-update", add=[self.ids[0], self.ids[5]])
+
+        response = self.post("wishlist:update", toggle=[self.ids[0], self.ids[4]],
+                             remove=[self.ids[1]])
+        self.assertEqual(response.json(), {"added": [self.ids[4]],
+                                           "removed": [self.ids[0], self.ids[1]], "count": 3})
+        with self.assertNumQueries(0):
+            self.assertEqual(lists.get_counts(self.user), {"wishlist": 3, "compare": 2})
+        lists.get_cache().clear()
+        self.assertEqual(lists.get_counts(self.user), {"wishlist": 3, "compare": 2})
+
+        # One row per product, removed with its last list
+        self.assertEqual(SavedProduct.objects.get(product=self.ids[0]).lists, lists.lists["compare"])
+        self.assertFalse(SavedProduct.objects.filter(product=self.ids[1]).exists())
+
+    def test_saved_flags(self):
+        self.post("wishlist:update", add=self.ids[:2])
+        self.post("wishlist:compare-update", add=self.ids[1:3])
+        with self.assertNumQueries(1):
+            saved = lists.get_saved(self.user, self.ids)
+        self.assertEqual(saved, {"wishlist": set(self.ids[:2]), "compare": set(self.ids[1:3])})
+
+        response = self.client.get(reverse("wishlist:saved"), {"ids": ",".join(map(str, self.ids))})
+        self.assertEqual(response.json(), {"wishlist": self.ids[:2], "compare": self.ids[1:3]})
+
+        response = self.client.get(reverse("home:main"))
+        self.assertContains(response, '<span class="wishlist-count"', count=2)
+        response = self.client.get(reverse("wishlist:detail"))
+        self.assertEqual(response.context["products"], self.products[1::-1])
+
+    def test_product_deleted(self):
+        self.post("wishlist:update", add=self.ids[:3])
+        self.post("wishlist:compare-update", add=self.ids[:1])
+        self.assertEqual(lists.get_counts(self.user), {"wishlist": 3, "compare": 1})
+        # The rows go with the product, and the cached counts with them
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].delete()
+        self.assertEqual(lists.get_counts(self.user), {"wishlist": 2, "compare": 0})
+
+        # The removals of update() keep moving the counts
+        self.post("wishlist:update", remove=self.ids[1:2])
+        with self.assertNumQueries(0):
+            self.assertEqual(lists.get_counts(self.user), {"wishlist": 1, "compare": 0})
+
+    def test_products_deleted_in_bulk(self):
+        self.post("wishlist:update", add=self.ids[:3])
+        self.assertEqual(lists.get_counts(self.user)["wishlist"], 3)
+        # Like "delete selected" of the admin
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.filter(id__in=self.ids[:2]).delete()
+        self.assertEqual(lists.get_counts(self.user)["wishlist"], 1)
+
+    @override_settings(COMPARE_MAX_PRODUCTS=3)
+    def test_compare_limit(self):
+        response = self.post("wishlist:compare-update", add=self.ids)
+        self.assertEqual(response.json()["added"], self.ids[:3])
+        # A removal makes room in the same request
+        response = self.post("wishlist:compare-update", remove=[self.ids[0]], add=[self.ids[5]])
+        self.assertEqual(response.json()["added"], [self.ids[5]])
+        self.assertEqual(response.json()["count"], 3)
+
+    def test_anonymous(self):
+        self.client.logout()
+        response = self.post("wishlist:update", toggle=[self.ids[0]])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {"login": reverse("account:login")})
+        self.assertEqual(self.client.get(reverse("wishlist:saved"), {"ids": self.ids[0]}).json(),
+                         {"wishlist": [], "compare": []})
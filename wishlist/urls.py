@@ -0,0 +1,13 @@
+from django.urls import path
+
+from . import views
+
+app_name = "wishlist"
+urlpatterns = [
+    path("", views.ListView.as_view(), {"name": "wishlist"}, name="detail"),
+    path("compare", views.ListView.as_view(), {"name": "compare"}, name="compare"),
+    path("saved", views.SavedView.as_view(), name="saved"),
+    path("update", views.ListUpdate.as_view(), {"name": "wishlist"}, name="update"),
+    path("compare/update", views.ListUpdate.as_view(), {"name": "compare"},
+         name="compare-update"),
+]
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import ensure_csrf_cookie
+
+from home.models import Product
+from . import lists
+
+
+def get_ids(data, field):
+    # Repeated or comma separated, e.g. add=1&add=2 or add=1,2
+    ids = []
+    for value in data.getlist(field):
+        for id in value.split(","):
+            try:
+                ids.append(int(id))
+            except ValueError:
+                continue
+    return ids
+
+
+# The product cards change the lists with JavaScript
+@method_decorator(ensure_csrf_cookie, name="dispatch")
+class ListView(View):
+    """
+    Products of the wishlist or the compare list,
+    newest first
+    """
+    templates = {
+        "wishlist": "wishlist/wishlist.html",
+        "compare": "wishlist/compare.html",
+    }
+
+    def get_page(self):
+        try:
+            return max(int(self.request.GET.get("page", 1)), 1)
+        except ValueError:
+            return 1
+
+    def get(self, request, name):
+        if not request.user.is_authenticated:
+            return redirect("account:login")
+        page = self.get_page()
+        size = settings.CATALOG_PAGE_SIZE
+        ids = list(lists.get_product_ids(request.user, name)[(page - 1) * size:page * size + 1])
+        products = Product.objects.for_grid().in_bulk(ids[:size])
+        products = [products[id] for id in ids[:size] if id in products]
+        return render(request, self.templates[name], {
+            "products": products,
+            "page": page,
+            "has_next": len(ids) > size,
+        })
+
+
+class ListUpdate(View):
+    """
+    Add, remove or toggle any number of products
+    of a list in one request, the product cards
+    post here with JavaScript and get the changes
+    and the new count
+    """
+
+    def post(self, request, name):
+        is_ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
+        if not request.user.is_authenticated:
+            if is_ajax:
+                return JsonResponse({"login": reverse("account:login")}, status=403)
+            return redirect("account:login")
+
+        added, removed = lists.update(request.user, name, add=get_ids(request.POST, "add"),
+                                      remove=get_ids(request.POST, "remove"),
+                                      toggle=get_ids(request.POST, "toggle"))
+        if is_ajax:
+            return JsonResponse({
+                "added": added,
+                "removed": removed,
+                "count": lists.get_counts(request.user)[name],
+            })
+        return redirect("wishlist:detail" if name == "wishlist" else "wishlist:compare")
+
+
+class SavedView(View):
+    """
+    Which of the products of a grid, ?ids=1,2,3,
+    are in the lists of the user; the pages are
+    cached for everyone so the cards are marked
+    with JavaScript
+    """
+
+    def get(self, request):
+        ids = get_ids(request.GET, "ids")[:settings.WISHLIST_MAX_FLAGS]
+        saved = lists.get_saved(request.user, ids)
+        return JsonResponse({name: sorted(product_ids) for name, product_ids in saved.items()})